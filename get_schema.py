@@ -1,124 +1,295 @@
 #!/usr/bin/env python3
 """
-Script to generate schema documentation for DuckDB databases
+Script to generate schema documentation for DuckDB databases and Parquet outputs
+
+Databases are introspected through a single read-only connection: table and
+column metadata come from ``duckdb_tables()``, ``duckdb_views()`` and
+``duckdb_columns()``, row estimates from the storage statistics (no full
+``COUNT(*)``), and sample rows are fetched in parallel on cursors of that
+connection. Parquet files are documented from their footers only.
+
+Each generated ``*_schema.md`` has a ``*_schema.manifest.json`` next to it
+holding a fingerprint and the rendered section of every table or file, so
+only the entries whose fingerprint changed are sampled and rendered again.
+
+Usage:
+    python get_schema.py data/duckdb/onet_dataset_29.2.duckdb [more.duckdb ...]
+    python get_schema.py --parquet-dir data/processed
+    python get_schema.py data/duckdb/esco_dataset_1.2.0.duckdb --force
 """
+import argparse
+import glob
+import hashlib
+import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import duckdb
-import json
+import pyarrow.parquet as pq
+
+SAMPLE_ROWS = 3
+MAX_CELL_CHARS = 50
+DEFAULT_WORKERS = 4
+
+
+def _fingerprint(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _format_cell(val):
+    """Escape and truncate a value for a markdown table cell."""
+    if val is None:
+        return ""
+    formatted_val = str(val).replace('|', '\\|').replace('\n', ' ')
+    if isinstance(val, str) and len(formatted_val) > MAX_CELL_CHARS:
+        formatted_val = formatted_val[:MAX_CELL_CHARS - 3] + "..."
+    return formatted_val
+
+
+def _markdown_table(header, rows):
+    lines = ["| " + " | ".join(header) + " |", "| " + " | ".join("---" for _ in header) + " |"]
+    lines += ["| " + " | ".join(_format_cell(val) for val in row) + " |" for row in rows]
+    return "\n".join(lines) + "\n"
+
 
-def get_table_schema(db_path, table_name):
-    """Get schema for a specific table"""
+def _manifest_path(output_path):
+    """``<doc>.manifest.json`` next to the markdown file ``<doc>.md``."""
+    return str(Path(output_path).with_suffix(".manifest.json"))
+
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(path, entries):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2)
+
+
+# --- DuckDB databases ---
+
+def get_database_objects(conn):
+    """Tables and views with their columns, from the catalog functions.
+
+    Returns:
+        dict: name -> {"kind", "estimated_rows" (storage estimate, None for views),
+            "columns" [(name, type)], "sql"}
+    """
+    objects = {}
+    for name, estimated_rows, sql in conn.execute("""
+        SELECT table_name, estimated_size, sql FROM duckdb_tables()
+        WHERE NOT internal AND NOT temporary AND schema_name = 'main'
+    """).fetchall():
+        objects[name] = {"kind": "table", "estimated_rows": estimated_rows, "columns": [], "sql": sql}
+    for name, sql in conn.execute("""
+        SELECT view_name, sql FROM duckdb_views()
+        WHERE NOT internal AND NOT temporary AND schema_name = 'main'
+    """).fetchall():
+        objects[name] = {"kind": "view", "estimated_rows": None, "columns": [], "sql": sql}
+    for table, column, data_type in conn.execute("""
+        SELECT table_name, column_name, data_type FROM duckdb_columns()
+        WHERE NOT internal AND schema_name = 'main'
+        ORDER BY table_name, column_index
+    """).fetchall():
+        if table in objects:
+            objects[table]["columns"].append((column, data_type))
+    return objects
+
+
+def _sample(conn, table_name):
+    """Sample rows of one table, on its own cursor so samples can run in parallel."""
+    cursor = conn.cursor()
     try:
-        conn = duckdb.connect(db_path, read_only=True)
-        schema = conn.execute(f"DESCRIBE {table_name}").fetchall()
-        sample = conn.execute(f"SELECT * FROM {table_name} LIMIT 3").fetchall()
-        count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
-        conn.close()
-        return schema, sample, count
-    except Exception as e:
-        print(f"Error getting schema for {table_name}: {e}")
-        return None, None, 0
+        return cursor.execute(f'SELECT * FROM "{table_name}" LIMIT {SAMPLE_ROWS}').fetchall()
+    except duckdb.Error as e:
+        print(f"Error sampling {table_name}: {e}")
+        return None
+    finally:
+        cursor.close()
+
+
+def render_table_section(table_name, info, sample):
+    """Markdown section for one table or view."""
+    parts = [f"## {table_name}\n\n"]
+    if info["kind"] == "view":
+        parts.append("This is a view.\n\n")
+    else:
+        parts.append(f"This table contains ≈{info['estimated_rows']:,} rows (storage estimate).\n\n")
 
-def get_all_tables(db_path):
-    """Get list of all tables in the database"""
+    parts.append("### Schema\n\n")
+    parts.append("| Column | Type | Description |\n")
+    parts.append("|--------|------|-------------|\n")
+    for column, data_type in info["columns"]:
+        parts.append(f"| {column} | {data_type} | |\n")
+    parts.append("\n")
+
+    parts.append("### Sample Data\n\n")
+    if sample:
+        parts.append(_markdown_table([column for column, _ in info["columns"]], sample))
+    else:
+        parts.append("No sample data available.\n")
+    parts.append("\n---\n\n")
+    return "".join(parts)
+
+
+def generate_markdown(db_path, output_path=None, workers=DEFAULT_WORKERS, force=False):
+    """Generate (or refresh) the markdown schema documentation of a database.
+
+    Args:
+        db_path (str): DuckDB database file (opened read-only)
+        output_path (str, optional): Defaults to ``<db>_schema.md`` next to the database
+        workers (int): Threads used to sample tables
+        force (bool): Re-render every table even if its manifest entry matches
+
+    Returns:
+        list[str]: Tables whose section was (re)rendered
+    """
+    db_name = os.path.basename(db_path).replace('.duckdb', '')
+    output_path = output_path or os.path.join(os.path.dirname(db_path), f"{db_name}_schema.md")
+    manifest_path = _manifest_path(output_path)
+    manifest = {} if force else _load_manifest(manifest_path)
+
+    conn = duckdb.connect(db_path, read_only=True)
     try:
-        conn = duckdb.connect(db_path, read_only=True)
-        tables = [row[0] for row in conn.execute("SHOW TABLES").fetchall()]
+        objects = get_database_objects(conn)
+        if not objects:
+            print(f"No tables found in {db_path}")
+            return []
+        fingerprints = {
+            name: _fingerprint({"kind": info["kind"], "estimated_rows": info["estimated_rows"], "columns": info["columns"], "sql": info["sql"]})
+            for name, info in objects.items()
+        }
+        stale = sorted(name for name in objects if manifest.get(name, {}).get("fingerprint") != fingerprints[name])
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            samples = dict(zip(stale, pool.map(lambda name: _sample(conn, name), stale)))
+    finally:
         conn.close()
-        return tables
-    except Exception as e:
-        print(f"Error getting tables: {e}")
-        return []
-
-def generate_markdown(db_path, output_path, original_db_name=None):
-    """Generate markdown documentation for database schema"""
-    if original_db_name:
-        db_name = original_db_name
-    else:
-        db_name = os.path.basename(db_path).replace('.duckdb', '')
-    
-    tables = get_all_tables(db_path)
-    if not tables:
-        print(f"No tables found in {db_path}")
-        return
-    
+
+    entries = {
+        name: {"fingerprint": fingerprints[name], "section": render_table_section(name, objects[name], samples[name])}
+        if name in samples else manifest[name]
+        for name in sorted(objects)
+    }
+
     with open(output_path, 'w') as f:
         f.write(f"# {db_name} Database Schema\n\n")
         f.write(f"This document describes the schema of the {db_name} database.\n\n")
         f.write("## Tables\n\n")
-        
-        # Table of contents
-        for table in sorted(tables):
+        for table in sorted(objects):
             f.write(f"- [{table}](#{table.lower()})\n")
         f.write("\n")
-        
-        # Detailed schema for each table
-        for table in sorted(tables):
-            schema, sample, count = get_table_schema(db_path, table)
-            if not schema:
-                continue
-                
-            f.write(f"## {table}\n\n")
-            f.write(f"This table contains {count:,} records.\n\n")
-            
-            # Schema table
-            f.write("### Schema\n\n")
-            f.write("| Column | Type | Description |\n")
-            f.write("|--------|------|-------------|\n")
-            for col in schema:
-                f.write(f"| {col[0]} | {col[1]} | |\n")
-            f.write("\n")
-            
-            # Sample data
-            f.write("### Sample Data\n\n")
-            if sample:
-                # Use first row to get column names
-                col_names = [col[0] for col in schema]
-                
-                # Header
-                f.write("| " + " | ".join(col_names) + " |\n")
-                f.write("| " + " | ".join(["---" for _ in col_names]) + " |\n")
-                
-                # Data rows
-                for row in sample:
-                    formatted_row = []
-                    for val in row:
-                        if val is None:
-                            formatted_row.append("")
-                        elif isinstance(val, str):
-                            # Escape pipes and format for markdown
-                            formatted_val = str(val).replace('|', '\\|')
-                            # Truncate if too long
-                            if len(formatted_val) > 50:
-                                formatted_val = formatted_val[:47] + "..."
-                            formatted_row.append(formatted_val)
-                        else:
-                            formatted_row.append(str(val))
-                    f.write("| " + " | ".join(formatted_row) + " |\n")
-            else:
-                f.write("No sample data available.\n")
-            
-            f.write("\n---\n\n")
+        for table in sorted(objects):
+            f.write(entries[table]["section"])
+    _write_manifest(manifest_path, entries)
+    return stale
+
+
+# --- Parquet outputs ---
+
+def _column_stats(metadata, column_index):
+    """Null count and min/max of one column across all row groups (None if not recorded)."""
+    nulls, low, high = 0, None, None
+    for rg in range(metadata.num_row_groups):
+        stats = metadata.row_group(rg).column(column_index).statistics
+        if stats is None:
+            return None, None, None
+        nulls += stats.null_count or 0
+        if stats.has_min_max:
+            low = stats.min if low is None else min(low, stats.min)
+            high = stats.max if high is None else max(high, stats.max)
+    return nulls, low, high
+
+
+def render_parquet_section(rel_path, path):
+    """Markdown section for one Parquet file, read from its footer."""
+    parquet_file = pq.ParquetFile(path)
+    metadata = parquet_file.metadata
+    schema = parquet_file.schema_arrow
+    compression = (metadata.row_group(0).column(0).compression if metadata.num_row_groups and metadata.num_columns
+                   else "n/a")
+    parts = [f"## {rel_path}\n\n"]
+    parts.append(f"This file contains {metadata.num_rows:,} records in {metadata.num_row_groups} row group(s) "
+                 f"({os.path.getsize(path):,} bytes, {compression} compression).\n\n")
+    parts.append("### Schema\n\n")
+    parts.append("| Column | Type | Nulls | Min | Max |\n")
+    parts.append("|--------|------|-------|-----|-----|\n")
+    # Statistics are stored per leaf column; only flat columns map one-to-one
+    leaf_index = {metadata.schema.column(i).path: i for i in range(metadata.num_columns)}
+    for field in schema:
+        if field.name in leaf_index:
+            nulls, low, high = _column_stats(metadata, leaf_index[field.name])
+        else:
+            nulls, low, high = None, None, None
+        parts.append(f"| {field.name} | {field.type} | {'' if nulls is None else f'{nulls:,}'} "
+                     f"| {_format_cell(low)} | {_format_cell(high)} |\n")
+    parts.append("\n---\n\n")
+    return "".join(parts)
+
+
+def generate_parquet_markdown(parquet_dir, output_path=None, force=False):
+    """Document every Parquet file under ``parquet_dir`` from its footer.
+
+    Files are re-read only when their size or modification time changed.
+
+    Returns:
+        list[str]: Files whose section was (re)rendered
+    """
+    output_path = output_path or os.path.join(parquet_dir, "parquet_schema.md")
+    manifest_path = _manifest_path(output_path)
+    manifest = {} if force else _load_manifest(manifest_path)
+
+    paths = sorted(glob.glob(os.path.join(parquet_dir, "**", "*.parquet"), recursive=True))
+    entries, stale = {}, []
+    for path in paths:
+        rel_path = os.path.relpath(path, parquet_dir)
+        stat = os.stat(path)
+        fingerprint = _fingerprint({"size": stat.st_size, "mtime": stat.st_mtime_ns})
+        if manifest.get(rel_path, {}).get("fingerprint") == fingerprint:
+            entries[rel_path] = manifest[rel_path]
+            continue
+        entries[rel_path] = {"fingerprint": fingerprint, "section": render_parquet_section(rel_path, path)}
+        stale.append(rel_path)
+
+    with open(output_path, 'w') as f:
+        f.write(f"# {os.path.basename(os.path.normpath(parquet_dir))} Parquet Outputs\n\n")
+        f.write(f"This document describes the Parquet files under {parquet_dir}, read from their footers.\n\n")
+        f.write("## Files\n\n")
+        for rel_path in entries:
+            f.write(f"- {rel_path}\n")
+        f.write("\n")
+        for entry in entries.values():
+            f.write(entry["section"])
+    _write_manifest(manifest_path, entries)
+    return stale
+
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print(f"Usage: {sys.argv[0]} <original_db_path> <temp_db_path>")
-        sys.exit(1)
-        
-    original_db_path = sys.argv[1]
-    temp_db_path = sys.argv[2]
-    
-    if not os.path.exists(temp_db_path):
-        print(f"Temporary database {temp_db_path} not found")
+    parser = argparse.ArgumentParser(description="Generate schema documentation for DuckDB databases and Parquet outputs")
+    parser.add_argument("databases", nargs="*", help="DuckDB database files to document")
+    parser.add_argument("--parquet-dir", help="Also document every Parquet file under this directory")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Threads used to sample tables")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifests and regenerate everything")
+    args = parser.parse_args()
+
+    if not args.databases and not args.parquet_dir:
+        parser.print_usage()
         sys.exit(1)
-        
-    output_path = os.path.join(os.path.dirname(original_db_path), 
-                               os.path.basename(original_db_path).replace('.duckdb', '_schema.md'))
-    original_db_name = os.path.basename(original_db_path).replace('.duckdb', '')
-    
-    print(f"Generating schema documentation for {original_db_path} using {temp_db_path}")
-    print(f"Output will be written to {output_path}")
-    
-    generate_markdown(temp_db_path, output_path, original_db_name)
+
+    for db_path in args.databases:
+        if not os.path.exists(db_path):
+            print(f"Database {db_path} not found")
+            sys.exit(1)
+        print(f"Generating schema documentation for {db_path}")
+        refreshed = generate_markdown(db_path, workers=args.workers, force=args.force)
+        print(f"  {len(refreshed)} table(s) re-rendered")
+
+    if args.parquet_dir:
+        print(f"Generating Parquet documentation for {args.parquet_dir}")
+        refreshed = generate_parquet_markdown(args.parquet_dir, force=args.force)
+        print(f"  {len(refreshed)} file(s) re-rendered")
     print("Done!")
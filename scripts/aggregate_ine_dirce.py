@@ -1,8 +1,22 @@
 # scripts/aggregate_ine_dirce.py
 import polars as pl
 import os
+import sys
 from collections import defaultdict
 
+# Add the project root to the path to allow importing from src
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from src.analysis.dirce_strata import StrataCube
+from src.utils.instrumentation import instrumented_run
+from src.utils.parquet_io import write_keyed_parquet
+
+INPUT_FILE = os.path.join(PROJECT_ROOT, "data", "derived", "ine_dirce_empresas_filtered.parquet")
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data", "processed", "ine_dirce")
+OUTPUT_FILE = os.path.join(OUTPUT_DIR, "ine_dirce_aggregated_by_activity.parquet")
+DIVISION_OUTPUT_FILE = os.path.join(OUTPUT_DIR, "ine_dirce_aggregated_by_division.parquet")
+
 def sort_strata_columns(cols):
     # Defines the desired order for strata columns
     order = [
@@ -25,19 +39,16 @@ def sort_strata_columns(cols):
     return sorted(cols, key=get_sort_key)
 
 
+@instrumented_run("aggregate_ine_dirce")
 def main():
-    # Define file paths relative to the script location or project root
-    script_dir = os.path.dirname(__file__)
-    project_root = os.path.abspath(os.path.join(script_dir, '..')) 
-    input_file = os.path.join(project_root, "data", "derived", "ine_dirce_empresas_filtered.parquet")
-    output_dir = os.path.join(project_root, "data", "processed", "ine_dirce")
-    output_file = os.path.join(output_dir, "ine_dirce_aggregated_by_activity.parquet")
-
     # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    print(f"Reading file: {input_file}")
-    df_filtered = pl.read_parquet(input_file)
+    print(f"Reading file: {INPUT_FILE}")
+    df_filtered = pl.read_parquet(INPUT_FILE)
+    # Dimension columns are stored as Enums; pivots below turn their values into
+    # column names and join on them, so work with plain strings from here on.
+    df_filtered = df_filtered.with_columns(pl.col(pl.Enum, pl.Categorical).cast(pl.Utf8))
     print("Input shape:", df_filtered.shape)
     print("Input columns:", df_filtered.columns)
 
@@ -241,93 +252,24 @@ def main():
             final_agg = final_agg.with_columns(pl.lit(None).cast(pl.Float64).alias(median_growth_col_name))
         # --- End Median YoY Growth Calculation ---
 
-        # --- Estimate Employees 2024 ---
-        strata_midpoints = {
-            "Estrato_Sin asalariados_abs": 1, # Changed from 0 to 1
-            "Estrato_De 1 a 2_abs": 1.5,
-            "Estrato_De 3 a 5_abs": 4,
-            "Estrato_De 6 a 9_abs": 7.5,
-            "Estrato_De 10 a 19_abs": 14.5,
-            "Estrato_De 20 a 49_abs": 34.5,
-            "Estrato_De 50 a 99_abs": 74.5,
-            "Estrato_De 100 a 199_abs": 149.5,
-            "Estrato_De 200 a 249_abs": 224.5,
-            "Estrato_De 250 a 999_abs": 624.5,
-            "Estrato_De 1000 a 4999_abs": 2999.5,
-            "Estrato_De 5000 o más asalariados_abs": 5000, # Using lower bound as estimate
-        }
-
-        # Check which strata columns actually exist in the aggregated data
-        existing_strata_cols = [col for col in strata_midpoints if col in final_agg.columns]
-
-        if existing_strata_cols:
-            print("Calculating Estimated_Employees_2024...")
-            # Calculate the sum of (companies_in_stratum * midpoint_employees)
-            employee_sum_expr = pl.sum_horizontal(
-                [pl.col(col) * strata_midpoints[col] for col in existing_strata_cols]
-            )
+        # --- Estimate Employees and Simplified Size Categories (all years) ---
+        # Counts are held as an activities x strata x years array; employees and
+        # size buckets are matrix products against the midpoint vector and the
+        # strata -> size mapping defined in src.analysis.dirce_strata.
+        print("Building activities x strata x years cube...")
+        cube = StrataCube.from_frame(df_level3)
+        print(f"  Cube shape: {cube.counts.shape} (activities, strata, years)")
+
+        if 2024 in cube.years:
+            print("Calculating Estimated_Employees per year and size categories for 2024...")
+            estimates = cube.to_frame(2024)
+            final_agg = final_agg.join(estimates, on="Actividad principal", how="left")
+        else:
+            print("Warning: No 2024 data in strata cube, cannot estimate employees or size categories.")
             final_agg = final_agg.with_columns(
-                employee_sum_expr.round(0).alias("Estimated_Employees_2024") # Round to whole number
+                pl.lit(None).cast(pl.Float64).alias("Estimated_Employees_2024"),
+                pl.lit(None).cast(pl.Float64).alias("Estimated_Employees_pct"),
             )
-        else:
-            print("Warning: No strata absolute columns found to estimate employees.")
-            final_agg = final_agg.with_columns(pl.lit(None).cast(pl.Float64).alias("Estimated_Employees_2024"))
-
-        # Calculate % of total estimated employees
-        if "Estimated_Employees_2024" in final_agg.columns:
-            total_estimated_employees = final_agg["Estimated_Employees_2024"].sum()
-            if total_estimated_employees and total_estimated_employees != 0:
-                final_agg = final_agg.with_columns(
-                    (
-                        (pl.col("Estimated_Employees_2024") / total_estimated_employees) * 100
-                    ).round(2).alias("Estimated_Employees_pct")
-                )
-                print("Calculated Estimated_Employees_pct")
-            else:
-                print("Warning: Total estimated employees is zero or null, cannot calculate percentage.")
-                final_agg = final_agg.with_columns(pl.lit(None).cast(pl.Float64).alias("Estimated_Employees_pct"))
-        else:
-            print("Warning: Estimated_Employees_2024 column not found, cannot calculate percentage.")
-
-        # --- Aggregate into Simplified Size Categories --- 
-        print("Aggregating into simplified size categories...")
-        size_mapping = {
-            "Size_Micro (0-9)": ["Estrato_Sin asalariados_abs", "Estrato_De 1 a 2_abs", "Estrato_De 3 a 5_abs", "Estrato_De 6 a 9_abs"],
-            "Size_Small (10-49)": ["Estrato_De 10 a 19_abs", "Estrato_De 20 a 49_abs"],
-            "Size_Medium (50-249)": ["Estrato_De 50 a 99_abs", "Estrato_De 100 a 199_abs", "Estrato_De 200 a 249_abs"],
-            "Size_Large (250+)": ["Estrato_De 250 a 999_abs", "Estrato_De 1000 a 4999_abs", "Estrato_De 5000 o más asalariados_abs"]
-        }
-
-        for size_cat, strata_cols in size_mapping.items():
-            abs_col_name = f"{size_cat}_abs"
-            pct_col_name = f"{size_cat}_pct"
-            
-            # Check which source columns exist
-            existing_source_cols = [col for col in strata_cols if col in final_agg.columns]
-
-            if existing_source_cols:
-                # Calculate absolute sum
-                final_agg = final_agg.with_columns(
-                    pl.sum_horizontal([pl.col(c) for c in existing_source_cols]).alias(abs_col_name)
-                )
-
-                # Calculate percentage
-                if "Total_2024" in final_agg.columns:
-                    final_agg = final_agg.with_columns(
-                        pl.when(pl.col("Total_2024") != 0)
-                        .then((pl.col(abs_col_name) / pl.col("Total_2024")) * 100)
-                        .otherwise(0.0) # Avoid division by zero
-                        .round(2)
-                        .alias(pct_col_name)
-                    )
-                    print(f"  Calculated {abs_col_name} and {pct_col_name}")
-                else:
-                    print(f"  Warning: Total_2024 column missing, cannot calculate {pct_col_name}.")
-                    final_agg = final_agg.with_columns(pl.lit(None).cast(pl.Float64).alias(pct_col_name))
-            else:
-                print(f"  Warning: No source columns found for {size_cat}, skipping {abs_col_name} and {pct_col_name}.")
-                final_agg = final_agg.with_columns(pl.lit(None).cast(pl.Int64).alias(abs_col_name))
-                final_agg = final_agg.with_columns(pl.lit(None).cast(pl.Float64).alias(pct_col_name))
 
         # --- End Estimate Employees ---
 
@@ -350,7 +292,7 @@ def main():
         if "Actividad principal" in all_cols and "Growth_2020_2024_pct" in all_cols and "Median_YoY_Growth_pct" in all_cols:
             # Identify column groups
             activity_col = ["Actividad principal"]
-            employee_col = ["Estimated_Employees_2024"] if "Estimated_Employees_2024" in final_agg.columns else []
+            employee_col = sorted([col for col in final_agg.columns if col.startswith("Estimated_Employees_") and col[20:].isdigit()], reverse=True)
             employee_pct_col = ["Estimated_Employees_pct"] if "Estimated_Employees_pct" in final_agg.columns else []
             growth_cols = sorted([col for col in final_agg.columns if "Growth" in col], reverse=True) # Place Median first if name matches
             total_cols = sorted([col for col in final_agg.columns if col.startswith("Total_") and col[6:].isdigit()], reverse=True)
@@ -404,18 +346,34 @@ def main():
              print(final_agg.head())
 
         # --- Step 7: Save Output ---
-        final_agg.write_parquet(output_file)
-        print(f"Aggregated data saved to: {output_file}")
-
-try:
-    main()
-except pl.exceptions.ComputeError as e:
-    print(f"A Polars computation error occurred: {e}")
-    print("This might happen if pivoting results in unexpected column names or types.")
-except FileNotFoundError:
-    print(f"Error: Input file not found at {input_file}")
-except Exception as e:
-    print(f"An unexpected error occurred: {e}")
+        write_keyed_parquet(final_agg, OUTPUT_FILE, key="Actividad principal")
+        print(f"Aggregated data saved to: {OUTPUT_FILE}")
+
+        # --- Step 8: Division-level rollup of the strata cube ---
+        if 2024 in cube.years:
+            division_labels = dict(zip(division_map["division_code"].to_list(), division_map["Division"].to_list()))
+            division_cube = cube.rollup(prefix_len=2, labels=division_labels)
+            division_totals = pl.DataFrame(
+                {"Division": division_cube.activities}
+                | {f"Total_{year}": division_cube.totals()[:, i] for i, year in enumerate(division_cube.years)}
+            )
+            division_agg = division_totals.join(
+                division_cube.to_frame(2024, activity_col="Division"), on="Division", how="left"
+            )
+            write_keyed_parquet(division_agg, DIVISION_OUTPUT_FILE, key="Division")
+            print(f"Division-level aggregates ({division_agg.shape}) saved to: {DIVISION_OUTPUT_FILE}")
+
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except pl.exceptions.ComputeError as e:
+        print(f"A Polars computation error occurred: {e}")
+        print("This might happen if pivoting results in unexpected column names or types.")
+        sys.exit(1)
+    except FileNotFoundError:
+        print(f"Error: Input file not found at {INPUT_FILE}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        sys.exit(1)
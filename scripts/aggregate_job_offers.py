@@ -1,16 +1,65 @@
+"""
+Aggregate job offers by ESCO occupation.
+
+Offers are reduced to per-(occupation, country) cells holding the summed
+``n_job_offers`` and KLL sketches of the salaries (``src.utils.sketches``),
+which merge by addition and sketch merging. The cells are kept as state in
+``STATE_DIR``, so new offer files can be folded in without re-reading the
+history, and the outputs are refreshed from the cells:
+
+- ``OUTPUT_PATH``: ESCO profiles with offer counts and median salaries, global
+  and per target country
+- ``SKETCHES_PATH``: the cells with ISCO codes; higher-level quantiles (ISCO
+  groups, regions) come from merging their sketches
+
+    # Full recompute from JOB_OFFERS_CSV_PATH (resets the state)
+    python scripts/aggregate_job_offers.py
+
+    # Merge only new offer files into the state and refresh the output
+    python scripts/aggregate_job_offers.py --append data/raw/datamarket/daily/2025-06-01.csv
+
+    # Recompute from every file in the state, report drift against the merged state, then replace it
+    python scripts/aggregate_job_offers.py --full
+"""
+
+import argparse
+import hashlib
 import polars as pl
 import logging
 import os
+import sys
+from datetime import datetime, timezone
+
+# Add the project root to the path to allow importing from src
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from src.utils.instrumentation import instrumented_run
+from src.utils.parquet_io import write_keyed_parquet
+from src.utils.sketches import KLLSketch, kll_quantile, merge_kll
 
 # --- Configuration ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-JOB_OFFERS_CSV_PATH = 'data/raw/datamarket/datamarket_job_offers_victoriano.csv'
-ESCO_PROFILES_PARQUET_PATH = 'data/processed/esco/esco_occupation_profiles.parquet'
-OUTPUT_DIR = 'data/processed/datamarket'
+JOB_OFFERS_CSV_PATH = os.path.join(PROJECT_ROOT, 'data', 'raw', 'datamarket', 'datamarket_job_offers_victoriano.csv')
+ESCO_PROFILES_PARQUET_PATH = os.path.join(PROJECT_ROOT, 'data', 'processed', 'esco', 'esco_occupation_profiles.parquet')
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'data', 'processed', 'datamarket')
 OUTPUT_FILENAME = 'job_offers_aggregated_by_occupation.parquet'
 OUTPUT_PATH = os.path.join(OUTPUT_DIR, OUTPUT_FILENAME)
 
+# Incremental state: merged (occupation, country) cells and the offer files they cover
+STATE_DIR = os.path.join(PROJECT_ROOT, 'data', 'derived', 'job_offers_state')
+STATE_CELLS_PATH = os.path.join(STATE_DIR, 'cells.parquet')
+STATE_FILES_PATH = os.path.join(STATE_DIR, 'files.parquet')
+CELL_KEY = ['occupation_uri', 'country_name']
+DRIFT_TOLERANCE = 0.02
+
+# Serialised KLL salary sketches per (occupation, country), for rollups in SQL or Polars
+SKETCHES_PATH = os.path.join(OUTPUT_DIR, 'job_offer_salary_sketches.parquet')
+SKETCH_ID_COLUMNS = ['occupation_uri', 'isco_code', 'isco_level_1_code', 'isco_level_2_code',
+                     'isco_level_3_code', 'isco_level_4_code']
+SALARY_SKETCHES = {'median_min_salary': 'min_salary_sketch', 'median_max_salary': 'max_salary_sketch'}
+
 # Countries for specific aggregation
 TARGET_COUNTRIES = {
     'uk': 'United Kingdom',
@@ -18,157 +67,273 @@ TARGET_COUNTRIES = {
     'es': 'Spain'
 }
 
-# --- Main Script Logic ---
-def main():
-    logging.info(f"Loading job offers from: {JOB_OFFERS_CSV_PATH}")
-    try:
-        df_jobs = pl.read_csv(JOB_OFFERS_CSV_PATH)
-        # Basic cleaning: Ensure numeric types, handle potential errors
-        df_jobs = df_jobs.with_columns(
-            pl.col('n_job_offers').cast(pl.Int64, strict=False).fill_null(0),
-            pl.col('median_min_salary').cast(pl.Float64, strict=False),
-            pl.col('median_max_salary').cast(pl.Float64, strict=False),
-            pl.col('esco_role').str.strip_chars().alias('esco_role_cleaned')
-        )
-        logging.info(f"Job offers loaded and basic cleaning done. Shape: {df_jobs.shape}")
-    except Exception as e:
-        logging.error(f"Failed to load or clean job offers CSV: {e}")
-        return
-        
-    logging.info(f"Loading ESCO profiles from: {ESCO_PROFILES_PARQUET_PATH}")
-    try:
-        df_esco = pl.read_parquet(ESCO_PROFILES_PARQUET_PATH)
-        # Clean occupation name for joining
-        df_esco = df_esco.with_columns(
-            pl.col('occupation_name').str.strip_chars().alias('occupation_name_cleaned')
-        )
-        # Get all columns from df_esco, ensure uniqueness by occupation_uri
-        df_esco_base = df_esco.unique(subset=['occupation_uri'], keep='first')
-        
-        logging.info(f"ESCO profiles loaded and prepared. Shape: {df_esco_base.shape}")
-        logging.info(f"Columns kept from ESCO profiles: {df_esco_base.columns}")
-    except Exception as e:
-        logging.error(f"Failed to load or process ESCO profiles Parquet: {e}")
-        return
+CELLS_SCHEMA = {
+    'occupation_uri': pl.String,
+    'country_name': pl.String,
+    'n_job_offers': pl.Int64,
+    'min_salary_sketch': pl.Binary,
+    'max_salary_sketch': pl.Binary,
+}
+FILES_SCHEMA = {'path': pl.String, 'sha256': pl.String, 'n_rows': pl.Int64, 'processed_at': pl.String}
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, so re-delivered files are recognised."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_job_offers(path):
+    """Read one offer file with numeric types and a cleaned role name."""
+    df_jobs = pl.read_csv(path)
+    # Basic cleaning: Ensure numeric types, handle potential errors
+    return df_jobs.with_columns(
+        pl.col('n_job_offers').cast(pl.Int64, strict=False).fill_null(0),
+        pl.col('median_min_salary').cast(pl.Float64, strict=False),
+        pl.col('median_max_salary').cast(pl.Float64, strict=False),
+        pl.col('country_name').cast(pl.String),
+        pl.col('esco_role').str.strip_chars().alias('esco_role_cleaned')
+    )
+
 
-    # --- Join Data ---
-    logging.info("Joining job offers with ESCO profiles...")
+def load_esco_profiles(path=ESCO_PROFILES_PARQUET_PATH):
+    """ESCO profiles, one row per occupation, with a cleaned name for joining."""
+    df_esco = pl.read_parquet(path)
+    df_esco = df_esco.with_columns(
+        pl.col('occupation_name').str.strip_chars().alias('occupation_name_cleaned')
+    )
+    return df_esco.unique(subset=['occupation_uri'], keep='first')
+
+
+def offer_cells(df_jobs, df_esco_base):
+    """Partial aggregates of a batch of offers per (occupation_uri, country_name).
+
+    Offers whose role does not match an ESCO occupation name are dropped.
+
+    Returns:
+        pl.DataFrame: ``CELLS_SCHEMA`` rows; salary sketches cover the non-null values
+    """
+    # Only the join key and occupation_uri are needed for aggregation; the full
+    # profile (with its skill list columns) is attached once per occupation later.
     df_joined = df_jobs.join(
-        df_esco_base,
+        df_esco_base.select(['occupation_uri', 'occupation_name_cleaned']),
         left_on='esco_role_cleaned',
         right_on='occupation_name_cleaned',
         how='left',
-        suffix='_esco' # Add suffix to avoid potential column name conflicts
     )
-    logging.info(f"Join complete. Shape after join: {df_joined.shape}")
-    
-    # Filter out rows where the join failed (no matching ESCO profile)
-    initial_rows = df_joined.height
-    df_joined = df_joined.filter(pl.col('occupation_uri').is_not_null())
-    rows_dropped = initial_rows - df_joined.height
+    rows_dropped = df_joined['occupation_uri'].null_count()
     if rows_dropped > 0:
         logging.warning(f"Dropped {rows_dropped} rows where job offer role did not match any ESCO occupation name.")
-    
-    # --- Aggregation (New Strategy) --- 
-    logging.info("Starting aggregation by occupation (Pivoting Strategy)...")
-    
-    # 1. Calculate Global Aggregates
-    logging.info("Calculating global aggregates...")
-    global_agg_expressions = [
+    cells = (
+        df_joined.filter(pl.col('occupation_uri').is_not_null())
+        .group_by(CELL_KEY)
+        .agg(pl.sum('n_job_offers'), *[pl.col(source).drop_nulls().alias(sketch)
+                                       for source, sketch in SALARY_SKETCHES.items()])
+    )
+    return cells.with_columns(
+        _map(cells[sketch], lambda values: KLLSketch().update(values).to_bytes(), pl.Binary)
+        for sketch in SALARY_SKETCHES.values()
+    ).select([pl.col(name).cast(dtype) for name, dtype in CELLS_SCHEMA.items()])
+
+
+def _map(series, function, dtype, name=None):
+    """Apply ``function`` to every value (a list for list columns) of ``series``."""
+    return pl.Series(name or series.name, [function(value) for value in series.to_list()], dtype=dtype)
+
+
+def _median(payload):
+    return KLLSketch.from_bytes(payload).quantile(0.5)
+
+
+def merge_cells(*cells):
+    """Merge partial aggregates: offer counts add up, salary sketches merge."""
+    merged = (
+        pl.concat(cells)
+        .group_by(CELL_KEY)
+        .agg(pl.sum('n_job_offers'), *SALARY_SKETCHES.values())
+        .sort(CELL_KEY, nulls_last=True)
+    )
+    return merged.with_columns(_map(merged[sketch], lambda payloads: merge_kll(payloads).to_bytes(), pl.Binary)
+                               for sketch in SALARY_SKETCHES.values())
+
+
+def occupation_aggregates(cells):
+    """Occupation-level offer counts and salary medians from the merged cells."""
+    # One cell per (occupation, country): country medians come from the cell's own sketch
+    cells = cells.with_columns(_map(cells[sketch], _median, pl.Float64, name)
+                               for name, sketch in SALARY_SKETCHES.items())
+    country_expressions = []
+    for name in ['total_job_offers', *SALARY_SKETCHES]:
+        for short_code, full_name in TARGET_COUNTRIES.items():
+            in_country = pl.col('country_name') == full_name
+            column = pl.col('n_job_offers').filter(in_country).sum() if name == 'total_job_offers' \
+                else pl.col(name).filter(in_country).first()
+            country_expressions.append(column.alias(f'{name}_{short_code}'))
+
+    aggregated = cells.group_by('occupation_uri').agg(
         pl.sum('n_job_offers').alias('total_job_offers_global'),
-        pl.median('median_min_salary').alias('median_min_salary_global'),
-        pl.median('median_max_salary').alias('median_max_salary_global'),
-        pl.n_unique('country_name').alias('n_countries_present')
-    ]
-    df_global_aggregated = df_joined.group_by('occupation_uri').agg(global_agg_expressions)
-    logging.info(f"Global aggregation complete. Shape: {df_global_aggregated.shape}")
-
-    # 2. Prepare data for Pivoting (Filter for target countries)
-    logging.info("Filtering data for country-specific pivoting...")
-    target_country_names = list(TARGET_COUNTRIES.values())
-    df_pivot_source = df_joined.filter(pl.col('country_name').is_in(target_country_names))
-    logging.info(f"Data for pivoting filtered. Shape: {df_pivot_source.shape}")
-
-    # 3. Pivot for Country-Specific Aggregates
-    # We need to aggregate *before* pivoting if multiple entries per occupation/country exist
-    # Although the source data seems aggregated, let's ensure it.
-    logging.info("Aggregating within country before pivoting...")
-    df_pivot_agg = df_pivot_source.group_by(['occupation_uri', 'country_name']).agg(
-        pl.sum('n_job_offers').alias('n_job_offers'),
-        pl.median('median_min_salary').alias('median_min_salary'),
-        pl.median('median_max_salary').alias('median_max_salary')
+        *[pl.col(sketch).alias(f'{name}_global') for name, sketch in SALARY_SKETCHES.items()],
+        pl.n_unique('country_name').alias('n_countries_present'),
+        *country_expressions,
     )
+    # Global medians merge the occupation's country sketches
+    return aggregated.with_columns(_map(aggregated[f'{name}_global'], lambda payloads: kll_quantile(payloads, 0.5),
+                                        pl.Float64) for name in SALARY_SKETCHES)
 
-    logging.info("Pivoting country-specific data...")
-    try:
-        df_pivoted = df_pivot_agg.pivot(
-            index='occupation_uri', 
-            on='country_name', 
-            values=['n_job_offers', 'median_min_salary', 'median_max_salary']
+
+def salary_sketches(cells, df_esco_base):
+    """Cells with the occupation's ISCO codes, for rollups by ISCO level or region."""
+    return df_esco_base.select(SKETCH_ID_COLUMNS).join(cells, on='occupation_uri', how='inner')
+
+
+def build_output(cells, df_esco_base):
+    """ESCO profiles with the job-offer aggregates attached (zero offers where none)."""
+    df_final = df_esco_base.join(occupation_aggregates(cells), on='occupation_uri', how='left')
+    # Counts are zero for occupations without offers; median salaries stay null
+    count_columns = [col for col in df_final.columns
+                     if col.startswith('total_job_offers_') or col == 'n_countries_present']
+    df_final = df_final.with_columns([pl.col(col).fill_null(0) for col in count_columns])
+    return df_final.drop('occupation_name_cleaned')
+
+
+def load_state():
+    """Stored cells and processed-file ledger (empty frames if there is no state yet)."""
+    if not os.path.exists(STATE_CELLS_PATH):
+        return pl.DataFrame(schema=CELLS_SCHEMA), pl.DataFrame(schema=FILES_SCHEMA)
+    return pl.read_parquet(STATE_CELLS_PATH), pl.read_parquet(STATE_FILES_PATH)
+
+
+def save_state(cells, files):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    write_keyed_parquet(cells, STATE_CELLS_PATH, key=CELL_KEY, bloom_columns=['occupation_uri'])
+    files.write_parquet(STATE_FILES_PATH)
+
+
+def read_offer_files(paths, df_esco_base):
+    """Cells and ledger rows for ``paths``."""
+    cells, files = [], []
+    processed_at = datetime.now(timezone.utc).isoformat()
+    for path in paths:
+        df_jobs = load_job_offers(path)
+        logging.info(f"Loaded {df_jobs.height} offer rows from: {path}")
+        cells.append(offer_cells(df_jobs, df_esco_base))
+        files.append({'path': os.path.abspath(path), 'sha256': file_digest(path), 'n_rows': df_jobs.height,
+                      'processed_at': processed_at})
+    return merge_cells(pl.DataFrame(schema=CELLS_SCHEMA), *cells), pl.DataFrame(files, schema=FILES_SCHEMA)
+
+
+def cell_drift(stored, recomputed, tolerance=DRIFT_TOLERANCE):
+    """Cells whose stored state differs from a full recompute.
+
+    Offer and salary counts must match exactly; sketches built in a different
+    merge order may compact differently, so medians may differ by ``tolerance``
+    (relative).
+    """
+    def summary(cells):
+        return cells.select(CELL_KEY + ['n_job_offers']).with_columns(
+            _map(cells[sketch], function, dtype, f'{sketch}_{stat}')
+            for sketch in SALARY_SKETCHES.values()
+            for stat, function, dtype in (('count', lambda payload: KLLSketch.from_bytes(payload).n, pl.Int64),
+                                          ('median', _median, pl.Float64))
         )
-        logging.info(f"Pivoting complete. Shape: {df_pivoted.shape}")
-        
-        # Rename pivoted columns to match desired format (e.g., n_job_offers_uk)
-        rename_mapping = {}
-        for short_code, full_name in TARGET_COUNTRIES.items():
-            rename_mapping[f'n_job_offers_{full_name}'] = f'total_job_offers_{short_code}'
-            rename_mapping[f'median_min_salary_{full_name}'] = f'median_min_salary_{short_code}'
-            rename_mapping[f'median_max_salary_{full_name}'] = f'median_max_salary_{short_code}'
-        
-        df_pivoted = df_pivoted.rename(rename_mapping)
-        logging.info("Pivoted columns renamed.")
-        
+
+    joined = summary(stored).join(summary(recomputed), on=CELL_KEY, how='full', coalesce=True, suffix='_full',
+                                  nulls_equal=True)
+    exact = [c for c in joined.columns if c == 'n_job_offers' or c.endswith('_count')]
+    medians = [c for c in joined.columns if c.endswith('_median')]
+    return joined.filter(pl.any_horizontal(
+        *[pl.col(c).ne_missing(pl.col(f'{c}_full')) for c in exact],
+        *[((pl.col(c) - pl.col(f'{c}_full')).abs() > tolerance * pl.col(f'{c}_full').abs())
+          .fill_null(pl.col(c).is_null() != pl.col(f'{c}_full').is_null()) for c in medians],
+    ))
+
+
+# --- Main Script Logic ---
+@instrumented_run("aggregate_job_offers")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate job offers by ESCO occupation")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--append', nargs='+', metavar='CSV',
+                      help="Merge these new offer files into the stored state (already processed files are skipped)")
+    mode.add_argument('--full', action='store_true',
+                      help="Recompute from every file in the state and report drift against the merged state")
+    args = parser.parse_args(argv)
+
+    logging.info(f"Loading ESCO profiles from: {ESCO_PROFILES_PARQUET_PATH}")
+    try:
+        df_esco_base = load_esco_profiles()
+        logging.info(f"ESCO profiles loaded and prepared. Shape: {df_esco_base.shape}")
     except Exception as e:
-        logging.error(f"Pivoting failed: {e}. This might happen if there are no rows for any target country after filtering.")
-        # Create an empty dataframe with occupation_uri if pivot fails, to allow subsequent joins
-        df_pivoted = pl.DataFrame({'occupation_uri': []}).with_columns(pl.col('occupation_uri').cast(df_joined['occupation_uri'].dtype))
-
-    # --- Final Joins and Save ---
-    logging.info("Joining base ESCO profiles with global aggregates...")
-    df_final = df_esco_base.join(
-        df_global_aggregated, 
-        on='occupation_uri', 
-        how='left'
-    )
+        logging.error(f"Failed to load or process ESCO profiles Parquet: {e}")
+        return 1
 
-    logging.info("Joining result with pivoted country-specific aggregates...")
-    df_final = df_final.join(
-        df_pivoted,
-        on='occupation_uri',
-        how='left'
-    )
-    
-    # Fill nulls for aggregated columns introduced by left joins
-    logging.info("Filling nulls for aggregated columns...")
-    
-    # Step 1: Fill global counts
-    global_cols_to_fill_zero = ['total_job_offers_global', 'n_countries_present']
-    df_final = df_final.with_columns([
-        pl.col(col).fill_null(0) for col in global_cols_to_fill_zero if col in df_final.columns
-    ])
-
-    # Step 2: Fill country-specific counts
-    country_cols_to_fill_zero = [col for col in df_final.columns if col.startswith('total_job_offers_')]
-    if country_cols_to_fill_zero:
-         df_final = df_final.with_columns([
-             pl.col(col).fill_null(0) for col in country_cols_to_fill_zero
-         ])
-    # Note: Median salary columns (global and country-specific) will remain null if no offers.
-
-    # Drop intermediate cleaning column
-    if 'occupation_name_cleaned' in df_final.columns:
-        df_final = df_final.drop('occupation_name_cleaned')
-        
+    stored_cells, stored_files = load_state()
+    if args.append:
+        if stored_files.is_empty():
+            logging.error(f"No state in {STATE_DIR}; run a full aggregation first.")
+            return 1
+        known = set(stored_files['sha256'])
+        new_paths = []
+        for path in args.append:
+            digest = file_digest(path)
+            if digest in known:
+                logging.info(f"Skipping already processed file: {path}")
+            else:
+                # Also skips repeats and identical copies within this call
+                known.add(digest)
+                new_paths.append(path)
+        if not new_paths:
+            logging.info("No new offer files; state and output are up to date.")
+            return 0
+        new_cells, new_files = read_offer_files(new_paths, df_esco_base)
+        cells = merge_cells(stored_cells, new_cells)
+        files = pl.concat([stored_files, new_files])
+        logging.info(f"Merged {new_cells.height} cells from {len(new_paths)} new file(s) into {stored_cells.height}.")
+    else:
+        paths = stored_files['path'].to_list() if args.full and not stored_files.is_empty() \
+            else [JOB_OFFERS_CSV_PATH]
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            logging.error(f"Offer files not found: {', '.join(missing)}")
+            return 1
+        if args.full and not stored_files.is_empty():
+            changed = [path for path, digest in zip(paths, stored_files['sha256'].to_list())
+                       if file_digest(path) != digest]
+            if changed:
+                logging.error(f"Offer files changed since they were merged: {', '.join(changed)}. Restore them, "
+                              f"or run without --full to rebuild the state from {JOB_OFFERS_CSV_PATH}.")
+                return 1
+        cells, files = read_offer_files(paths, df_esco_base)
+        if args.full and not stored_cells.is_empty():
+            drift = cell_drift(stored_cells, cells)
+            if drift.is_empty():
+                logging.info(f"No drift: the merged state matches a full recompute of {len(paths)} file(s).")
+            else:
+                logging.warning(f"Drift in {drift.height} of {cells.height} cells; replacing the state with the "
+                                f"full recompute.")
+
+    save_state(cells, files)
+    logging.info(f"State saved to {STATE_DIR}: {cells.height} cells from {files.height} file(s).")
+
+    df_final = build_output(cells, df_esco_base)
     logging.info(f"Final joins complete. Final shape: {df_final.shape}")
 
     # Save the result
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     logging.info(f"Saving aggregated data to: {OUTPUT_PATH}")
     try:
-        df_final.write_parquet(OUTPUT_PATH)
-        logging.info("Successfully saved aggregated job offers data.")
+        write_keyed_parquet(df_final, OUTPUT_PATH, key='occupation_uri')
+        write_keyed_parquet(salary_sketches(cells, df_esco_base), SKETCHES_PATH, key=CELL_KEY,
+                            bloom_columns=['occupation_uri'])
+        logging.info(f"Successfully saved aggregated job offers data and salary sketches ({SKETCHES_PATH}).")
     except Exception as e:
         logging.error(f"Failed to save final Parquet file: {e}")
+        return 1
+    return 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
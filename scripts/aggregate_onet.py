@@ -1,314 +1,259 @@
+import argparse
 import os
+import sys
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import duckdb
 import polars as pl
+import pyarrow as pa
+
+# Add the project root to the path to allow importing from src
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from src.etl.oews import load_oews, soc_code_expr
+from src.utils.instrumentation import current_span, instrumented_run, query_arrow, span
+from src.utils.parquet_io import write_keyed_parquet
+from src.utils.resources import connect
 
 # --- Configuration ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-ONET_DB_PATH = 'data/duckdb/onet_dataset_29.2.duckdb'
-OUTPUT_DIR = 'data/processed/onet'
+ONET_DB_PATH = os.path.join(PROJECT_ROOT, 'data', 'duckdb', 'onet_dataset_29.2.duckdb')
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'data', 'processed', 'onet')
 OUTPUT_FILENAME = 'onet_occupations_aggregated.parquet'
 OUTPUT_PATH = os.path.join(OUTPUT_DIR, OUTPUT_FILENAME)
 
 # --- OEWS Salary Data Config ---
-OEWS_SALARY_PATH = 'data/raw/OEWS/national_M2024_dl.xlsx'
-OEWS_OCC_CODE_COL = 'OCC_CODE' # Expected OCC Code column name in OEWS
+OEWS_YEAR = 2024 # OEWS release joined to the O*NET aggregates
 OEWS_SALARY_COLS = ['A_MEDIAN', 'A_PCT25', 'A_PCT75'] # Salary columns to fetch
 OEWS_EXTRA_COLS = ['TOT_EMP', 'EMP_PRSE', 'MEAN_PRSE', 'OCC_TITLE'] # Additional OEWS cols
-OEWS_NUMERIC_EXTRA_COLS = ['TOT_EMP', 'EMP_PRSE', 'MEAN_PRSE'] # Extra cols needing numeric cleaning
-OEWS_NULL_VALUES = ['*', '#'] # Values representing nulls in OEWS salary data
-
-# Helper to run a SQL query against the DuckDB file and return a Polars DataFrame
-def _query_pl(con: duckdb.DuckDBPyConnection, sql: str) -> pl.DataFrame:
-    """Execute SQL and return result as Polars DataFrame."""
-    return con.sql(sql).pl()
-
-def main() -> None:
-    if not os.path.exists(ONET_DB_PATH):
-        logging.error(f"ONET database not found at {ONET_DB_PATH}")
-        return
 
-    logging.info(f"Connecting to ONET database: {ONET_DB_PATH}")
-    con = duckdb.connect(ONET_DB_PATH, read_only=True)
+# --- O*NET aggregate queries (independent and read-only, so they can run concurrently) ---
+MAX_QUERY_WORKERS = 4 # Concurrent queries incl. the OEWS load (1 = serial); see --workers
+DUCKDB_THREADS = None # DuckDB threads shared by the queries (None = execution profile); see --duckdb-threads
 
-    # ---------------------------------------------------------
+ONET_QUERIES = {
     # 1. Base occupation metadata (one row per occupation)
-    # ---------------------------------------------------------
-    logging.info("Loading base occupation metadata (occupation_data)")
-    base_df = _query_pl(
-        con,
-        """
-            SELECT onetsoc_code, title AS occupation_title, description AS occupation_description
-            FROM occupation_data
-        """
-    )
-    logging.info(f"Base occupation rows: {base_df.height}")
-
-    # ---------------------------------------------------------
+    "base_occupations": """
+        SELECT onetsoc_code, title AS occupation_title, description AS occupation_description
+        FROM occupation_data
+    """,
     # 2. Job zone information
-    # ---------------------------------------------------------
-    logging.info("Aggregating job zone information")
-    job_zone_df = _query_pl(
-        con,
-        """
-            SELECT onetsoc_code, FIRST(job_zone) AS job_zone
-            FROM job_zones
-            GROUP BY onetsoc_code
-        """
-    )
-
-    # ---------------------------------------------------------
+    "job_zones": """
+        SELECT onetsoc_code, FIRST(job_zone) AS job_zone
+        FROM job_zones
+        GROUP BY onetsoc_code
+    """,
     # 3. Alternate title counts
-    # ---------------------------------------------------------
-    logging.info("Counting alternate titles")
-    alt_title_df = _query_pl(
-        con,
-        """
-            SELECT onetsoc_code, COUNT(DISTINCT alternate_title) AS n_alternate_titles
-            FROM alternate_titles
-            GROUP BY onetsoc_code
-        """
-    )
-
-    # ---------------------------------------------------------
+    "alternate_titles": """
+        SELECT onetsoc_code, COUNT(DISTINCT alternate_title) AS n_alternate_titles
+        FROM alternate_titles
+        GROUP BY onetsoc_code
+    """,
     # 4. Skills (Count, Avg Importance/Level, List) - Filtered by P75 Level
-    # ---------------------------------------------------------
-    logging.info("Aggregating skills (P75 Level filter)")
-    skills_agg_sql = """
-        WITH SkillLevels AS (
-            SELECT onetsoc_code, skill_name, skill_level
-            FROM occupation_skills
-            WHERE scale_id = 'LV'
-        ),
-        SkillP75 AS (
-            SELECT
-                onetsoc_code,
-                PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY skill_level) AS p75_skill_level
-            FROM SkillLevels
-            GROUP BY onetsoc_code
-        ),
-        SignificantSkills AS (
-            SELECT sl.onetsoc_code, sl.skill_name
-            FROM SkillLevels sl
-            JOIN SkillP75 p75 ON sl.onetsoc_code = p75.onetsoc_code
-            WHERE sl.skill_level >= p75.p75_skill_level
-        )
+    "skills": """
+    WITH SkillLevels AS (
+        SELECT onetsoc_code, skill_name, skill_level
+        FROM occupation_skills
+        WHERE scale_id = 'LV'
+    ),
+    SkillP75 AS (
         SELECT
-            os.onetsoc_code,
-            COUNT(DISTINCT os.skill_name) AS n_skills,
-            ROUND(AVG(CASE WHEN os.scale_id = 'IM' THEN os.skill_level END), 2) AS avg_skill_importance,
-            ROUND(AVG(CASE WHEN os.scale_id = 'LV' THEN os.skill_level END), 2) AS avg_skill_level,
-            list(DISTINCT os.skill_name ORDER BY os.skill_name) AS skills_list
-        FROM occupation_skills os
-        JOIN SignificantSkills ss ON os.onetsoc_code = ss.onetsoc_code AND os.skill_name = ss.skill_name
-        GROUP BY os.onetsoc_code;
-    """
-    skills_df = _query_pl(con, skills_agg_sql)
-
-    # ---------------------------------------------------------
+            onetsoc_code,
+            PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY skill_level) AS p75_skill_level
+        FROM SkillLevels
+        GROUP BY onetsoc_code
+    ),
+    SignificantSkills AS (
+        SELECT sl.onetsoc_code, sl.skill_name
+        FROM SkillLevels sl
+        JOIN SkillP75 p75 ON sl.onetsoc_code = p75.onetsoc_code
+        WHERE sl.skill_level >= p75.p75_skill_level
+    )
+    SELECT
+        os.onetsoc_code,
+        COUNT(DISTINCT os.skill_name) AS n_skills,
+        ROUND(AVG(CASE WHEN os.scale_id = 'IM' THEN os.skill_level END), 2) AS avg_skill_importance,
+        ROUND(AVG(CASE WHEN os.scale_id = 'LV' THEN os.skill_level END), 2) AS avg_skill_level,
+        list(DISTINCT os.skill_name ORDER BY os.skill_name) AS skills_list
+    FROM occupation_skills os
+    JOIN SignificantSkills ss ON os.onetsoc_code = ss.onetsoc_code AND os.skill_name = ss.skill_name
+    GROUP BY os.onetsoc_code;
+""",
     # 5. Knowledge Areas (Count, Avg Importance/Level, List) - Filtered by P75 Level
-    # ---------------------------------------------------------
-    logging.info("Aggregating knowledge areas (P75 Level filter)")
-    knowledge_agg_sql = """
-        WITH KnowledgeLevels AS (
-            SELECT onetsoc_code, knowledge_area, knowledge_level
-            FROM occupation_knowledge
-            WHERE scale_id = 'LV'
-        ),
-        KnowledgeP75 AS (
-            SELECT
-                onetsoc_code,
-                PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY knowledge_level) AS p75_knowledge_level
-            FROM KnowledgeLevels
-            GROUP BY onetsoc_code
-        ),
-        SignificantKnowledge AS (
-            SELECT kl.onetsoc_code, kl.knowledge_area
-            FROM KnowledgeLevels kl
-            JOIN KnowledgeP75 p75 ON kl.onetsoc_code = p75.onetsoc_code
-            WHERE kl.knowledge_level >= p75.p75_knowledge_level
-        )
+    "knowledge": """
+    WITH KnowledgeLevels AS (
+        SELECT onetsoc_code, knowledge_area, knowledge_level
+        FROM occupation_knowledge
+        WHERE scale_id = 'LV'
+    ),
+    KnowledgeP75 AS (
         SELECT
-            ok.onetsoc_code,
-            COUNT(DISTINCT ok.knowledge_area) AS n_knowledge_areas,
-            ROUND(AVG(CASE WHEN ok.scale_id = 'IM' THEN ok.knowledge_level END), 2) AS avg_knowledge_importance,
-            ROUND(AVG(CASE WHEN ok.scale_id = 'LV' THEN ok.knowledge_level END), 2) AS avg_knowledge_level,
-            list(DISTINCT ok.knowledge_area ORDER BY ok.knowledge_area) AS knowledge_list
-        FROM occupation_knowledge ok
-        JOIN SignificantKnowledge sk ON ok.onetsoc_code = sk.onetsoc_code AND ok.knowledge_area = sk.knowledge_area
-        GROUP BY ok.onetsoc_code;
-    """
-    knowledge_df = _query_pl(con, knowledge_agg_sql)
-
-    # ---------------------------------------------------------
+            onetsoc_code,
+            PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY knowledge_level) AS p75_knowledge_level
+        FROM KnowledgeLevels
+        GROUP BY onetsoc_code
+    ),
+    SignificantKnowledge AS (
+        SELECT kl.onetsoc_code, kl.knowledge_area
+        FROM KnowledgeLevels kl
+        JOIN KnowledgeP75 p75 ON kl.onetsoc_code = p75.onetsoc_code
+        WHERE kl.knowledge_level >= p75.p75_knowledge_level
+    )
+    SELECT
+        ok.onetsoc_code,
+        COUNT(DISTINCT ok.knowledge_area) AS n_knowledge_areas,
+        ROUND(AVG(CASE WHEN ok.scale_id = 'IM' THEN ok.knowledge_level END), 2) AS avg_knowledge_importance,
+        ROUND(AVG(CASE WHEN ok.scale_id = 'LV' THEN ok.knowledge_level END), 2) AS avg_knowledge_level,
+        list(DISTINCT ok.knowledge_area ORDER BY ok.knowledge_area) AS knowledge_list
+    FROM occupation_knowledge ok
+    JOIN SignificantKnowledge sk ON ok.onetsoc_code = sk.onetsoc_code AND ok.knowledge_area = sk.knowledge_area
+    GROUP BY ok.onetsoc_code;
+""",
     # 6. Abilities (Count, Avg Importance/Level, List) - Filtered by P75 Level
-    # ---------------------------------------------------------
-    logging.info("Aggregating abilities (P75 Level filter)")
-    abilities_agg_sql = """
-        WITH AbilityLevels AS (
-            SELECT onetsoc_code, element_name, data_value AS ability_level
-            FROM abilities
-            WHERE scale_id = 'LV'
-        ),
-        AbilityP75 AS (
-            SELECT
-                onetsoc_code,
-                PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY ability_level) AS p75_ability_level
-            FROM AbilityLevels
-            GROUP BY onetsoc_code
-        ),
-        SignificantAbilities AS (
-            SELECT al.onetsoc_code, al.element_name
-            FROM AbilityLevels al
-            JOIN AbilityP75 p75 ON al.onetsoc_code = p75.onetsoc_code
-            WHERE al.ability_level >= p75.p75_ability_level
-        )
+    "abilities": """
+    WITH AbilityLevels AS (
+        SELECT onetsoc_code, element_name, data_value AS ability_level
+        FROM abilities
+        WHERE scale_id = 'LV'
+    ),
+    AbilityP75 AS (
         SELECT
-            a.onetsoc_code,
-            COUNT(DISTINCT a.element_name) AS n_abilities,
-            ROUND(AVG(CASE WHEN a.scale_id = 'IM' THEN a.data_value END), 2) AS avg_ability_importance,
-            ROUND(AVG(CASE WHEN a.scale_id = 'LV' THEN a.data_value END), 2) AS avg_ability_level,
-            list(DISTINCT a.element_name ORDER BY a.element_name) AS abilities_list
-        FROM abilities a
-        JOIN SignificantAbilities sa ON a.onetsoc_code = sa.onetsoc_code AND a.element_name = sa.element_name
-        GROUP BY a.onetsoc_code;
-    """
-    abilities_df = _query_pl(con, abilities_agg_sql)
-
-    # ---------------------------------------------------------
+            onetsoc_code,
+            PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY ability_level) AS p75_ability_level
+        FROM AbilityLevels
+        GROUP BY onetsoc_code
+    ),
+    SignificantAbilities AS (
+        SELECT al.onetsoc_code, al.element_name
+        FROM AbilityLevels al
+        JOIN AbilityP75 p75 ON al.onetsoc_code = p75.onetsoc_code
+        WHERE al.ability_level >= p75.p75_ability_level
+    )
+    SELECT
+        a.onetsoc_code,
+        COUNT(DISTINCT a.element_name) AS n_abilities,
+        ROUND(AVG(CASE WHEN a.scale_id = 'IM' THEN a.data_value END), 2) AS avg_ability_importance,
+        ROUND(AVG(CASE WHEN a.scale_id = 'LV' THEN a.data_value END), 2) AS avg_ability_level,
+        list(DISTINCT a.element_name ORDER BY a.element_name) AS abilities_list
+    FROM abilities a
+    JOIN SignificantAbilities sa ON a.onetsoc_code = sa.onetsoc_code AND a.element_name = sa.element_name
+    GROUP BY a.onetsoc_code;
+""",
     # 7. Work Activities (Count, Avg Importance/Level, List) - Filtered by P75 Level
-    # ---------------------------------------------------------
-    logging.info("Aggregating work activities (P75 Level filter)")
-    work_activities_agg_sql = """
-        WITH ActivityLevels AS (
-            SELECT onetsoc_code, activity, activity_level
-            FROM occupation_work_activities
-            WHERE scale_id = 'LV'
-        ),
-        ActivityP75 AS (
-            SELECT
-                onetsoc_code,
-                PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY activity_level) AS p75_activity_level
-            FROM ActivityLevels
-            GROUP BY onetsoc_code
-        ),
-        SignificantActivities AS (
-            SELECT acl.onetsoc_code, acl.activity
-            FROM ActivityLevels acl
-            JOIN ActivityP75 p75 ON acl.onetsoc_code = p75.onetsoc_code
-            WHERE acl.activity_level >= p75.p75_activity_level
-        )
+    "work_activities": """
+    WITH ActivityLevels AS (
+        SELECT onetsoc_code, activity, activity_level
+        FROM occupation_work_activities
+        WHERE scale_id = 'LV'
+    ),
+    ActivityP75 AS (
         SELECT
-            owa.onetsoc_code,
-            COUNT(DISTINCT owa.activity) AS n_work_activities,
-            ROUND(AVG(CASE WHEN owa.scale_id = 'IM' THEN owa.activity_level END), 2) AS avg_activity_importance,
-            ROUND(AVG(CASE WHEN owa.scale_id = 'LV' THEN owa.activity_level END), 2) AS avg_activity_level,
-            list(DISTINCT owa.activity ORDER BY owa.activity) AS work_activities_list
-        FROM occupation_work_activities owa
-        JOIN SignificantActivities sa ON owa.onetsoc_code = sa.onetsoc_code AND owa.activity = sa.activity
-        GROUP BY owa.onetsoc_code;
-    """
-    activities_df = _query_pl(con, work_activities_agg_sql)
-
-    # ---------------------------------------------------------
+            onetsoc_code,
+            PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY activity_level) AS p75_activity_level
+        FROM ActivityLevels
+        GROUP BY onetsoc_code
+    ),
+    SignificantActivities AS (
+        SELECT acl.onetsoc_code, acl.activity
+        FROM ActivityLevels acl
+        JOIN ActivityP75 p75 ON acl.onetsoc_code = p75.onetsoc_code
+        WHERE acl.activity_level >= p75.p75_activity_level
+    )
+    SELECT
+        owa.onetsoc_code,
+        COUNT(DISTINCT owa.activity) AS n_work_activities,
+        ROUND(AVG(CASE WHEN owa.scale_id = 'IM' THEN owa.activity_level END), 2) AS avg_activity_importance,
+        ROUND(AVG(CASE WHEN owa.scale_id = 'LV' THEN owa.activity_level END), 2) AS avg_activity_level,
+        list(DISTINCT owa.activity ORDER BY owa.activity) AS work_activities_list
+    FROM occupation_work_activities owa
+    JOIN SignificantActivities sa ON owa.onetsoc_code = sa.onetsoc_code AND owa.activity = sa.activity
+    GROUP BY owa.onetsoc_code;
+""",
     # 8. Technology Skills (Count, List)
-    # ---------------------------------------------------------
-    logging.info("Aggregating technology skills")
-    tech_skills_agg_sql = """
-        SELECT
-            ts.onetsoc_code,
-            COUNT(DISTINCT ts.commodity_title) AS n_technology_skills,
-            list(DISTINCT ts.commodity_title ORDER BY ts.commodity_title) AS tech_skills_list
-        FROM technology_skills ts
-        GROUP BY ts.onetsoc_code
+    "technology_skills": """
+    SELECT
+        ts.onetsoc_code,
+        COUNT(DISTINCT ts.commodity_title) AS n_technology_skills,
+        list(DISTINCT ts.commodity_title ORDER BY ts.commodity_title) AS tech_skills_list
+    FROM technology_skills ts
+    GROUP BY ts.onetsoc_code
+""",
+}
+
+# Run one aggregate query on its own cursor of the shared read-only connection
+def _run_query(con: duckdb.DuckDBPyConnection, stage: str, sql: str, parent) -> pa.Table:
+    """Execute SQL in a timed, profiled span on a new cursor and return it as Arrow."""
+    cursor = con.cursor()
+    try:
+        with span(stage, parent=parent) as s:
+            table = query_arrow(cursor, sql)
+            s.rows(output=table.num_rows)
+    finally:
+        cursor.close()
+    return table
+
+# 9. Load OEWS Salary Data (typed, cached per release year)
+def _load_salaries(parent) -> pl.DataFrame:
+    with span("oews_salaries", parent=parent) as s:
+        df_salary = load_oews(year=OEWS_YEAR, columns=OEWS_SALARY_COLS + OEWS_EXTRA_COLS)
+        s.rows(output=df_salary.height)
+    return df_salary
+
+def run_aggregates(con: duckdb.DuckDBPyConnection, workers: int = MAX_QUERY_WORKERS):
+    """Run the O*NET queries and the OEWS load, concurrently when workers > 1.
+
+    The OEWS load is submitted first so it overlaps with the DuckDB work.
+    Returns the query results as Arrow tables keyed by stage, and the OEWS frame.
     """
-    tech_skills_df = _query_pl(con, tech_skills_agg_sql)
+    parent = current_span()
+    if workers <= 1:
+        tables = {stage: _run_query(con, stage, sql, parent) for stage, sql in ONET_QUERIES.items()}
+        return tables, _load_salaries(parent)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        salary_future = pool.submit(_load_salaries, parent)
+        futures = {stage: pool.submit(_run_query, con, stage, sql, parent) for stage, sql in ONET_QUERIES.items()}
+        tables = {stage: future.result() for stage, future in futures.items()}
+        return tables, salary_future.result()
+
+@instrumented_run("aggregate_onet")
+def main(workers: int = MAX_QUERY_WORKERS, duckdb_threads: int = DUCKDB_THREADS) -> None:
+    if not os.path.exists(ONET_DB_PATH):
+        logging.error(f"ONET database not found at {ONET_DB_PATH}")
+        return
 
-    con.close() # Close DuckDB connection
+    logging.info(f"Connecting to ONET database: {ONET_DB_PATH}")
+    con = connect(ONET_DB_PATH, read_only=True, threads=duckdb_threads)
 
     # ---------------------------------------------------------
-    # 9. Load and Prepare OEWS Salary Data
+    # 1-9. O*NET aggregates and OEWS salaries (see ONET_QUERIES)
     # ---------------------------------------------------------
-    logging.info(f"Loading OEWS salary data from: {OEWS_SALARY_PATH}")
-    try:
-        df_salary = pl.read_excel(
-            OEWS_SALARY_PATH # Read without null_values argument
-        )
-        logging.info(f"OEWS salary data loaded. Shape: {df_salary.shape}")
-
-        # Select and rename necessary columns
-        cols_to_select_from_oews = [OEWS_OCC_CODE_COL] + OEWS_SALARY_COLS + OEWS_EXTRA_COLS
-        df_salary = df_salary.select(cols_to_select_from_oews)
-
-        # Rename OCC code column for clarity before join
-        df_salary = df_salary.rename({
-            OEWS_OCC_CODE_COL: 'soc_code',
-            'OCC_TITLE': 'occupation_group_title' # Rename OCC_TITLE
-        })
+    logging.info(f"Running {len(ONET_QUERIES)} O*NET queries and the OEWS {OEWS_YEAR} load with {workers} worker(s)")
+    tables, df_salary = run_aggregates(con, workers)
+    con.close() # Close DuckDB connection
 
-        # Replace specific strings with nulls in salary columns before casting
-        cols_to_clean = OEWS_SALARY_COLS + OEWS_NUMERIC_EXTRA_COLS
-        for col in cols_to_clean:
-            for null_val in OEWS_NULL_VALUES:
-                df_salary = df_salary.with_columns(
-                    # Explicitly cast to string for comparison
-                    pl.when(pl.col(col).cast(pl.Utf8) == null_val)
-                    .then(None)
-                    .otherwise(pl.col(col))
-                    .alias(col)
-                )
-        logging.info(f"Replaced {OEWS_NULL_VALUES} with nulls in salary columns.")
+    run = current_span()
+    for stage_span in run.children if run is not None else []:
+        logging.info(f"  {stage_span.name:<20} {stage_span.wall_s:8.3f}s  {stage_span.rows_out} rows")
 
-        # Now, convert salary columns to Float64, errors -> null
-        # Convert TOT_EMP to Int64, others to Float64
-        for col in OEWS_SALARY_COLS:
-            df_salary = df_salary.with_columns(
-                pl.col(col).cast(pl.Float64, strict=False).alias(col)
-            )
-        if 'TOT_EMP' in df_salary.columns:
-             df_salary = df_salary.with_columns(
-                 pl.col('TOT_EMP').cast(pl.Int64, strict=False).alias('TOT_EMP')
-             )
-        for col in ['EMP_PRSE', 'MEAN_PRSE']:
-             if col in df_salary.columns:
-                 df_salary = df_salary.with_columns(
-                     pl.col(col).cast(pl.Float64, strict=False).alias(col)
-                 )
-        logging.info("OEWS salary columns selected, renamed, and cast to float.")
+    frames = {stage: pl.from_arrow(table) for stage, table in tables.items()}
+    base_df = frames.pop("base_occupations")
+    logging.info(f"Base occupation rows: {base_df.height}")
 
-    except Exception as e:
-        logging.error(f"Failed to load or process OEWS salary data: {e}")
-        # Optionally, decide if you want to proceed without salary data or exit
-        # For now, we'll create an empty placeholder if loading fails
-        df_salary = pl.DataFrame({
-            'soc_code': [],
-            **{col: [] for col in OEWS_SALARY_COLS},
-            **{col: [] for col in OEWS_EXTRA_COLS}
-        }).with_columns([
-            pl.col('soc_code').cast(pl.Utf8),
-            *[pl.col(col).cast(pl.Float64) for col in OEWS_SALARY_COLS],
-            pl.col('TOT_EMP').cast(pl.Int64),
-            pl.col('occupation_group_title').cast(pl.Utf8), # Add schema for placeholder
-            pl.col('EMP_PRSE').cast(pl.Float64),
-            pl.col('MEAN_PRSE').cast(pl.Float64),
-        ])
-        logging.warning("Proceeding without salary data due to loading error.")
+    if df_salary.height == 0:
+        logging.warning(f"No OEWS release found for {OEWS_YEAR}; salary columns will be null.")
+    df_salary = df_salary.select(['soc_code'] + OEWS_SALARY_COLS + OEWS_EXTRA_COLS).rename({
+        'OCC_TITLE': 'occupation_group_title' # Rename OCC_TITLE
+    })
+    logging.info(f"OEWS salary data loaded. Shape: {df_salary.shape}")
 
     # ---------------------------------------------------------
     # 10. Merge all ONET aggregates
     # ---------------------------------------------------------
     logging.info("Merging all ONET aggregates into final DataFrame")
     df_final = base_df
-    joins = [
-        job_zone_df,
-        alt_title_df,
-        skills_df,
-        knowledge_df,
-        abilities_df,
-        activities_df,
-        tech_skills_df,
-    ]
+    joins = list(frames.values()) # job zones, alternate titles, the four domains, technology skills
 
     for join_df in joins:
         df_final = df_final.join(join_df, on='onetsoc_code', how='left')
@@ -319,9 +264,7 @@ def main() -> None:
     # 12. Join with Salary Data
     # ---------------------------------------------------------
     # Prepare join key: Create SOC code (XX-XXXX) from ONET code (XX-XXXX.XX)
-    df_final = df_final.with_columns(
-        pl.col("onetsoc_code").str.slice(0, 7).alias("soc_code")
-    )
+    df_final = df_final.with_columns(soc_code_expr("onetsoc_code"))
 
     # Perform the join
     df_final = df_final.join(df_salary, on='soc_code', how='left')
@@ -388,17 +331,21 @@ def main() -> None:
 
     logging.info(f"Final DataFrame shape after reorder: {df_final.shape}")
 
-    # Sort by Total Employment descending if the column exists
-    if 'TOT_EMP' in df_final.columns:
-        df_final = df_final.sort('TOT_EMP', descending=True, nulls_last=True)
-        logging.info("Sorted DataFrame by TOT_EMP descending.")
-
     # Ensure output directory exists
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
     logging.info(f"Writing Parquet to {OUTPUT_PATH}")
-    df_final.write_parquet(OUTPUT_PATH)
+    with span("write_output") as s:
+        # Sorted by onetsoc_code with small row groups, so single-occupation reads touch one group
+        write_keyed_parquet(df_final, OUTPUT_PATH, key='onetsoc_code')
+        s.rows(output=df_final.height)
     logging.info("Aggregation completed successfully")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Aggregate O*NET occupations with OEWS salaries")
+    parser.add_argument("--workers", type=int, default=MAX_QUERY_WORKERS,
+                        help="Concurrent queries incl. the OEWS load (1 = serial)")
+    parser.add_argument("--duckdb-threads", type=int, default=DUCKDB_THREADS,
+                        help="DuckDB threads shared by the concurrent queries")
+    args = parser.parse_args()
+    main(workers=args.workers, duckdb_threads=args.duckdb_threads)
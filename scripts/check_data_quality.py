@@ -0,0 +1,90 @@
+import polars as pl
+import logging
+import os
+import sys
+
+# Add the project root to the path to allow importing from src
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from src.utils.data_quality import (
+    Dataset, NotNull, References, RowCondition, UniqueKey, format_report, run_checks, write_report,
+)
+from src.utils.instrumentation import instrumented_run
+
+# --- Configuration ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+RAW_OCCUPATIONS_CSV_PATH = os.path.join(PROJECT_ROOT, 'data', 'raw', 'esco', '1.2.0', 'occupations_en.csv') # Path to raw occupations
+RAW_ISCO_GROUPS_CSV_PATH = os.path.join(PROJECT_ROOT, 'data', 'raw', 'esco', '1.2.0', 'ISCOGroups_en.csv')
+JOB_OFFERS_CSV_PATH = os.path.join(PROJECT_ROOT, 'data', 'raw', 'datamarket', 'datamarket_job_offers_victoriano.csv')
+ESCO_PROFILES_PARQUET_PATH = os.path.join(PROJECT_ROOT, 'data', 'processed', 'esco', 'esco_occupation_profiles.parquet')
+ISCO_HIERARCHY_PARQUET_PATH = os.path.join(PROJECT_ROOT, 'data', 'derived', 'isco_hierarchy.parquet') # Path to hierarchy
+TARGET_COUNTRY = 'United Kingdom'
+
+# --- Database and View Paths (needed for view check) ---
+DB_PATH = os.path.join(PROJECT_ROOT, 'data', 'duckdb', 'esco_dataset_1.2.0.duckdb')
+VIEW_SQL_PATH = os.path.join(PROJECT_ROOT, 'sql', 'esco', 'occupation_profile_view.sql')
+
+
+def occupation_profile_view_setup(view_sql_path):
+    """The view definition as a TEMP view, so the database can stay read-only."""
+    if not os.path.exists(view_sql_path):
+        return []
+    with open(view_sql_path, 'r', encoding='utf-8') as f:
+        view_sql = f.read()
+    return [view_sql.replace("CREATE OR REPLACE VIEW", "CREATE OR REPLACE TEMP VIEW", 1)]
+
+
+def datasets():
+    """The declarative rule set: one Dataset per file, all rules checked in one pass."""
+    return [
+        Dataset('raw_occupations', RAW_OCCUPATIONS_CSV_PATH, schema_overrides={'iscoGroup': pl.Utf8, 'code': pl.Utf8}, rules=[
+            UniqueKey(('conceptUri',)),
+            UniqueKey(('preferredLabel',), strip=True),
+            NotNull(('conceptUri', 'preferredLabel', 'iscoGroup')),
+            References('iscoGroup', RAW_ISCO_GROUPS_CSV_PATH, 'code'),
+        ]),
+        Dataset('job_offers', JOB_OFFERS_CSV_PATH, rules=[
+            UniqueKey(('esco_role', 'country_name'), strip=True),
+            UniqueKey(('esco_role',), strip=True, where=pl.col('country_name') == TARGET_COUNTRY,
+                      name=f"unique(esco_role) in {TARGET_COUNTRY}"),
+            NotNull(('esco_role', 'country_name')),
+            RowCondition(pl.col('n_job_offers') >= 0, name="n_job_offers >= 0"),
+            RowCondition(
+                pl.col('median_min_salary').is_null() | pl.col('median_max_salary').is_null()
+                | (pl.col('median_min_salary') <= pl.col('median_max_salary')),
+                name="median_min_salary <= median_max_salary",
+            ),
+        ]),
+        Dataset('esco_profiles', ESCO_PROFILES_PARQUET_PATH, rules=[
+            UniqueKey(('occupation_uri',)),
+            UniqueKey(('occupation_name',), strip=True),
+            NotNull(('occupation_uri', 'isco_group')),
+            References('isco_group', ISCO_HIERARCHY_PARQUET_PATH, 'code'),
+        ]),
+        Dataset('occupation_profile_view', DB_PATH, query="SELECT * FROM occupation_profile",
+                setup=occupation_profile_view_setup(VIEW_SQL_PATH), rules=[
+            UniqueKey(('occupation_uri',)),
+            UniqueKey(('occupation_name',), strip=True),
+        ]),
+        Dataset('isco_hierarchy', ISCO_HIERARCHY_PARQUET_PATH, rules=[
+            UniqueKey(('code',)),
+            NotNull(('code', 'label', 'level')),
+            References('parent_code', ISCO_HIERARCHY_PARQUET_PATH, 'code'),
+        ]),
+    ]
+
+
+# --- Main Script Logic ---
+@instrumented_run("check_data_quality")
+def main():
+    report = run_checks(datasets())
+    print(format_report(report))
+    report_path = write_report(report)
+    logging.info(f"Data-quality report written to {report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main()["passed"] else 1)
@@ -1,15 +1,23 @@
-import duckdb
 import polars as pl
 import os
+import sys
 import logging
 
+# Add the project root to the path to allow importing from src
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from src.utils.instrumentation import instrumented_run
+from src.utils.parquet_io import write_keyed_parquet
+from src.utils.resources import connect
+
 # --- Configuration ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-DB_PATH = 'data/duckdb/esco_dataset_1.2.0.duckdb'
-VIEW_SQL_PATH = 'sql/esco/occupation_profile_view.sql'
-HIGH_HIERARCHY_PATH = 'data/derived/isco_hierarchy.parquet' # Path to the hierarchy file
-OUTPUT_DIR = 'data/processed/esco'
+DB_PATH = os.path.join(PROJECT_ROOT, 'data', 'duckdb', 'esco_dataset_1.2.0.duckdb')
+VIEW_SQL_PATH = os.path.join(PROJECT_ROOT, 'sql', 'esco', 'occupation_profile_view.sql')
+HIGH_HIERARCHY_PATH = os.path.join(PROJECT_ROOT, 'data', 'derived', 'isco_hierarchy.parquet') # Path to the hierarchy file
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'data', 'processed', 'esco')
 OUTPUT_FILENAME = 'esco_occupation_profiles.parquet'
 OUTPUT_PATH = os.path.join(OUTPUT_DIR, OUTPUT_FILENAME)
 
@@ -45,16 +53,17 @@ def _process_raw_alt_name_to_list(raw_name):
 
     return cleaned_labels if cleaned_labels else None # Return None if list is empty
 
+@instrumented_run("esco_occupations")
 def main():
     logging.info(f"Connecting to database: {DB_PATH}")
     try:
-        con = duckdb.connect(database=DB_PATH, read_only=False)
+        con = connect(database=DB_PATH, read_only=False)
     except Exception as e:
         logging.error(f"Failed to connect to database: {e}")
         exit(1)
         
     # --- Explicitly create base views from CSVs with correct types ---
-    RAW_ESCO_DIR = 'data/raw/esco/1.2.0'
+    RAW_ESCO_DIR = os.path.join(PROJECT_ROOT, 'data', 'raw', 'esco', '1.2.0')
     csv_configs = {
         'occupations_en': {'path': os.path.join(RAW_ESCO_DIR, 'occupations_en.csv'), 'dtypes': {'conceptUri': 'VARCHAR', 'iscoGroup': 'VARCHAR'}},
         'ISCOGroups_en': {'path': os.path.join(RAW_ESCO_DIR, 'ISCOGroups_en.csv'), 'dtypes': {'code': 'VARCHAR', 'conceptUri': 'VARCHAR'}},
@@ -298,7 +307,7 @@ def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     logging.info(f"Saving final data to Parquet file: {OUTPUT_PATH}")
     try:
-        df.write_parquet(OUTPUT_PATH)
+        write_keyed_parquet(df, OUTPUT_PATH, key='occupation_uri')
         logging.info("Successfully saved Parquet file.")
     except Exception as e:
         logging.error(f"Error writing Parquet file: {e}")
@@ -1,78 +1,130 @@
 import polars as pl
 import os
+import sys
 
-# Define paths relative to the project root directory
-# Assumes the script is run from the project root
-input_file = "data/raw/ine-dirce/39371.csv"
-output_dir = "data/derived" # Changed output directory
-output_file = os.path.join(output_dir, "ine_dirce_empresas_filtered.parquet")
+# Add the project root to the path to allow importing from src
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
 
-# Ensure output directory exists
-os.makedirs(output_dir, exist_ok=True)
+from src.analysis.dirce_strata import STRATA
+from src.utils.instrumentation import instrumented_run
 
-print(f"Reading file: {input_file}")
+INPUT_FILE = os.path.join(PROJECT_ROOT, "data", "raw", "ine_dirce", "39371.csv")
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data", "derived")
+OUTPUT_FILE = os.path.join(OUTPUT_DIR, "ine_dirce_empresas_filtered.parquet")
 
-# Read the CSV file
-try:
-    df = pl.read_csv(
+# Stable dictionaries for the dimension columns. The physical order of each
+# Enum is the logical order of the dimension, so sorting by them is meaningful.
+CONDITION_ENUM = pl.Enum([
+    "Personas físicas",
+    "Sociedades anónimas",
+    "Sociedades de responsabilidad limitada",
+    "Otras formas jurídicas",
+])
+STRATUM_ENUM = pl.Enum(list(STRATA))
+
+DIMENSION_COLUMNS = ["Condición jurídica", "Actividad principal", "Estrato de asalariados"]
+
+
+def scan_ine_dirce(input_file=INPUT_FILE):
+    """Lazily scan the raw DIRCE CSV with the 'Total' rows filtered out.
+
+    The filter is applied to the scan so it is pushed down into the CSV reader
+    and the subtotal rows are never materialized.
+
+    Args:
+        input_file (str): Path to the INE 39371.csv export
+
+    Returns:
+        pl.LazyFrame: Detail rows with string dimensions and a cleaned integer 'Total'
+    """
+    lf = pl.scan_csv(
         input_file,
         separator=";",
-        infer_schema_length=10000 # Increase sample size for better type inference
-        # Consider specifying encoding if default UTF-8 fails, e.g., encoding='latin-1'
+        schema_overrides={col: pl.Utf8 for col in DIMENSION_COLUMNS + ["Total"]},
+        infer_schema_length=10000,
     )
-    print("File read successfully. Columns:", df.columns)
-    print("Original shape:", df.shape)
-
-    # Define filter conditions
-    # Keep rows where NONE of the specified columns contain "Total"
-    # Note: Case sensitivity might matter, adjust .str.contains if needed
-    filter_condition = (
-        (~pl.col("Condición jurídica").str.contains("Total", literal=True)) &
-        (~pl.col("Actividad principal").str.contains("Total", literal=True)) &
-        (~pl.col("Estrato de asalariados").str.contains("Total", literal=True))
+    # Keep rows where NONE of the dimension columns contain "Total"
+    not_total = [~pl.col(col).str.contains("Total", literal=True) for col in DIMENSION_COLUMNS]
+    return lf.filter(pl.all_horizontal(not_total)).with_columns(
+        # Totals use '.' as thousands separator
+        pl.col("Total").str.replace_all(".", "", literal=True).cast(pl.Int64, strict=False)
     )
 
-    # Apply the filter
-    df_filtered = df.filter(filter_condition)
 
-    print("Filtered shape:", df_filtered.shape)
+def build_activity_dictionary(lf):
+    """Extract code and level once per distinct activity label.
 
-    # --- Add new columns ---
-    # Extract the numeric code from the beginning of 'Actividad principal'
-    df_with_code = df_filtered.with_columns(
-        pl.col("Actividad principal")
-        .str.extract(r"^(\d+)\s", 1) # Extract first group (digits)
-        .alias("activity_code")
-    )
+    Args:
+        lf (pl.LazyFrame): Output of scan_ine_dirce
 
-    # Calculate the length of the extracted code
-    df_final = df_with_code.with_columns(
-        pl.col("activity_code")
-        .str.len_chars() # Get length of the code string
-        .alias("code_length")
+    Returns:
+        pl.DataFrame: One row per 'Actividad principal' with activity_code and
+            code_length, sorted by label (i.e. by CNAE code)
+    """
+    return (
+        lf.select(pl.col("Actividad principal").unique())
+        .collect()
+        .sort("Actividad principal")
+        .with_columns(
+            pl.col("Actividad principal").str.extract(r"^(\d+)\s", 1).alias("activity_code")
+        )
+        .with_columns(pl.col("activity_code").str.len_chars().cast(pl.UInt8).alias("code_length"))
     )
-    # --- End of adding new columns ---
 
-    print("Shape after adding columns:", df_final.shape)
-    print("Sample of new columns:\n", df_final.select(["Actividad principal", "activity_code", "code_length"]).head())
 
-    # --- Clean and cast the 'Total' column ---
-    df_final = df_final.with_columns(
-        pl.col("Total")
-        .str.replace_all(".", "", literal=True) # Remove dots
-        .cast(pl.Int64, strict=False) # Cast to integer (strict=False handles potential errors gracefully, though unlikely here)
-        .alias("Total") # Keep the original column name
-    )
-    # --- End of cleaning 'Total' column ---
+def transform_ine_dirce(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
+    """Filter, encode and write the DIRCE companies table as sorted Parquet.
 
-    print("Shape after cleaning 'Total':", df_final.shape)
-    print("Data types after cleaning 'Total':\n", df_final.dtypes)
-    print("Sample after cleaning 'Total':\n", df_final.head())
+    Dimension columns are written as Enums (dictionary-encoded in Parquet) and
+    the rows are sorted by activity, legal form, stratum and year.
 
-    # Write the final data (including cleaned 'Total') to a Parquet file
-    df_final.write_parquet(output_file)
+    Args:
+        input_file (str): Path to the INE 39371.csv export
+        output_file (str): Destination Parquet path
 
+    Returns:
+        pl.DataFrame: Activity dictionary used for the encoding
+    """
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    print(f"Scanning file: {input_file}")
+    lf = scan_ine_dirce(input_file)
+
+    activities = build_activity_dictionary(lf)
+    activity_enum = pl.Enum(activities["Actividad principal"].to_list())
+    print(f"Distinct activities: {activities.height}")
+
+    labels = activities["Actividad principal"].to_list()
+    lf_final = (
+        lf.with_columns(
+            pl.col("Condición jurídica").cast(CONDITION_ENUM),
+            pl.col("Estrato de asalariados").cast(STRATUM_ENUM),
+            pl.col("Actividad principal")
+            .replace_strict(labels, activities["activity_code"].to_list(), return_dtype=pl.Utf8)
+            .alias("activity_code"),
+            pl.col("Actividad principal")
+            .replace_strict(labels, activities["code_length"].to_list(), return_dtype=pl.UInt8)
+            .alias("code_length"),
+        )
+        .with_columns(pl.col("Actividad principal").cast(activity_enum))
+        .select(DIMENSION_COLUMNS + ["Periodo", "Total", "activity_code", "code_length"])
+        .sort(["Actividad principal", "Condición jurídica", "Estrato de asalariados", "Periodo"])
+    )
+
+    lf_final.sink_parquet(output_file, compression="zstd", statistics=True)
     print(f"Filtered data saved to: {output_file}")
+    return activities
+
+
+@instrumented_run("transform_ine_dirce")
+def main():
+    try:
+        transform_ine_dirce()
+    except FileNotFoundError:
+        print(f"Error: Input file not found at {INPUT_FILE}")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
 
-except Exception as e:
-    print(f"An error occurred: {e}")
+if __name__ == "__main__":
+    main()
@@ -1 +1,4 @@
+# Size the Polars thread pool from the execution profile before any module imports Polars
+from src.utils.resources import apply_environment
 
+apply_environment()
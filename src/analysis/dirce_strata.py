@@ -0,0 +1,239 @@
+"""
+Matrix-backed model of INE DIRCE company counts by employee stratum.
+
+Company counts are held as a dense ``activities x strata x years`` array.
+Employee estimates, simplified size distributions and shares are then plain
+matrix products against a midpoint vector and a strata -> size-bucket
+mapping matrix, so every year and every activity level is computed at once.
+Passing a ``strata x scenarios`` midpoint matrix instead of a vector runs a
+whole sensitivity analysis in a single call.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import polars as pl
+
+# Employee strata in ascending order, as labelled in 'Estrato de asalariados'
+STRATA = (
+    "Sin asalariados", "De 1 a 2", "De 3 a 5", "De 6 a 9", "De 10 a 19",
+    "De 20 a 49", "De 50 a 99", "De 100 a 199", "De 200 a 249",
+    "De 250 a 999", "De 1000 a 4999", "De 5000 o más asalariados",
+)
+
+# Assumed employees per company in each stratum (same order as STRATA)
+DEFAULT_MIDPOINTS = np.array([
+    1,       # Sin asalariados (counted as the owner)
+    1.5,     # De 1 a 2
+    4,       # De 3 a 5
+    7.5,     # De 6 a 9
+    14.5,    # De 10 a 19
+    34.5,    # De 20 a 49
+    74.5,    # De 50 a 99
+    149.5,   # De 100 a 199
+    224.5,   # De 200 a 249
+    624.5,   # De 250 a 999
+    2999.5,  # De 1000 a 4999
+    5000,    # De 5000 o más asalariados (lower bound as estimate)
+], dtype=np.float64)
+
+SIZE_CATEGORIES = ("Micro (0-9)", "Small (10-49)", "Medium (50-249)", "Large (250+)")
+
+# strata x size-bucket indicator matrix
+DEFAULT_SIZE_MAPPING = np.zeros((len(STRATA), len(SIZE_CATEGORIES)), dtype=np.float64)
+DEFAULT_SIZE_MAPPING[0:4, 0] = 1   # Sin asalariados .. De 6 a 9
+DEFAULT_SIZE_MAPPING[4:6, 1] = 1   # De 10 a 19 .. De 20 a 49
+DEFAULT_SIZE_MAPPING[6:9, 2] = 1   # De 50 a 99 .. De 200 a 249
+DEFAULT_SIZE_MAPPING[9:12, 3] = 1  # De 250 a 999 .. De 5000 o más
+
+
+def _safe_share(numerator, denominator):
+    """Elementwise numerator / denominator * 100, with 0 where the denominator is 0."""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.zeros(np.broadcast(numerator, denominator).shape, dtype=np.float64)
+    np.divide(numerator * 100, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def _round_preserving_sum(values, axis):
+    """Round to integers along ``axis`` so each slice keeps its (rounded) sum.
+
+    Values are floored and the remaining units go to the largest fractional
+    parts (largest remainder method).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    floored = np.floor(values)
+    remainders = values - floored
+    missing = np.round(values.sum(axis=axis, keepdims=True) - floored.sum(axis=axis, keepdims=True))
+    rank = np.argsort(np.argsort(-remainders, axis=axis, kind="stable"), axis=axis)
+    return (floored + (rank < missing)).astype(np.int64)
+
+
+@dataclass
+class StrataCube:
+    """Company counts indexed by activity, employee stratum and year.
+
+    Attributes:
+        activities (list[str]): Activity labels ('Actividad principal'), axis 0
+        activity_codes (list[str]): Numeric CNAE codes matching ``activities``
+        years (list[int]): Years ('Periodo'), axis 2
+        counts (np.ndarray): Array of shape (activities, len(STRATA), years)
+    """
+
+    activities: list
+    activity_codes: list
+    years: list
+    counts: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df, activity_col="Actividad principal", code_col="activity_code",
+                   stratum_col="Estrato de asalariados", year_col="Periodo", value_col="Total"):
+        """Build the cube from a long DIRCE frame (one row per combination).
+
+        Rows for the same activity/stratum/year (e.g. different legal forms)
+        are summed. Strata labels not in ``STRATA`` are ignored.
+
+        Args:
+            df (pl.DataFrame): Filtered DIRCE data
+            activity_col (str): Activity label column
+            code_col (str): Activity code column
+            stratum_col (str): Employee stratum column
+            year_col (str): Year column
+            value_col (str): Company count column
+
+        Returns:
+            StrataCube: Dense cube of company counts
+        """
+        df = df.filter(pl.col(stratum_col).cast(pl.Utf8).is_in(STRATA))
+        activities = (
+            df.select(pl.col(activity_col).cast(pl.Utf8), pl.col(code_col).cast(pl.Utf8))
+            .unique(subset=[activity_col], keep="first")
+            .sort(activity_col)
+        )
+        years = sorted(df[year_col].unique().to_list())
+
+        indexed = df.select(
+            pl.col(activity_col).cast(pl.Utf8).replace_strict(
+                activities[activity_col].to_list(), range(activities.height), return_dtype=pl.Int64
+            ).alias("a"),
+            pl.col(stratum_col).cast(pl.Utf8).replace_strict(
+                STRATA, range(len(STRATA)), return_dtype=pl.Int64
+            ).alias("s"),
+            pl.col(year_col).replace_strict(years, range(len(years)), return_dtype=pl.Int64).alias("y"),
+            pl.col(value_col).fill_null(0).cast(pl.Int64).alias("v"),
+        )
+        counts = np.zeros((activities.height, len(STRATA), len(years)), dtype=np.int64)
+        np.add.at(
+            counts,
+            (indexed["a"].to_numpy(), indexed["s"].to_numpy(), indexed["y"].to_numpy()),
+            indexed["v"].to_numpy(),
+        )
+        return cls(
+            activities=activities[activity_col].to_list(),
+            activity_codes=activities[code_col].to_list(),
+            years=years,
+            counts=counts,
+        )
+
+    def year_index(self, year):
+        """Position of ``year`` on the year axis."""
+        return self.years.index(year)
+
+    def totals(self):
+        """Total companies per activity and year, shape (activities, years)."""
+        return self.counts.sum(axis=1)
+
+    def estimated_employees(self, midpoints=None):
+        """Estimated employees as counts x midpoints.
+
+        Args:
+            midpoints (np.ndarray, optional): Vector of length len(STRATA), or a
+                (len(STRATA), scenarios) matrix for bulk sensitivity runs.
+                Defaults to DEFAULT_MIDPOINTS.
+
+        Returns:
+            np.ndarray: Shape (activities, years), or (activities, years, scenarios)
+        """
+        midpoints = DEFAULT_MIDPOINTS if midpoints is None else np.asarray(midpoints, dtype=np.float64)
+        if midpoints.shape[0] != len(STRATA):
+            raise ValueError(f"Expected {len(STRATA)} midpoints, got shape {midpoints.shape}")
+        if midpoints.ndim == 1:
+            return np.einsum("asy,s->ay", self.counts, midpoints)
+        return np.einsum("asy,sk->ayk", self.counts, midpoints)
+
+    def employee_shares(self, midpoints=None):
+        """Each activity's % of all estimated employees, per year (and scenario)."""
+        employees = self.estimated_employees(midpoints)
+        return _safe_share(employees, employees.sum(axis=0, keepdims=True))
+
+    def size_counts(self, mapping=None):
+        """Companies per simplified size bucket, shape (activities, buckets, years).
+
+        Args:
+            mapping (np.ndarray, optional): (len(STRATA), buckets) matrix; rows may
+                hold fractional weights to redistribute a stratum. Defaults to
+                DEFAULT_SIZE_MAPPING.
+        """
+        mapping = DEFAULT_SIZE_MAPPING if mapping is None else np.asarray(mapping, dtype=np.float64)
+        return np.einsum("asy,sb->aby", self.counts, mapping)
+
+    def size_shares(self, mapping=None):
+        """Size bucket counts as % of the activity's total companies for each year."""
+        return _safe_share(self.size_counts(mapping), self.totals()[:, None, :])
+
+    def strata_shares(self):
+        """Stratum counts as % of the activity's total companies for each year."""
+        return _safe_share(self.counts, self.totals()[:, None, :])
+
+    def rollup(self, prefix_len=2, labels=None):
+        """Aggregate activities to a coarser code level with an indicator matrix.
+
+        Args:
+            prefix_len (int): Number of leading code digits to keep (2 = division)
+            labels (dict, optional): Maps rolled-up code -> label. Codes without a
+                label keep the bare code.
+
+        Returns:
+            StrataCube: Cube at the coarser activity level
+        """
+        labels = labels or {}
+        parent_codes = [code[:prefix_len] for code in self.activity_codes]
+        unique_codes = sorted(set(parent_codes))
+        position = {code: i for i, code in enumerate(unique_codes)}
+        indicator = np.zeros((len(unique_codes), len(self.activities)), dtype=np.int64)
+        indicator[[position[code] for code in parent_codes], np.arange(len(self.activities))] = 1
+        return StrataCube(
+            activities=[labels.get(code, code) for code in unique_codes],
+            activity_codes=unique_codes,
+            years=list(self.years),
+            counts=np.einsum("pa,asy->psy", indicator, self.counts),
+        )
+
+    def to_frame(self, year, activity_col="Actividad principal", midpoints=None, mapping=None):
+        """Wide per-activity frame of employee and size estimates for one year.
+
+        Columns follow the aggregated DIRCE output: ``Estimated_Employees_<year>``
+        for every year, ``Estimated_Employees_pct`` and ``Size_<bucket>_abs/_pct``
+        for ``year``. Takes one midpoint vector; for a matrix of scenarios use
+        ``estimated_employees`` directly.
+        """
+        if midpoints is not None and np.ndim(midpoints) != 1:
+            raise ValueError(f"to_frame takes a midpoint vector, got shape {np.shape(midpoints)}; "
+                             f"use estimated_employees() for scenario matrices")
+        y = self.year_index(year)
+        employees = self.estimated_employees(midpoints)
+        shares = _safe_share(employees, employees.sum(axis=0, keepdims=True))
+        sizes = _round_preserving_sum(self.size_counts(mapping)[:, :, y], axis=1)
+        size_pct = self.size_shares(mapping)
+
+        columns = {activity_col: self.activities}
+        for i, year_value in enumerate(self.years):
+            columns[f"Estimated_Employees_{year_value}"] = np.round(employees[:, i], 0)
+        columns["Estimated_Employees_pct"] = np.round(shares[:, y], 2)
+        for b, size_cat in enumerate(SIZE_CATEGORIES):
+            # Fractional mapping rows split a stratum's companies; rounded so the buckets add up to the total
+            columns[f"Size_{size_cat}_abs"] = sizes[:, b]
+        for b, size_cat in enumerate(SIZE_CATEGORIES):
+            columns[f"Size_{size_cat}_pct"] = np.round(size_pct[:, b, y], 2)
+        return pl.DataFrame(columns)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+All-pairs top-k occupation similarity over sparse occupation x skill matrices.
+
+Occupation vectors are built as a CSR matrix:
+
+- ESCO: one column per skill, weighted by relation type (essential/optional)
+- O*NET: one column per (element, scale) over skills, knowledge and
+  abilities, holding the IM and LV ratings rescaled to 0-1
+
+Similarities (cosine on the weighted vectors, or Jaccard on the skill sets)
+are computed block by block in a thread pool: each block of rows is densified
+over the columns it uses and multiplied against the matching rows of the
+transposed matrix, so no full dense copy is ever built. Only the ``k`` best neighbours of every occupation are kept. The neighbour
+index is written to Parquet sorted by occupation and rank, so ``NeighbourIndex``
+answers a lookup by slicing ``k`` contiguous rows.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from src.utils.instrumentation import instrumented_run
+from src.utils.resources import connect
+from src.utils.sparse import CSRMatrix
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+ESCO_DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", "esco_dataset_1.2.0.duckdb")
+ONET_DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", "onet_dataset_29.2.duckdb")
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data", "processed", "similarity")
+
+TOP_K = 20
+BLOCK_SIZE = 128
+
+# ESCO relation type -> column weight
+ESCO_RELATION_WEIGHTS = {"essential": 1.0, "optional": 0.5}
+
+# O*NET descriptor tables used as features
+ONET_DOMAINS = ["skills", "knowledge", "abilities"]
+# Scale -> (min, max) used to rescale ratings to 0-1
+ONET_SCALE_RANGES = {"IM": (1.0, 5.0), "LV": (0.0, 7.0)}
+
+METRICS = ("cosine", "jaccard")
+
+
+@dataclass
+class OccupationMatrix:
+    """Occupation x feature matrix with its axis labels.
+
+    Attributes:
+        occupations (list[str]): Row labels (occupation URIs or O*NET-SOC codes)
+        features (list[str]): Column labels (skill URIs or element_id/scale_id)
+        matrix (CSRMatrix): Weights, shape (occupations, features)
+    """
+
+    occupations: list
+    features: list
+    matrix: CSRMatrix
+
+    @classmethod
+    def from_frame(cls, df, row_col, col_col, value_col):
+        """Build from a long frame with one row per (occupation, feature, weight)."""
+        df = df.filter(pl.col(value_col) > 0)
+        occupations = df[row_col].unique().sort().to_list()
+        features = df[col_col].unique().sort().to_list()
+        rows = df[row_col].replace_strict(occupations, list(range(len(occupations))), return_dtype=pl.Int64)
+        cols = df[col_col].replace_strict(features, list(range(len(features))), return_dtype=pl.Int64)
+        matrix = CSRMatrix.from_coo(rows.to_numpy(), cols.to_numpy(), df[value_col].to_numpy(),
+                                    (len(occupations), len(features)))
+        return cls(occupations, features, matrix)
+
+
+def esco_occupation_matrix(db_path=ESCO_DB_PATH, relation_weights=ESCO_RELATION_WEIGHTS):
+    """Occupation x skill matrix from ``occupationSkillRelations_en``."""
+    weights = pl.DataFrame({"relationType": list(relation_weights), "weight": list(relation_weights.values())})
+    con = connect(db_path, read_only=True)
+    try:
+        relations = con.sql("""
+            SELECT occupationUri, skillUri, relationType
+            FROM occupationSkillRelations_en
+            WHERE occupationUri IS NOT NULL AND skillUri IS NOT NULL
+        """).pl()
+    finally:
+        con.close()
+    relations = relations.join(weights, on="relationType")
+    # An occupation listing a skill twice keeps its strongest relation
+    relations = relations.group_by("occupationUri", "skillUri").agg(pl.col("weight").max())
+    return OccupationMatrix.from_frame(relations, "occupationUri", "skillUri", "weight")
+
+
+def onet_occupation_matrix(db_path=ONET_DB_PATH, domains=ONET_DOMAINS, scale_ranges=ONET_SCALE_RANGES):
+    """Occupation x (element, scale) matrix from the O*NET rating tables.
+
+    Suppressed ratings are dropped, and LV ratings flagged as not relevant
+    count as 0.
+    """
+    scales = ", ".join(f"'{scale}'" for scale in scale_ranges)
+    rescale = " ".join(f"WHEN '{scale}' THEN (data_value - {low}) / ({high} - {low})"
+                       for scale, (low, high) in scale_ranges.items())
+    con = connect(db_path, read_only=True)
+    try:
+        ratings = con.sql(" UNION ALL ".join(f"""
+            SELECT
+                onetsoc_code,
+                element_id || '/' || scale_id AS feature,
+                CASE WHEN not_relevant = 'Y' THEN 0.0 ELSE CASE scale_id {rescale} END END AS weight
+            FROM {domain}
+            WHERE scale_id IN ({scales})
+              AND coalesce(recommend_suppress, 'N') <> 'Y'
+        """ for domain in domains)).pl()
+    finally:
+        con.close()
+    return OccupationMatrix.from_frame(ratings, "onetsoc_code", "feature", "weight")
+
+
+def _top_k_block(gram_block, row_offset, k):
+    """Best ``k`` columns of every row of a similarity block, excluding the diagonal."""
+    n_block, n_cols = gram_block.shape
+    block_rows = np.arange(n_block)
+    gram_block[block_rows, row_offset + block_rows] = -np.inf
+    k = min(k, n_cols - 1)
+    candidates = np.argpartition(-gram_block, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(gram_block, candidates, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def top_k_neighbours(matrix, k=TOP_K, metric="cosine", block_size=BLOCK_SIZE, max_workers=None):
+    """Top-k most similar rows for every row of a CSR matrix.
+
+    Args:
+        matrix (CSRMatrix): Occupation x feature weights
+        k (int): Neighbours kept per row
+        metric (str): 'cosine' on the weights or 'jaccard' on the support
+        block_size (int): Rows per block; one block needs dense
+            (block_size x used columns) and (used columns x n_rows) buffers
+        max_workers (int, optional): Thread pool size (default: CPU count)
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: neighbour positions (int32) and
+            similarities (float32), both of shape (n_rows, min(k, n_rows - 1))
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+    n_rows = matrix.shape[0]
+    if metric == "cosine":
+        operand = matrix.row_normalized()
+    else:
+        operand = matrix.binarized()
+        set_sizes = operand.row_lengths().astype(np.float32)
+
+    # Transposed copy: the rows of a block only meet the columns they use
+    operand_t = operand.transpose()
+
+    def run_block(start):
+        rows = np.arange(start, min(start + block_size, n_rows))
+        used = np.unique(operand.indices[operand.indptr[rows[0]]:operand.indptr[rows[-1] + 1]])
+        left = operand.to_dense(rows)[:, used]
+        gram = left @ operand_t.to_dense(used)
+        if metric == "jaccard":
+            union = set_sizes[rows, None] + set_sizes[None, :] - gram
+            gram = np.divide(gram, union, out=np.zeros_like(gram), where=union > 0)
+        return _top_k_block(gram, start, k)
+
+    starts = range(0, n_rows, block_size)
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        results = list(pool.map(run_block, starts))
+    neighbours = np.concatenate([r[0] for r in results]).astype(np.int32)
+    scores = np.concatenate([r[1] for r in results]).astype(np.float32)
+    return neighbours, scores
+
+
+def neighbour_frame(occupations, neighbours, scores):
+    """Long neighbour table sorted by occupation and rank (zero-similarity pairs dropped)."""
+    n_rows, k = neighbours.shape
+    labels = np.asarray(occupations, dtype=object)
+    return pl.DataFrame({
+        "occupation": labels.repeat(k),
+        "rank": np.tile(np.arange(1, k + 1, dtype=np.uint16), n_rows),
+        "neighbour": labels[neighbours.ravel()],
+        "similarity": scores.ravel(),
+    }).filter(pl.col("similarity") > 0).sort(["occupation", "rank"])
+
+
+class NeighbourIndex:
+    """In-memory lookup over a persisted neighbour table.
+
+    Rows are sorted by occupation, so each occupation maps to one contiguous
+    slice and a lookup costs O(k).
+    """
+
+    def __init__(self, table):
+        self.table = table.sort(["occupation", "rank"])
+        counts = self.table.group_by("occupation", maintain_order=True).len()
+        ends = np.cumsum(counts["len"].to_numpy())
+        self._slices = {
+            occupation: (int(end - length), int(end))
+            for occupation, length, end in zip(counts["occupation"].to_list(), counts["len"].to_list(), ends)
+        }
+
+    @classmethod
+    def load(cls, path):
+        return cls(pl.read_parquet(path))
+
+    def neighbours(self, occupation, k=None):
+        """Neighbour table of one occupation, best first (empty if unknown)."""
+        start, end = self._slices.get(occupation, (0, 0))
+        if k is not None:
+            end = min(end, start + k)
+        return self.table.slice(start, end - start)
+
+
+def build_neighbour_index(occupation_matrix, output_path, k=TOP_K, metric="cosine"):
+    """Compute top-k neighbours for an OccupationMatrix and write them to Parquet."""
+    neighbours, scores = top_k_neighbours(occupation_matrix.matrix, k=k, metric=metric)
+    table = neighbour_frame(occupation_matrix.occupations, neighbours, scores)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    table.write_parquet(output_path, compression="zstd", statistics=True)
+    return table
+
+
+@instrumented_run("occupation_similarity")
+def main():
+    sources = (
+        ("esco", ESCO_DB_PATH, esco_occupation_matrix),
+        ("onet", ONET_DB_PATH, onet_occupation_matrix),
+    )
+    for name, db_path, loader in sources:
+        if not os.path.exists(db_path):
+            print(f"Database not found, skipping {name}: {db_path}")
+            continue
+        occupation_matrix = loader(db_path)
+        shape, nnz = occupation_matrix.matrix.shape, occupation_matrix.matrix.nnz
+        print(f"{name}: {shape[0]} occupations x {shape[1]} features, {nnz} non-zeros")
+        for metric in METRICS:
+            output_path = os.path.join(OUTPUT_DIR, f"{name}_occupation_neighbours_{metric}.parquet")
+            table = build_neighbour_index(occupation_matrix, output_path, metric=metric)
+            print(f"  {metric}: {table.height} neighbour pairs written to {output_path}")
+
+    print("\nOccupation similarity build completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
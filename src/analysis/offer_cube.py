@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Pre-aggregated job-offer cube by ISCO level x country x green/digital flags.
+
+The per-(occupation, country) cells of ``aggregate_job_offers`` (offer counts
+and KLL salary sketches) are joined with the ESCO green/digital flags and
+aggregated over every combination of the dimensions in one DuckDB
+``GROUPING SETS`` pass: a ``ROLLUP`` over the nested ISCO levels 1-4 crossed
+with a ``CUBE`` over country and the two flags (5 x 8 = 40 grouping sets).
+Each row carries ``grouping_id`` (DuckDB ``GROUPING_ID`` over ``DIMENSIONS``:
+bit set = dimension aggregated away), the measures and the merged salary
+sketches, so further quantiles can be taken from any slice.
+
+The cube is written sorted by ``grouping_id`` and the dimensions, so
+``query_cube`` reads only the row groups of the slice it needs::
+
+    from src.analysis.offer_cube import query_cube
+    query_cube(by=["isco_level_2_code", "country_name"], where={"has_green_skills": True})
+"""
+
+import os
+from pathlib import Path
+
+import polars as pl
+
+from src.utils.instrumentation import instrumented_run
+from src.utils.parquet_io import read_keyed_parquet, write_keyed_parquet
+from src.utils.resources import connect
+from src.utils.sketches import register_duckdb_functions
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+SKETCHES_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "datamarket", "job_offer_salary_sketches.parquet")
+ESCO_PROFILES_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "esco", "esco_occupation_profiles.parquet")
+CUBE_PATH = os.path.join(PROJECT_ROOT, "data", "derived", "offer_cube", "offer_cube.parquet")
+
+ISCO_LEVELS = ["isco_level_1_code", "isco_level_2_code", "isco_level_3_code", "isco_level_4_code"]
+DIMENSIONS = ISCO_LEVELS + ["country_name", "has_green_skills", "has_digital_skills"]
+MEASURES = ["n_occupations", "total_job_offers", "median_min_salary", "median_max_salary",
+            "min_salary_sketch", "max_salary_sketch"]
+
+
+def grouping_id(dimensions):
+    """``GROUPING_ID`` of the grouping set that groups by ``dimensions``.
+
+    ISCO levels are nested, so grouping by a level also groups by the levels
+    above it (the ``ROLLUP`` only has those sets).
+    """
+    unknown = [d for d in dimensions if d not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown cube dimensions: {', '.join(unknown)} (expected some of {DIMENSIONS})")
+    depth = max((ISCO_LEVELS.index(d) + 1 for d in dimensions if d in ISCO_LEVELS), default=0)
+    grouped = set(ISCO_LEVELS[:depth]) | set(dimensions)
+    return sum(1 << (len(DIMENSIONS) - 1 - i) for i, d in enumerate(DIMENSIONS) if d not in grouped)
+
+
+def build_cube(con, sketches_path=SKETCHES_PATH, profiles_path=ESCO_PROFILES_PATH):
+    """All grouping sets of the offer cells in one pass.
+
+    Returns:
+        pl.DataFrame: ``grouping_id``, ``DIMENSIONS`` (null where aggregated
+            away) and ``MEASURES``
+    """
+    register_duckdb_functions(con)
+    dimensions = ", ".join(DIMENSIONS)
+    return con.execute(f"""
+        WITH cells AS (
+            SELECT c.*, p.has_green_skills, p.has_digital_skills
+            FROM read_parquet('{sketches_path}') c
+            JOIN (SELECT occupation_uri, has_green_skills, has_digital_skills
+                  FROM read_parquet('{profiles_path}')) p USING (occupation_uri)
+        ), cube AS (
+            SELECT GROUPING_ID({dimensions})::INTEGER AS grouping_id,
+                   {dimensions},
+                   count(DISTINCT occupation_uri) AS n_occupations,
+                   sum(n_job_offers)::BIGINT AS total_job_offers,
+                   kll_merge(list(min_salary_sketch)) AS min_salary_sketch,
+                   kll_merge(list(max_salary_sketch)) AS max_salary_sketch
+            FROM cells
+            GROUP BY ROLLUP({", ".join(ISCO_LEVELS)}), CUBE(country_name, has_green_skills, has_digital_skills)
+        )
+        SELECT grouping_id, {dimensions}, n_occupations, total_job_offers,
+               kll_quantile([min_salary_sketch], 0.5) AS median_min_salary,
+               kll_quantile([max_salary_sketch], 0.5) AS median_max_salary,
+               min_salary_sketch, max_salary_sketch
+        FROM cube
+    """).pl()
+
+
+def query_cube(by=(), where=None, columns=None, path=CUBE_PATH):
+    """Pre-aggregated rows grouped by ``by``, restricted to ``where``.
+
+    Args:
+        by (list[str]): Dimensions to group by (any of ``DIMENSIONS``)
+        where (dict, optional): Dimension -> value to keep; these dimensions
+            are fixed in the slice but not returned unless also in ``by``
+        columns (list[str], optional): Measures to return (default: all)
+        path (str): Cube Parquet file
+
+    Returns:
+        pl.DataFrame: ``by`` columns plus the measures, one row per group
+    """
+    by, where = list(by), dict(where or {})
+    gid = grouping_id(by + list(where))
+    cube = read_keyed_parquet(path, "grouping_id", [gid])
+    for dimension, value in where.items():
+        cube = cube.filter(pl.col(dimension).is_null() if value is None else pl.col(dimension) == value)
+    return cube.select(by + list(columns or MEASURES))
+
+
+@instrumented_run("offer_cube")
+def main():
+    if not os.path.exists(SKETCHES_PATH):
+        print(f"Offer cells not found: {SKETCHES_PATH}")
+        print("Run scripts/aggregate_job_offers.py first.")
+        return
+
+    print(f"Building job-offer cube from: {SKETCHES_PATH}")
+    con = connect()
+    try:
+        cube = build_cube(con)
+    finally:
+        con.close()
+
+    os.makedirs(os.path.dirname(CUBE_PATH), exist_ok=True)
+    write_keyed_parquet(cube, CUBE_PATH, key=["grouping_id", *DIMENSIONS], bloom_columns=["grouping_id"])
+    n_sets = cube["grouping_id"].n_unique()
+    size_mb = os.path.getsize(CUBE_PATH) / (1024 * 1024)
+    print(f"  {cube.height} rows in {n_sets} grouping sets ({size_mb:.1f} MB) written to {CUBE_PATH}")
+
+    print("\nJob-offer cube built successfully!")
+
+
+if __name__ == "__main__":
+    main()
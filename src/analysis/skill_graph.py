@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+ESCO skill graph compiled to CSR adjacency arrays.
+
+Every skill and skill group URI gets a dense integer id. Three graphs are
+built over those ids from the ESCO tables:
+
+- ``broader``: concept -> broader concept, from ``broaderRelationsSkillPillar_en``
+  and the level columns of ``skillsHierarchy_en``
+- ``narrower``: the transpose of ``broader``
+- ``related``: skill -> related skill from ``skillSkillRelations_en``
+  (data is 1.0 for essential and 0.5 for optional relations)
+
+The transitive closure of ``broader`` (every concept -> all of its ancestors
+up to the pillar roots) is precomputed as a fourth CSR array, so expanding a
+skill set to its broader concepts is one gather instead of a recursive query.
+All arrays are saved as .npy and memory-mapped by ``SkillGraph.load``.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from src.utils.instrumentation import instrumented_run
+from src.utils.resources import connect
+from src.utils.sparse import CSRMatrix
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+ESCO_DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", "esco_dataset_1.2.0.duckdb")
+GRAPH_DIR = os.path.join(PROJECT_ROOT, "data", "derived", "esco_skill_graph")
+
+NODES_FILENAME = "nodes.parquet"
+META_FILENAME = "graph.json"
+GRAPHS = ("broader", "narrower", "related", "ancestors")
+
+RELATED_WEIGHTS = {"essential": 1.0, "optional": 0.5}
+HIERARCHY_LEVELS = 4
+
+
+def read_nodes(con):
+    """All skill and skill group URIs with a label and concept type."""
+    existing = {row[0] for row in con.execute("SHOW TABLES").fetchall()}
+    selects = [
+        "SELECT conceptUri AS uri, NULL AS label, conceptType AS kind FROM broaderRelationsSkillPillar_en",
+        "SELECT broaderUri, NULL, broaderType FROM broaderRelationsSkillPillar_en",
+        "SELECT originalSkillUri, NULL, NULL FROM skillSkillRelations_en",
+        "SELECT relatedSkillUri, NULL, NULL FROM skillSkillRelations_en",
+    ]
+    selects += [
+        f'SELECT "Level {level} URI", "Level {level} preferred term", \'SkillGroup\' FROM skillsHierarchy_en'
+        for level in range(HIERARCHY_LEVELS)
+    ]
+    if "skillGroups_en" in existing:
+        selects.append("SELECT conceptUri, preferredLabel, conceptType FROM skillGroups_en")
+    if "skills_en" in existing:
+        selects.append("SELECT conceptUri, preferredLabel, conceptType FROM skills_en")
+    return con.sql(f"""
+        SELECT uri, any_value(label) AS label, any_value(kind) AS kind
+        FROM ({" UNION ALL ".join(selects)})
+        WHERE uri IS NOT NULL
+        GROUP BY uri
+        ORDER BY uri
+    """).pl().with_row_index("id")
+
+
+def read_broader_edges(con):
+    """(uri, broader_uri) pairs from the pillar relations and the hierarchy levels."""
+    hierarchy = " UNION ALL ".join(
+        f'SELECT "Level {level + 1} URI", "Level {level} URI" FROM skillsHierarchy_en'
+        for level in range(HIERARCHY_LEVELS - 1)
+    )
+    return con.sql(f"""
+        SELECT DISTINCT uri, broader_uri FROM (
+            SELECT conceptUri AS uri, broaderUri AS broader_uri FROM broaderRelationsSkillPillar_en
+            UNION ALL {hierarchy}
+        )
+        WHERE uri IS NOT NULL AND broader_uri IS NOT NULL AND uri <> broader_uri
+    """).pl()
+
+
+def read_related_edges(con, weights=RELATED_WEIGHTS):
+    """(uri, related_uri, weight) triples from ``skillSkillRelations_en``."""
+    cases = " ".join(f"WHEN '{relation}' THEN {weight}" for relation, weight in weights.items())
+    return con.sql(f"""
+        SELECT originalSkillUri AS uri, relatedSkillUri AS related_uri,
+               max(CASE relationType {cases} ELSE 0.0 END) AS weight
+        FROM skillSkillRelations_en
+        WHERE originalSkillUri IS NOT NULL AND relatedSkillUri IS NOT NULL
+        GROUP BY ALL
+    """).pl()
+
+
+def _ids(uris, nodes):
+    return uris.replace_strict(nodes["uri"], nodes["id"], return_dtype=pl.Int64).to_numpy()
+
+
+def ancestor_closure(broader):
+    """Transitive closure of a broader-concept DAG as CSR (node -> all ancestors).
+
+    Nodes are processed roots first, so each node's ancestors are its parents
+    plus their already computed ancestors.
+
+    Raises:
+        ValueError: If the broader relations contain a cycle
+    """
+    n = broader.shape[0]
+    parents = [broader.indices[broader.indptr[i]:broader.indptr[i + 1]] for i in range(n)]
+    children = broader.transpose()
+    pending = broader.row_lengths().copy()
+    frontier = np.flatnonzero(pending == 0)
+    closure = [np.empty(0, dtype=np.int32) for _ in range(n)]
+    visited = 0
+    while len(frontier):
+        visited += len(frontier)
+        for node in frontier:
+            if len(parents[node]):
+                closure[node] = np.unique(np.concatenate([parents[node]] + [closure[p] for p in parents[node]]))
+        owners, entries = children.gather(frontier)
+        child_ids = children.indices[entries]
+        np.subtract.at(pending, child_ids, 1)
+        frontier = np.unique(child_ids[pending[child_ids] == 0])
+    if visited < n:
+        raise ValueError(f"Broader relations contain a cycle ({n - visited} nodes unreachable from the roots)")
+
+    lengths = np.array([len(c) for c in closure], dtype=np.int64)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = np.concatenate(closure).astype(np.int32) if n else np.empty(0, dtype=np.int32)
+    return CSRMatrix(indptr, indices, np.ones(len(indices), dtype=np.float32), n)
+
+
+@dataclass
+class SkillGraph:
+    """ESCO skill graphs over dense integer node ids.
+
+    Attributes:
+        nodes (pl.DataFrame): id, uri, label, kind (row ``i`` has id ``i``)
+        broader (CSRMatrix): node -> broader concepts
+        narrower (CSRMatrix): node -> narrower concepts
+        related (CSRMatrix): skill -> related skills (essential 1.0, optional 0.5)
+        ancestors (CSRMatrix): node -> every ancestor up to the pillar roots
+    """
+
+    nodes: pl.DataFrame
+    broader: CSRMatrix
+    narrower: CSRMatrix
+    related: CSRMatrix
+    ancestors: CSRMatrix
+
+    @classmethod
+    def from_db(cls, db_path=ESCO_DB_PATH):
+        """Compile the graphs from the ESCO DuckDB database."""
+        con = connect(db_path, read_only=True)
+        try:
+            nodes = read_nodes(con)
+            broader_edges = read_broader_edges(con)
+            related_edges = read_related_edges(con)
+        finally:
+            con.close()
+
+        n = nodes.height
+        broader = CSRMatrix.from_coo(
+            _ids(broader_edges["uri"], nodes), _ids(broader_edges["broader_uri"], nodes),
+            np.ones(broader_edges.height), (n, n),
+        ).binarized()
+        related = CSRMatrix.from_coo(
+            _ids(related_edges["uri"], nodes), _ids(related_edges["related_uri"], nodes),
+            related_edges["weight"].to_numpy(), (n, n),
+        )
+        return cls(nodes, broader, broader.transpose(), related, ancestor_closure(broader))
+
+    def save(self, graph_dir=GRAPH_DIR):
+        """Write the node table and every CSR graph to ``graph_dir``."""
+        os.makedirs(graph_dir, exist_ok=True)
+        self.nodes.write_parquet(os.path.join(graph_dir, NODES_FILENAME))
+        for name in GRAPHS:
+            getattr(self, name).save(graph_dir, name)
+        with open(os.path.join(graph_dir, META_FILENAME), "w", encoding="utf-8") as f:
+            json.dump({"n_nodes": self.nodes.height, "graphs": list(GRAPHS)}, f, indent=2)
+
+    @classmethod
+    def load(cls, graph_dir=GRAPH_DIR, mmap_mode="r"):
+        """Load a graph written by ``save``; CSR arrays are memory-mapped by default."""
+        with open(os.path.join(graph_dir, META_FILENAME), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        graphs = {name: CSRMatrix.load(graph_dir, name, meta["n_nodes"], mmap_mode=mmap_mode) for name in GRAPHS}
+        return cls(nodes=pl.read_parquet(os.path.join(graph_dir, NODES_FILENAME)), **graphs)
+
+    def ids(self, uris):
+        """Node ids of the given URIs (raises if a URI is unknown)."""
+        return _ids(pl.Series(list(uris), dtype=pl.Utf8), self.nodes)
+
+    def uris(self, ids):
+        """URIs of the given node ids."""
+        return self.nodes["uri"].gather(np.asarray(ids, dtype=np.int64)).to_list()
+
+    def roots(self):
+        """Ids of nodes without a broader concept (the pillar roots)."""
+        return np.flatnonzero(self.broader.row_lengths() == 0)
+
+    def bfs(self, start, graph="broader", max_depth=None):
+        """Breadth-first search from one or more start ids.
+
+        Args:
+            start (int | iterable[int]): Start node id(s), depth 0
+            graph (str): 'broader', 'narrower' or 'related'
+            max_depth (int, optional): Stop after this many hops
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: reached node ids and their depth,
+                in visiting order
+        """
+        adjacency = getattr(self, graph)
+        frontier = np.unique(np.atleast_1d(np.asarray(start, dtype=np.int64)))
+        seen = np.zeros(adjacency.shape[0], dtype=bool)
+        seen[frontier] = True
+        reached, depths, depth = [frontier], [np.zeros(len(frontier), dtype=np.int32)], 0
+        while len(frontier) and (max_depth is None or depth < max_depth):
+            _, entries = adjacency.gather(frontier)
+            frontier = np.unique(adjacency.indices[entries])
+            frontier = frontier[~seen[frontier]]
+            seen[frontier] = True
+            depth += 1
+            reached.append(frontier)
+            depths.append(np.full(len(frontier), depth, dtype=np.int32))
+        return np.concatenate(reached), np.concatenate(depths)
+
+    def ancestors_of(self, node_id):
+        """All broader concepts of a node, from the precomputed closure."""
+        return np.asarray(self.ancestors.row(node_id)[0])
+
+    def descendants_of(self, node_id):
+        """All narrower concepts of a node."""
+        ids, _ = self.bfs(node_id, graph="narrower")
+        return ids[1:]
+
+    def expand(self, ids):
+        """A skill set together with every broader concept of its members."""
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        _, entries = self.ancestors.gather(ids)
+        return np.union1d(ids, self.ancestors.indices[entries])
+
+    def expand_matrix(self, matrix):
+        """Expand every row of a (sets x node) CSR matrix to include ancestors.
+
+        Useful for rolling occupation skill sets up the hierarchy in one pass;
+        the result is binary.
+        """
+        owners, entries = self.ancestors.gather(matrix.indices)
+        rows = np.concatenate([matrix.row_ids(), matrix.row_ids()[owners]])
+        cols = np.concatenate([matrix.indices, self.ancestors.indices[entries]])
+        return CSRMatrix.from_coo(rows, cols, np.ones(len(rows)), matrix.shape).binarized()
+
+
+@instrumented_run("skill_graph")
+def main():
+    print(f"Compiling ESCO skill graph from: {ESCO_DB_PATH}")
+    graph = SkillGraph.from_db()
+    graph.save()
+    print(f"  {graph.nodes.height} nodes, {graph.broader.nnz} broader edges, "
+          f"{graph.related.nnz} related edges, {graph.ancestors.nnz} ancestor pairs")
+    print(f"  {len(graph.roots())} roots; graph saved to {GRAPH_DIR}")
+
+    print("\nSkill graph build completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Batched task-exposure scores for ISCO x NACE jobs, ESCO occupations and DIRCE activities.
+
+A scenario is a weight per JRC task measure (``routine`` alone, ``physical +
+routine - social``, ...). Scenarios are stacked into a ``tasks x scenarios``
+matrix, so the scores of every ISCO-2d x NACE-2d cell of the ``TaskCube``
+under every scenario are a single ``cells x tasks`` @ ``tasks x scenarios``
+product. Task measures missing in a populated cell are filled with the ISCO
+group's population-weighted profile across industries first.
+
+The cell scores are then propagated:
+
+- ISCO-2d groups: mean over industries, weighted by the JRC job population
+  (or by a national industry mix of employees)
+- ESCO occupations: the score of their ISCO sub-major group
+- NACE divisions: mean over occupations, weighted by the JRC job population
+- DIRCE activities: the score of their NACE division, with the estimated
+  employees of the ``StrataCube``; NACE sections and the whole economy are
+  means over activities weighted by those employees
+
+Hundreds of scenarios run in one call::
+
+    engine = ExposureEngine.from_cube(TaskCube.load())
+    names, weights = scenario_matrix({"routine": {"routine": 1}, "manual": {"physical": 1, "routine": 1}}, engine.tasks)
+    scores = engine.occupation_scores(weights)  # (isco, scenarios)
+"""
+
+import argparse
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from src.analysis.dirce_strata import StrataCube
+from src.etl.jrc_tasks import CUBE_DIR, TaskCube, read_nace_divisions
+from src.utils.instrumentation import instrumented_run
+from src.utils.parquet_io import write_keyed_parquet
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+ESCO_PROFILES_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "esco", "esco_occupation_profiles.parquet")
+DIRCE_FILTERED_PATH = os.path.join(PROJECT_ROOT, "data", "derived", "ine_dirce_empresas_filtered.parquet")
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data", "derived", "task_exposure")
+
+SCORE_PREFIX = "score_"
+# Legal forms left out of the DIRCE aggregates (as in scripts/aggregate_ine_dirce.py)
+EXCLUDED_LEGAL_FORMS = ["Otras formas jurídicas", "Personas físicas"]
+
+# One scenario per top-level index of the JRC task framework
+DEFAULT_SCENARIOS = {
+    task: {task: 1.0}
+    for task in ("physical", "intellectual", "social", "autonomy", "team", "routine", "machines", "ICT")
+}
+
+
+def scenario_matrix(scenarios, tasks):
+    """Stack scenarios into a ``tasks x scenarios`` weight matrix.
+
+    Args:
+        scenarios (dict | pl.DataFrame): Scenario name -> {task: weight}, or a
+            frame with a ``scenario`` column and one column per weighted task
+            (missing tasks and nulls weigh 0)
+        tasks (list[str]): Task axis of the engine
+
+    Returns:
+        tuple[list[str], np.ndarray]: Scenario names and the weight matrix
+    """
+    if isinstance(scenarios, pl.DataFrame):
+        names = scenarios["scenario"].cast(pl.Utf8).to_list()
+        scenarios = {name: row for name, row in zip(names, scenarios.drop("scenario").fill_null(0).to_dicts())}
+    names = list(scenarios)
+    unknown = sorted({task for weights in scenarios.values() for task in weights} - set(tasks))
+    if unknown:
+        raise ValueError(f"Unknown task measures in scenarios: {', '.join(unknown)}")
+    position = {task: i for i, task in enumerate(tasks)}
+    matrix = np.zeros((len(tasks), len(names)), dtype=np.float64)
+    for j, name in enumerate(names):
+        for task, weight in scenarios[name].items():
+            matrix[position[task], j] = weight
+    return names, matrix
+
+
+def weighted_mean(scores, weights, axis):
+    """Mean of ``scores`` along ``axis`` of ``weights``, ignoring NaN scores.
+
+    Args:
+        scores (np.ndarray): Shape ``weights.shape + (scenarios,)``
+        weights (np.ndarray): Non-negative weights, 1-D or 2-D
+        axis (int): Axis of ``weights`` to collapse
+
+    Returns:
+        np.ndarray: Scores with ``axis`` removed; NaN where no weight is left
+    """
+    observed = ~np.isnan(scores)
+    weights = np.where(observed, np.asarray(weights, dtype=np.float64)[..., None], 0)
+    totals = (np.where(observed, scores, 0) * weights).sum(axis=axis)
+    weight_sum = weights.sum(axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(weight_sum > 0, totals / weight_sum, np.nan)
+
+
+@dataclass
+class ExposureEngine:
+    """Task profiles of the ISCO x NACE cells, flattened for batched scoring.
+
+    Attributes:
+        isco_codes (list[str]): ISCO sub-major groups (cube axis 0)
+        nace_codes (list[str]): NACE divisions (cube axis 1)
+        tasks (list[str]): Task measures (weight matrix rows)
+        features (np.ndarray): float64 array (isco * nace, task); 0 in cells
+            that cannot be scored
+        scored (np.ndarray): Boolean array (isco, nace) of the cells with a
+            population and a complete (imputed) task profile
+        population (np.ndarray): float64 array (isco, nace) of job population
+    """
+
+    isco_codes: list
+    nace_codes: list
+    tasks: list
+    features: np.ndarray
+    scored: np.ndarray
+    population: np.ndarray
+
+    @classmethod
+    def from_cube(cls, cube):
+        """Fill missing task measures from the ISCO group profiles and flatten the cube."""
+        values = np.asarray(cube.values, dtype=np.float64)
+        population = np.asarray(cube.population, dtype=np.float64)
+        values = np.where(np.isnan(values), cube.weighted_profile(axis=1)[:, None, :], values)
+        scored = (population > 0) & ~np.isnan(values).any(axis=2)
+        features = np.where(scored[:, :, None], values, 0).reshape(-1, len(cube.tasks))
+        return cls(list(cube.isco_codes), list(cube.nace_codes), list(cube.tasks),
+                   np.ascontiguousarray(features), scored, population)
+
+    def _weights(self, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape[0] != len(self.tasks):
+            raise ValueError(f"Expected {len(self.tasks)} task weights, got shape {weights.shape}")
+        return weights.reshape(len(self.tasks), -1)
+
+    def cell_scores(self, weights):
+        """Scores of every cell under every scenario.
+
+        Args:
+            weights (np.ndarray): (task, scenarios) matrix, or one task vector
+
+        Returns:
+            np.ndarray: Shape (isco, nace, scenarios); NaN in unscored cells
+        """
+        weights = self._weights(weights)
+        scores = (self.features @ weights).reshape(len(self.isco_codes), len(self.nace_codes), -1)
+        scores[~self.scored] = np.nan
+        return scores
+
+    def occupation_scores(self, weights, industry_employees=None):
+        """Scores per ISCO group, shape (isco, scenarios).
+
+        Args:
+            weights (np.ndarray): (task, scenarios) weight matrix
+            industry_employees (np.ndarray, optional): Employees per NACE
+                division (cube order, NaN = unknown). Industries are then
+                weighted by these employees, split over occupations by their
+                JRC population shares, instead of by the JRC population.
+        """
+        cell_weights = self.population
+        if industry_employees is not None:
+            employees = np.nan_to_num(np.asarray(industry_employees, dtype=np.float64))
+            industry_population = self.population.sum(axis=0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                shares = np.where(industry_population > 0, self.population / industry_population, 0)
+            cell_weights = shares * employees
+        return weighted_mean(self.cell_scores(weights), cell_weights, axis=1)
+
+    def industry_scores(self, weights):
+        """Scores per NACE division over its occupation mix, shape (nace, scenarios)."""
+        return weighted_mean(self.cell_scores(weights), self.population, axis=0)
+
+
+def _score_columns(names, scores):
+    return {f"{SCORE_PREFIX}{name}": pl.Series(scores[:, j], nan_to_null=True) for j, name in enumerate(names)}
+
+
+def _take(scores, codes, axis_codes):
+    """Rows of ``scores`` for ``codes`` (NaN rows for codes not on the axis)."""
+    position = {code: i for i, code in enumerate(axis_codes)}
+    rows = np.array([position.get(code, -1) for code in codes], dtype=np.int64)
+    taken = scores[np.maximum(rows, 0)] if len(scores) else np.full((len(rows), scores.shape[1]), np.nan)
+    taken[rows < 0] = np.nan
+    return taken
+
+
+def esco_occupation_scores(engine, names, weights, profiles, industry_employees=None):
+    """Scores of ESCO occupations through their ISCO sub-major group.
+
+    Returns:
+        pl.DataFrame: occupation_uri, occupation_name, isco_code,
+            isco_level_2_code and one ``score_<scenario>`` column per scenario
+    """
+    occupations = profiles.select("occupation_uri", "occupation_name", "isco_code", "isco_level_2_code")
+    scores = _take(engine.occupation_scores(weights, industry_employees),
+                   occupations["isco_level_2_code"].to_list(), engine.isco_codes)
+    return occupations.with_columns(**_score_columns(names, scores))
+
+
+def load_strata_cube(path=DIRCE_FILTERED_PATH):
+    """DIRCE company counts by 3-digit activity, stratum and year."""
+    df = pl.read_parquet(path).with_columns(pl.col(pl.Enum, pl.Categorical).cast(pl.Utf8))
+    df = df.filter((pl.col("code_length") == 3) & ~pl.col("Condición jurídica").is_in(EXCLUDED_LEGAL_FORMS))
+    return StrataCube.from_frame(df)
+
+
+def dirce_activity_scores(engine, names, weights, strata, year=None, midpoints=None):
+    """Scores of DIRCE activities through their NACE division.
+
+    Args:
+        engine (ExposureEngine): Scoring engine
+        names (list[str]): Scenario names
+        weights (np.ndarray): (task, scenarios) weight matrix
+        strata (StrataCube): DIRCE company counts by activity
+        year (int, optional): Year of the employee estimates (default: latest)
+        midpoints (np.ndarray, optional): Employees per company by stratum
+
+    Returns:
+        pl.DataFrame: activity_code, activity, nace_code, estimated_employees
+            and one ``score_<scenario>`` column per scenario
+    """
+    year = strata.years[-1] if year is None else year
+    employees = strata.estimated_employees(midpoints)[:, strata.year_index(year)]
+    nace_codes = [code[:2] for code in strata.activity_codes]
+    scores = _take(engine.industry_scores(weights), nace_codes, engine.nace_codes)
+    return pl.DataFrame({
+        "activity_code": strata.activity_codes,
+        "activity": strata.activities,
+        "nace_code": nace_codes,
+        "estimated_employees": employees,
+    }).with_columns(**_score_columns(names, scores))
+
+
+def rollup_scores(activities, names, by):
+    """Employee-weighted mean scores of activities per value of ``by``.
+
+    Returns:
+        pl.DataFrame: ``by``, estimated_employees and the score columns
+    """
+    codes = sorted(activities[by].unique().to_list())
+    position = {code: i for i, code in enumerate(codes)}
+    indicator = np.zeros((len(codes), activities.height), dtype=np.float64)
+    indicator[[position[code] for code in activities[by].to_list()], np.arange(activities.height)] = 1
+    employees = activities["estimated_employees"].to_numpy().astype(np.float64)
+    scores = activities.select(f"{SCORE_PREFIX}{name}" for name in names).to_numpy().astype(np.float64)
+    rolled = weighted_mean(scores[None], indicator * employees, axis=1)
+    return pl.DataFrame({by: codes, "estimated_employees": indicator @ employees}).with_columns(
+        **_score_columns(names, rolled)
+    )
+
+
+def division_employees(engine, activities):
+    """Estimated employees per NACE division of the engine (NaN where DIRCE has none)."""
+    per_division = activities.group_by("nace_code").agg(pl.col("estimated_employees").sum())
+    employees = dict(zip(per_division["nace_code"].to_list(), per_division["estimated_employees"].to_list()))
+    return np.array([employees.get(code, np.nan) for code in engine.nace_codes], dtype=np.float64)
+
+
+@instrumented_run("task_exposure")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score jobs, occupations and industries on task content")
+    parser.add_argument("--scenarios", help="CSV with a 'scenario' column and one weight column per task "
+                                            "(default: one scenario per top-level JRC task index)")
+    parser.add_argument("--year", type=int, help="DIRCE year of the employee estimates (default: latest)")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(CUBE_DIR):
+        print(f"Task cube not found: {CUBE_DIR}")
+        print("Run python -m src.etl.jrc_tasks first.")
+        return
+
+    engine = ExposureEngine.from_cube(TaskCube.load(CUBE_DIR))
+    scenarios = pl.read_csv(args.scenarios) if args.scenarios else DEFAULT_SCENARIOS
+    names, weights = scenario_matrix(scenarios, engine.tasks)
+    print(f"Scoring {int(engine.scored.sum())} ISCO x NACE cells under {len(names)} scenarios")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    cells = engine.cell_scores(weights)
+    isco_index, nace_index = np.nonzero(engine.scored)
+    cell_frame = pl.DataFrame({
+        "isco_code": [engine.isco_codes[i] for i in isco_index],
+        "nace_code": [engine.nace_codes[j] for j in nace_index],
+        "population": engine.population[isco_index, nace_index],
+    }).with_columns(**_score_columns(names, cells[isco_index, nace_index]))
+    path = os.path.join(args.output_dir, "cell_scores.parquet")
+    write_keyed_parquet(cell_frame, path, key=["isco_code", "nace_code"])
+    print(f"  {cell_frame.height} cells written to {path}")
+
+    industry_employees = None
+    if os.path.exists(DIRCE_FILTERED_PATH):
+        activities = dirce_activity_scores(engine, names, weights, load_strata_cube(), year=args.year)
+        sections = read_nace_divisions().select("nace_code", "nace_section")
+        activities = activities.join(sections, on="nace_code", how="left", maintain_order="left")
+        industry_employees = division_employees(engine, activities)
+        path = os.path.join(args.output_dir, "activity_scores.parquet")
+        write_keyed_parquet(activities, path, key="activity_code")
+        print(f"  {activities.height} DIRCE activities written to {path}")
+        section_frame = rollup_scores(activities.filter(pl.col("nace_section").is_not_null()), names,
+                                      "nace_section")
+        path = os.path.join(args.output_dir, "section_scores.parquet")
+        write_keyed_parquet(section_frame, path, key="nace_section")
+        print(f"  {section_frame.height} NACE sections written to {path}")
+        scores = activities.select(f"{SCORE_PREFIX}{name}" for name in names).to_numpy().astype(np.float64)
+        economy = weighted_mean(scores, activities["estimated_employees"].to_numpy(), axis=0)
+        for name, score in list(zip(names, economy))[:10]:
+            print(f"    {name:<24} {score:.3f}  (employee-weighted over all activities)")
+    else:
+        print(f"  DIRCE activity scores skipped: {DIRCE_FILTERED_PATH} not found "
+              f"(run scripts/transform_ine_dirce.py first)")
+
+    if os.path.exists(ESCO_PROFILES_PATH):
+        # ISCO groups are scored over the national industry mix when DIRCE is available
+        occupations = esco_occupation_scores(engine, names, weights, pl.read_parquet(ESCO_PROFILES_PATH),
+                                             industry_employees)
+        path = os.path.join(args.output_dir, "occupation_scores.parquet")
+        write_keyed_parquet(occupations, path, key="occupation_uri")
+        print(f"  {occupations.height} ESCO occupations written to {path}")
+    else:
+        print(f"  ESCO occupation scores skipped: {ESCO_PROFILES_PATH} not found")
+
+    print("\nTask exposure scoring completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
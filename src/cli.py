@@ -0,0 +1,115 @@
+"""
+Single command-line entry point for the pipeline stages (``fow``).
+
+Every stage of ``src.utils.stages.STAGES`` is a subcommand, next to a few
+tools that take their own arguments. Only the standard library is imported
+until a command runs (the pipeline runner only for ``run``); the command's module or script is then executed in
+process as ``__main__``, so Polars, DuckDB, pandas or openpyxl are loaded only
+by the command that uses them. All stages resolve their paths from the
+project root, so they can be run from any directory::
+
+    fow --help
+    fow stages
+    fow aggregate_onet
+    fow aggregate_job_offers --append data/raw/datamarket/daily/2025-06-01.csv
+    fow release_diff data/duckdb/onet_dataset_29.2.duckdb data/duckdb/onet_dataset_30.0.duckdb
+    fow run --profile ci aggregate_onet esco_occupations
+
+Without installing the entry point, ``python -m src.cli`` does the same from
+the repository root (or with the root on ``PYTHONPATH``).
+"""
+
+import argparse
+import os
+import runpy
+import sys
+
+from src.utils.stages import STAGES
+
+# Get the project root directory
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Commands outside the pipeline, as (command, description)
+TOOLS = {
+    "run": (("-m", "src.utils.pipeline"), "Run several stages within an execution profile's budget"),
+    "release_diff": (("-m", "src.etl.release_diff"), "Diff two releases of a DuckDB dataset"),
+    "compare_runs": (("-m", "src.utils.instrumentation", "compare"), "Compare two run reports"),
+}
+
+# Commands that parse their own arguments (everything after the command name is passed on)
+PASSTHROUGH = {"aggregate_job_offers", "aggregate_onet", "convert_esco_to_duckdb", "task_exposure", *TOOLS}
+
+
+def commands():
+    """Command name -> (command, description) for every stage and tool."""
+    stages = {
+        name: (stage.command, f"Pipeline stage{' (after ' + ', '.join(stage.requires) + ')' if stage.requires else ''}")
+        for name, stage in STAGES.items()
+    }
+    return {**stages, **TOOLS}
+
+
+def run_command(name, command, args):
+    """Execute a stage module or script as ``__main__`` with ``args`` as its arguments.
+
+    Returns:
+        int: Exit status
+    """
+    if command[0] == "-m":
+        module, *fixed_args = command[1:]
+        sys.argv = [name, *fixed_args, *args]
+        run = lambda: runpy.run_module(module, run_name="__main__", alter_sys=True)
+    else:
+        script, *fixed_args = command
+        path = os.path.join(PROJECT_ROOT, script)
+        sys.argv = [path, *fixed_args, *args]
+        run = lambda: runpy.run_path(path, run_name="__main__")
+    try:
+        run()
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    return 0
+
+
+def list_stages():
+    for name, stage in STAGES.items():
+        target = stage.command[1] if stage.command[0] == "-m" else stage.command[0]
+        requires = f"  (after {', '.join(stage.requires)})" if stage.requires else ""
+        print(f"{name:<24} {target}{requires}")
+    for name, (command, description) in TOOLS.items():
+        print(f"{name:<24} {' '.join(command[1:])}  ({description.lower()})")
+    return 0
+
+
+def paths():
+    print(f"project root: {PROJECT_ROOT}")
+    for name in ("raw", "duckdb", "processed", "derived"):
+        print(f"{name + ':':<13} {os.path.join(PROJECT_ROOT, 'data', name)}")
+    return 0
+
+
+def main(argv=None):
+    available = commands()
+    parser = argparse.ArgumentParser(prog="fow", description="Future of Work data pipeline")
+    subparsers = parser.add_subparsers(dest="command", metavar="command", required=True)
+    subparsers.add_parser("stages", help="List the stages and tools")
+    subparsers.add_parser("paths", help="Show the resolved data directories")
+    for name, (_, description) in available.items():
+        # Passthrough commands leave the arguments (and --help) to their own parser
+        subparsers.add_parser(name, help=description, add_help=name not in PASSTHROUGH)
+
+    args, rest = parser.parse_known_args(argv)
+    if rest and args.command not in PASSTHROUGH:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    if args.command == "stages":
+        return list_stages()
+    if args.command == "paths":
+        return paths()
+    return run_command(args.command, available[args.command][0], rest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
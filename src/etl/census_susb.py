@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Load the US Census SUSB firm counts by NAICS and enterprise receipts size.
+
+The workbook ``us_6digitnaics_rcptsize_2022.xlsx`` (Statistics of U.S.
+Businesses) publishes firms, establishments, employment, payroll and receipts
+for every NAICS level from sector to 6-digit industry, split by enterprise
+receipts size class. This script turns it into:
+
+- a typed Parquet cache (re-parsed only when the workbook changes)
+- a DuckDB database with the fact table, the NAICS hierarchy and a
+  NAICS <-> NACE Rev.2 crosswalk, sorted and indexed on their join keys
+
+Published totals are kept for levels 2-5 rather than summing 6-digit rows:
+firm counts are not additive across industries because a firm can operate
+in several of them.
+"""
+
+import os
+from pathlib import Path
+
+import polars as pl
+
+from src.utils.instrumentation import instrumented_run
+from src.utils.resources import connect
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+SUSB_YEAR = 2022
+SUSB_XLSX_PATH = os.path.join(PROJECT_ROOT, "data", "raw", "us_census_bureau", f"us_6digitnaics_rcptsize_{SUSB_YEAR}.xlsx")
+CACHE_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "us_census", f"susb_receipts_size_{SUSB_YEAR}.parquet")
+DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", f"us_census_susb_{SUSB_YEAR}.duckdb")
+# Optional finer-grained concordance (columns: naics_code, nace_code[, weight])
+CROSSWALK_CSV_PATH = os.path.join(PROJECT_ROOT, "data", "raw", "crosswalks", "naics_nace_rev2.csv")
+NACE_CSV_PATH = os.path.join(PROJECT_ROOT, "data", "raw", "ine_dirce", "nace_rev2.csv")
+
+HEADER_ROWS = 3  # title, source note, column header
+
+SUSB_COLUMNS = {
+    "NAICS": "naics_code",
+    "NAICS Description": "naics_description",
+    "Enterprise Size ($1,000)": "enterprise_size",
+    "Firms": "firms",
+    "Establishments": "establishments",
+    "Employment": "employment",
+    "Employment Noise Flag": "employment_noise_flag",
+    "Annual Payroll ($1,000)": "annual_payroll_k",
+    "Annual Payroll Noise Flag": "annual_payroll_noise_flag",
+    "Receipts ($1,000)": "receipts_k",
+    "Receipts Noise Flag": "receipts_noise_flag",
+}
+COUNT_COLUMNS = ["firms", "establishments", "employment", "annual_payroll_k", "receipts_k"]
+
+# NAICS sectors published as code ranges
+SECTOR_RANGES = {"31": "31-33", "32": "31-33", "33": "31-33",
+                 "44": "44-45", "45": "44-45", "48": "48-49", "49": "48-49"}
+
+# Sector-level NAICS 2022 -> NACE Rev.2 section correspondence. This is the
+# coarse fallback used when no concordance file is available; a sector that
+# spans several sections is split evenly between them.
+SECTOR_TO_NACE_SECTIONS = {
+    "11": ["A"],
+    "21": ["B"],
+    "22": ["D", "E"],
+    "23": ["F"],
+    "31-33": ["C"],
+    "42": ["G"],
+    "44-45": ["G"],
+    "48-49": ["H"],
+    "51": ["J"],
+    "52": ["K"],
+    "53": ["L", "N"],
+    "54": ["M"],
+    "55": ["M"],
+    "56": ["N", "E"],
+    "61": ["P"],
+    "62": ["Q"],
+    "71": ["R"],
+    "72": ["I"],
+    "81": ["S"],
+    "92": ["O"],
+}
+
+
+def read_susb(path=SUSB_XLSX_PATH, year=SUSB_YEAR):
+    """Parse the SUSB workbook into a typed frame covering every NAICS level.
+
+    Args:
+        path (str): Path to the SUSB receipts-size workbook
+        year (int): Reference year stored in the ``year`` column
+
+    Returns:
+        pl.DataFrame: One row per NAICS code x enterprise size class
+    """
+    raw = pl.read_excel(path, sheet_id=1, infer_schema_length=0, has_header=False)
+    # Header cells contain line breaks, e.g. "Receipts\n($1,000)"
+    header = [" ".join(str(value).split()) for value in raw.row(HEADER_ROWS - 1)]
+    raw = raw.slice(HEADER_ROWS).rename(dict(zip(raw.columns, header))).rename(SUSB_COLUMNS)
+
+    code = pl.col("naics_code").str.strip_chars()
+    size_bounds = pl.col("enterprise_size").str.extract(r"^\d+:\s*(.*)$", 1).str.replace_all(",", "")
+    return raw.select(
+        pl.lit(year, dtype=pl.Int32).alias("year"),
+        code.alias("naics_code"),
+        pl.col("naics_description").str.strip_chars(),
+        pl.when(code == "--").then(0)
+        .when(code.str.contains("-")).then(2)
+        .otherwise(code.str.len_chars())
+        .cast(pl.Int8).alias("naics_level"),
+        pl.col("enterprise_size").str.extract(r"^(\d+):", 1).alias("size_class_code"),
+        pl.col("enterprise_size").str.extract(r"^\d+:\s*(.*)$", 1).alias("size_class"),
+        # Receipts bounds in $1,000 (null for the Total class and open upper bound)
+        pl.when(size_bounds.str.starts_with("<")).then(0)
+        .otherwise(size_bounds.str.extract(r"^(\d+)", 1).cast(pl.Int64, strict=False))
+        .alias("receipts_lower_k"),
+        pl.when(size_bounds.str.starts_with("<")).then(size_bounds.str.extract(r"(\d+)", 1).cast(pl.Int64, strict=False))
+        .otherwise(size_bounds.str.extract(r"-(\d+)$", 1).cast(pl.Int64, strict=False))
+        .alias("receipts_upper_k"),
+        *[pl.col(col).str.replace_all(",", "").cast(pl.Int64, strict=False) for col in COUNT_COLUMNS],
+        pl.col("employment_noise_flag"),
+        pl.col("annual_payroll_noise_flag"),
+        pl.col("receipts_noise_flag"),
+    ).with_columns(
+        # Sector (range) code for every row, used as the 2-digit rollup key
+        pl.when(pl.col("naics_level") >= 2)
+        .then(pl.col("naics_code").str.slice(0, 2).replace(SECTOR_RANGES))
+        .otherwise(None)
+        .alias("naics_sector"),
+        *[
+            pl.when(pl.col("naics_level") >= level).then(pl.col("naics_code").str.slice(0, level)).otherwise(None)
+            .alias(f"naics_{level}")
+            for level in (3, 4, 5)
+        ],
+    ).sort(["naics_level", "naics_code", "size_class_code"])
+
+
+def load_susb(path=SUSB_XLSX_PATH, cache_path=CACHE_PATH, force=False):
+    """Return the typed SUSB table, re-parsing the workbook only when it changed."""
+    if (not force and os.path.exists(cache_path)
+            and os.path.getmtime(cache_path) >= os.path.getmtime(path)):
+        return pl.read_parquet(cache_path)
+    df = read_susb(path)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    df.write_parquet(cache_path, compression="zstd", statistics=True)
+    return df
+
+
+def naics_hierarchy(susb):
+    """NAICS codes with description, level and parent code, from the SUSB rows."""
+    codes = (
+        susb.filter(pl.col("naics_level") >= 2)
+        .select("naics_code", "naics_description", "naics_level", "naics_sector", "naics_3", "naics_4", "naics_5")
+        .unique(subset=["naics_code"], keep="first")
+    )
+    return codes.select(
+        "naics_code", "naics_description", "naics_level",
+        pl.when(pl.col("naics_level") == 3).then(pl.col("naics_sector"))
+        .when(pl.col("naics_level") == 4).then(pl.col("naics_3"))
+        .when(pl.col("naics_level") == 5).then(pl.col("naics_4"))
+        .when(pl.col("naics_level") == 6).then(pl.col("naics_5"))
+        .otherwise(None)
+        .alias("parent_code"),
+        "naics_sector",
+    ).sort(["naics_level", "naics_code"])
+
+
+def naics_nace_crosswalk(crosswalk_path=CROSSWALK_CSV_PATH, nace_path=NACE_CSV_PATH):
+    """Many-to-many NAICS <-> NACE Rev.2 link table with weights.
+
+    Uses the concordance CSV at ``crosswalk_path`` when present. Otherwise the
+    built-in sector -> section correspondence is used, with each NACE section
+    also expanded to its divisions so the table joins at either NACE level.
+
+    Returns:
+        pl.DataFrame: naics_code, nace_code, nace_level, weight, source
+    """
+    if os.path.exists(crosswalk_path):
+        links = pl.read_csv(crosswalk_path, infer_schema_length=0)
+        if "weight" not in links.columns:
+            links = links.with_columns(pl.lit(None, dtype=pl.Utf8).alias("weight"))
+        links = links.select(
+            pl.col("naics_code").str.strip_chars(),
+            pl.col("nace_code").str.strip_chars().str.replace_all(r"\.", ""),
+            pl.col("weight").cast(pl.Float64),
+        ).with_columns(
+            # Default to an even split of each NAICS code over its NACE codes
+            pl.col("weight").fill_null(1.0 / pl.len().over("naics_code")),
+            pl.when(pl.col("nace_code").str.contains(r"^[A-Z]$")).then(1)
+            .otherwise(pl.col("nace_code").str.len_chars()).cast(pl.Int8).alias("nace_level"),
+            pl.lit("concordance").alias("source"),
+        )
+        return links.select("naics_code", "nace_code", "nace_level", "weight", "source").sort(["naics_code", "nace_code"])
+
+    sections = pl.DataFrame(
+        [(sector, section, 1.0 / len(targets))
+         for sector, targets in SECTOR_TO_NACE_SECTIONS.items() for section in targets],
+        schema={"naics_code": pl.Utf8, "nace_code": pl.Utf8, "weight": pl.Float64},
+        orient="row",
+    ).with_columns(pl.lit(1, dtype=pl.Int8).alias("nace_level"))
+
+    divisions = (
+        pl.read_csv(nace_path, infer_schema_length=0)
+        .filter(pl.col("Level") == "2")
+        .select(pl.col("Parent").alias("section"), pl.col("Code").alias("division"))
+    )
+    section_divisions = sections.join(divisions, left_on="nace_code", right_on="section").select(
+        "naics_code",
+        pl.col("division").alias("nace_code"),
+        # spread the section weight evenly over its divisions
+        (pl.col("weight") / pl.len().over(["naics_code", "nace_code"])).alias("weight"),
+        pl.lit(2, dtype=pl.Int8).alias("nace_level"),
+    )
+    return (
+        pl.concat([sections.select(section_divisions.columns), section_divisions])
+        .with_columns(pl.lit("sector_builtin").alias("source"))
+        .select("naics_code", "nace_code", "nace_level", "weight", "source")
+        .sort(["naics_code", "nace_level", "nace_code"])
+    )
+
+
+@instrumented_run("census_susb")
+def main():
+    print(f"Loading SUSB workbook: {SUSB_XLSX_PATH}")
+    susb = load_susb(force=True)
+    print(f"  {susb.height} rows cached to {CACHE_PATH}")
+    print("  Rows per NAICS level:", dict(susb.group_by("naics_level").len().sort("naics_level").iter_rows()))
+
+    hierarchy = naics_hierarchy(susb)
+    crosswalk = naics_nace_crosswalk()
+    print(f"  NAICS codes: {hierarchy.height}, NAICS<->NACE links: {crosswalk.height} "
+          f"({crosswalk['source'][0] if crosswalk.height else 'none'})")
+
+    print(f"Creating/connecting to DuckDB database at: {DB_PATH}")
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    con = connect(DB_PATH)
+    try:
+        for table_name, df in (("susb_receipts_size", susb), ("naics_hierarchy", hierarchy),
+                               ("naics_nace_crosswalk", crosswalk)):
+            con.register(f"temp_{table_name}", df.to_arrow())
+            con.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM temp_{table_name}")
+            con.unregister(f"temp_{table_name}")
+            print(f"  Successfully imported {df.height} rows into table '{table_name}'")
+
+        indexes = {
+            "susb_receipts_size": ["naics_code", "naics_sector"],
+            "naics_hierarchy": ["naics_code", "parent_code"],
+            "naics_nace_crosswalk": ["naics_code", "nace_code"],
+        }
+        for table_name, columns in indexes.items():
+            for column in columns:
+                con.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_{column} ON {table_name} ({column})")
+
+        # Convenience view: 6-digit industries with every published rollup level
+        con.execute("""
+            CREATE OR REPLACE VIEW susb_6digit_with_rollups AS
+            SELECT
+                d.*,
+                s.firms AS sector_firms,
+                n3.firms AS naics_3_firms,
+                n4.firms AS naics_4_firms,
+                n5.firms AS naics_5_firms
+            FROM susb_receipts_size d
+            LEFT JOIN susb_receipts_size s  ON s.naics_level = 2 AND s.naics_code = d.naics_sector AND s.size_class_code = d.size_class_code
+            LEFT JOIN susb_receipts_size n3 ON n3.naics_level = 3 AND n3.naics_code = d.naics_3 AND n3.size_class_code = d.size_class_code
+            LEFT JOIN susb_receipts_size n4 ON n4.naics_level = 4 AND n4.naics_code = d.naics_4 AND n4.size_class_code = d.size_class_code
+            LEFT JOIN susb_receipts_size n5 ON n5.naics_level = 5 AND n5.naics_code = d.naics_5 AND n5.size_class_code = d.size_class_code
+            WHERE d.naics_level = 6
+        """)
+    finally:
+        con.close()
+
+    print("\nUS Census SUSB import completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,30 +3,199 @@
 Convert ESCO CSV dataset to DuckDB database
 This script loads all CSV files from the ESCO dataset into a DuckDB database,
 allowing for fast SQL queries on the data.
+
+Several language packs can be loaded at once (``--languages en es de``). The
+CSVs of the first (primary) language are imported one table per file as
+before (``occupations_en``, ...). On top of that, every pack feeds shared,
+language-independent tables:
+
+- ``concepts``: one row per concept URI with its type, status and codes
+- ``occupation_skill_relations``, ``broader_relations_occ_pillar``,
+  ``broader_relations_skill_pillar``, ``skill_skill_relations``,
+  ``skills_hierarchy`` and ``collection_members``: URI-only relations,
+  stored once whatever the number of languages
+- ``concept_labels``: one narrow table (language, conceptUri, conceptType,
+  role, text) with every preferred/alternative/hidden label, description,
+  definition and scope note, ordered by language; it is also exported as
+  Parquet partitioned by language
+
+Matching labels in another language is then a filtered join, e.g.
+``JOIN concept_labels l ON l.text = offer.role AND l.language = 'es'``.
 """
 
+import argparse
 import os
 import glob
-import duckdb
+import shutil
 import pandas as pd
 from pathlib import Path
 
+from src.utils.instrumentation import instrumented_run
+from src.utils.resources import connect
+
 # Get the project root directory
 PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
 
 # Configuration
 CSV_DIR = os.path.join(PROJECT_ROOT, "data", "raw", "esco", "1.2.0")
 DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", "esco_dataset_1.2.0.duckdb")
+LABELS_PARQUET_DIR = os.path.join(PROJECT_ROOT, "data", "processed", "esco", "concept_labels")
+DEFAULT_LANGUAGES = ["en"]
+
+# Concept files (label-bearing) of a language pack
+CONCEPT_FILES = ["occupations", "skills", "skillGroups", "ISCOGroups"]
+CONCEPT_ATTRIBUTES = ["conceptType", "status", "code", "iscoGroup", "skillType", "reuseLevel",
+                      "regulatedProfessionNote", "inScheme"]
+# Label columns -> role in concept_labels; list columns are newline-separated
+LABEL_COLUMNS = {
+    "preferredLabel": ("preferred", False),
+    "altLabels": ("alternative", True),
+    "hiddenLabels": ("hidden", True),
+    "description": ("description", False),
+    "definition": ("definition", False),
+    "scopeNote": ("scope_note", False),
+}
+
+# Language-independent relation files -> (shared table, columns kept)
+RELATION_FILES = {
+    "occupationSkillRelations": ("occupation_skill_relations", ["occupationUri", "relationType", "skillType", "skillUri"]),
+    "broaderRelationsOccPillar": ("broader_relations_occ_pillar", ["conceptType", "conceptUri", "broaderType", "broaderUri"]),
+    "broaderRelationsSkillPillar": ("broader_relations_skill_pillar", ["conceptType", "conceptUri", "broaderType", "broaderUri"]),
+    "skillSkillRelations": ("skill_skill_relations", ["originalSkillUri", "originalSkillType", "relationType",
+                                                      "relatedSkillType", "relatedSkillUri"]),
+    "skillsHierarchy": ("skills_hierarchy", [f"Level {level} {part}" for level in range(4) for part in ("URI", "code")]),
+}
+COLLECTION_SUFFIX = "Collection"
+
+
+def language_pack(language, csv_dir=CSV_DIR):
+    """CSV files of one language pack, keyed by file stem without the language suffix.
+
+    Files are looked up as ``<csv_dir>/*_<lang>.csv`` and ``<csv_dir>/<lang>/*_<lang>.csv``.
+    """
+    suffix = f"_{language}"
+    files = glob.glob(os.path.join(csv_dir, f"*{suffix}.csv")) + glob.glob(os.path.join(csv_dir, language, f"*{suffix}.csv"))
+    return {Path(f).stem[:-len(suffix)]: f for f in sorted(files)}
+
+
+def _register_csv(con, csv_file, alias):
+    """Expose a CSV as a view named ``alias``; returns its column names.
+
+    Every column is read as text so codes keep their leading zeros.
+    """
+    if Path(csv_file).stem.startswith("skillsHierarchy"):
+        # Use pandas to read the file with explicit CSV options (escaped quotes)
+        con.register(alias, pd.read_csv(csv_file, delimiter=',', quotechar='"', escapechar='\\', dtype=str))
+    else:
+        con.execute(f"""
+            CREATE OR REPLACE TEMP VIEW {alias} AS
+            SELECT * FROM read_csv_auto('{csv_file}', ignore_errors=false, delim=',', quote='"', all_varchar=true)
+        """)
+    return [row[0] for row in con.execute(f'DESCRIBE {alias}').fetchall()]
+
+
+def _quote(column):
+    return f'"{column}"'
+
+
+def build_shared_tables(con, packs):
+    """Build the language-independent tables and ``concept_labels`` from several packs.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): Target database
+        packs (dict): language -> ``language_pack`` mapping; relations and
+            concept attributes come from the first pack that has the file
+    """
+    # Relations: stored once, from the first pack providing them
+    for stem, (table, wanted) in RELATION_FILES.items():
+        source = next((pack[stem] for pack in packs.values() if stem in pack), None)
+        if source is None:
+            print(f"  No {stem} file in any language pack, skipping '{table}'")
+            continue
+        available = _register_csv(con, source, f"relation_{stem}")
+        columns = ", ".join(_quote(c) for c in wanted if c in available)
+        con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT DISTINCT {columns} FROM relation_{stem}")
+        print(f"  {table}: {con.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]} rows")
+
+    # Collection memberships (e.g. greenSkillsCollection -> 'green')
+    members = []
+    for stem, csv_file in next(iter(packs.values())).items():
+        if stem.endswith(COLLECTION_SUFFIX):
+            collection = stem[:-len(COLLECTION_SUFFIX)].removesuffix("Skills")
+            _register_csv(con, csv_file, f"collection_{collection}")
+            members.append(f"SELECT DISTINCT '{collection}' AS collection, conceptUri FROM collection_{collection}")
+    if members:
+        con.execute(f"CREATE OR REPLACE TABLE collection_members AS {' UNION ALL '.join(members)}")
+        print(f"  collection_members: {con.execute('SELECT COUNT(*) FROM collection_members').fetchone()[0]} rows")
+
+    # Concepts and their labels in every language
+    concepts, labels = [], []
+    for language, pack in packs.items():
+        for stem in CONCEPT_FILES:
+            if stem not in pack:
+                continue
+            alias = f"concepts_{language}_{stem}"
+            available = _register_csv(con, pack[stem], alias)
+            attributes = ", ".join(
+                f"{_quote(c)} AS {c}" if c in available else f"NULL::VARCHAR AS {c}" for c in CONCEPT_ATTRIBUTES
+            )
+            concepts.append(f"SELECT conceptUri, {attributes} FROM {alias}")
+            for column, (role, is_list) in LABEL_COLUMNS.items():
+                if column not in available:
+                    continue
+                text = f"unnest(string_split({_quote(column)}, chr(10)))" if is_list else _quote(column)
+                labels.append(f"""
+                    SELECT '{language}' AS language, conceptUri, conceptType, '{role}' AS role, trim({text}) AS text
+                    FROM {alias} WHERE {_quote(column)} IS NOT NULL
+                """)
+    if not concepts:
+        print("  No concept files found, skipping 'concepts' and 'concept_labels'")
+        return
+    con.execute(f"""
+        CREATE OR REPLACE TABLE concepts AS
+        SELECT conceptUri, {", ".join(f"any_value({c}) AS {c}" for c in CONCEPT_ATTRIBUTES)}
+        FROM ({" UNION ALL ".join(concepts)})
+        GROUP BY conceptUri
+        ORDER BY conceptUri
+    """)
+    # Ordered by language so scans filtered on one language skip the others' row groups
+    con.execute(f"""
+        CREATE OR REPLACE TABLE concept_labels AS
+        SELECT DISTINCT * FROM ({" UNION ALL ".join(labels)})
+        WHERE text <> ''
+        ORDER BY language, conceptUri, role
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_concept_labels_uri ON concept_labels (conceptUri)")
+    # Start from an empty directory so languages dropped since the last run leave no partitions behind
+    if os.path.isdir(LABELS_PARQUET_DIR):
+        shutil.rmtree(LABELS_PARQUET_DIR)
+    os.makedirs(LABELS_PARQUET_DIR)
+    con.execute(f"""
+        COPY concept_labels TO '{LABELS_PARQUET_DIR}'
+        (FORMAT parquet, PARTITION_BY (language), COMPRESSION zstd)
+    """)
+    for language, n in con.execute("SELECT language, COUNT(*) FROM concept_labels GROUP BY language ORDER BY language").fetchall():
+        print(f"  concept_labels[{language}]: {n} rows")
+    print(f"  concepts: {con.execute('SELECT COUNT(*) FROM concepts').fetchone()[0]} rows; "
+          f"labels exported to {LABELS_PARQUET_DIR}")
+
+
+@instrumented_run("convert_esco_to_duckdb")
+def main(languages=None):
+    languages = languages or DEFAULT_LANGUAGES
+    packs = {language: language_pack(language, CSV_DIR) for language in languages}
+    for language, pack in packs.items():
+        if not pack:
+            raise FileNotFoundError(f"No ESCO CSV files for language '{language}' in {CSV_DIR}")
 
-def main():
     # Connect to DuckDB database (will be created if it doesn't exist)
     print(f"Creating/connecting to DuckDB database at: {DB_PATH}")
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    con = duckdb.connect(DB_PATH)
+    con = connect(DB_PATH)
     
-    # Get all CSV files
-    csv_files = glob.glob(os.path.join(CSV_DIR, "*.csv"))
-    print(f"Found {len(csv_files)} CSV files to import")
+    # Per-file tables of the primary language
+    csv_files = list(packs[languages[0]].values())
+    print(f"Found {len(csv_files)} CSV files to import for primary language '{languages[0]}'")
     
     # Import each CSV file as a table
     for csv_file in csv_files:
@@ -88,7 +257,10 @@ def main():
         print("Views created successfully")
     except Exception as e:
         print(f"Error creating views: {e}")
-    
+
+    print(f"Building shared concept tables for languages: {', '.join(languages)}")
+    build_shared_tables(con, packs)
+
     # Close the connection
     con.close()
     print("\nDatabase creation completed successfully!")
@@ -96,4 +268,7 @@ def main():
     print("Example query: SELECT * FROM occupations_en LIMIT 10;")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Convert ESCO CSV language packs to DuckDB")
+    parser.add_argument("--languages", nargs="+", default=DEFAULT_LANGUAGES,
+                        help="Language codes to load; the first one is the primary language")
+    main(parser.parse_args().languages)
@@ -7,10 +7,12 @@ allowing for fast SQL queries on the data.
 
 import os
 import glob
-import duckdb
 import pandas as pd
 from pathlib import Path
 
+from src.utils.instrumentation import instrumented_run
+from src.utils.resources import connect
+
 # Get the project root directory
 PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
 
@@ -26,11 +28,12 @@ def sanitize_table_name(name):
     sanitized = ''.join(c for c in sanitized if c.isalnum() or c == '_')
     return sanitized.lower()
 
+@instrumented_run("convert_onet_to_duckdb")
 def main():
     # Connect to DuckDB database (will be created if it doesn't exist)
     print(f"Creating/connecting to DuckDB database at: {DB_PATH}")
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    con = duckdb.connect(DB_PATH)
+    con = connect(DB_PATH)
     
     # Get all Excel files (excluding any temporary files like ~$)
     excel_files = [f for f in glob.glob(os.path.join(EXCEL_DIR, "*.xlsx")) if not os.path.basename(f).startswith("~$")]
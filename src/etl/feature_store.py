@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Occupation feature store in memory-mapped Arrow IPC format.
+
+Joins the occupation-level outputs into one table keyed by ESCO
+``occupation_uri`` and writes it as a single uncompressed Arrow IPC (Feather
+v2) file, sorted by key, so readers memory-map it and read columns without
+copying or decompressing. Each source adds a prefixed block of numeric
+features:
+
+- ESCO profiles: the base rows (key, name, ISCO codes) and their numeric and
+  boolean columns
+- ``jobs_``: job-offer counts and median salaries (``aggregate_job_offers``)
+- ``onet_``: O*NET/OEWS aggregates, weighted over the ESCO <-> O*NET links
+  (``occupation_crosswalk``; skipped until the crosswalk has been built)
+- ``industry_``: INE DIRCE division features (size shares, firm growth,
+  employees per company) averaged over the industries each ISCO sub-major
+  group works in, weighted by the JRC tasks job population (``jrc_tasks``)
+
+Missing sources are skipped with a message, so the store can be rebuilt as
+more inputs become available. Reading::
+
+    store = FeatureStore.open()
+    matrix, found = store.vectors(["http://data.europa.eu/esco/occupation/..."])
+    for keys, matrix in store.batches(all_keys, batch_size=512, columns=["onet_A_MEDIAN"]):
+        ...
+"""
+
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+
+from src.etl.jrc_tasks import CUBE_DIR, TaskCube
+from src.etl.occupation_crosswalk import LINKS_PATH, esco_onet_wide
+from src.utils.instrumentation import instrumented_run
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+ESCO_PROFILES_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "esco", "esco_occupation_profiles.parquet")
+JOB_OFFERS_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "datamarket", "job_offers_aggregated_by_occupation.parquet")
+ONET_AGGREGATED_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "onet", "onet_occupations_aggregated.parquet")
+DIRCE_DIVISION_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "ine_dirce", "ine_dirce_aggregated_by_division.parquet")
+STORE_PATH = os.path.join(PROJECT_ROOT, "data", "derived", "feature_store", "occupation_features.arrow")
+
+KEY_COLUMN = "occupation_uri"
+ID_COLUMNS = [KEY_COLUMN, "occupation_name", "isco_code", "isco_level_2_code"]
+DIRCE_FIRST_YEAR, DIRCE_LAST_YEAR = 2020, 2024
+
+
+def _numeric_columns(df, exclude=()):
+    return [c for c, dtype in df.schema.items()
+            if c not in exclude and (dtype.is_numeric() or dtype == pl.Boolean)]
+
+
+def esco_features(path=ESCO_PROFILES_PATH):
+    """Base rows: identifiers plus the numeric and boolean profile columns."""
+    esco = pl.read_parquet(path)
+    return esco.select(ID_COLUMNS + _numeric_columns(esco, exclude=ID_COLUMNS))
+
+
+def job_offer_features(esco_columns, path=JOB_OFFERS_PATH, prefix="jobs_"):
+    """Job-offer columns (the profile columns the file repeats are dropped)."""
+    jobs = pl.read_parquet(path)
+    columns = _numeric_columns(jobs, exclude=set(esco_columns))
+    return jobs.select(KEY_COLUMN, *[pl.col(c).alias(f"{prefix}{c}") for c in columns])
+
+
+def onet_features(esco, onet_path=ONET_AGGREGATED_PATH, links_path=LINKS_PATH, prefix="onet_"):
+    """O*NET/OEWS aggregates weighted over the ESCO <-> O*NET links."""
+    onet = pl.read_parquet(onet_path)
+    links = pl.read_parquet(links_path)
+    wide = esco_onet_wide(esco.select(KEY_COLUMN), onet, links, columns=_numeric_columns(onet), prefix=prefix)
+    return wide.select(KEY_COLUMN, *[c for c in wide.columns if c.startswith(prefix)])
+
+
+def dirce_division_features(path=DIRCE_DIVISION_PATH):
+    """Per NACE division: company size shares, firm growth and employees per company."""
+    dirce = pl.read_parquet(path)
+    size_columns = [c for c in dirce.columns if c.startswith("Size_") and c.endswith("_pct")]
+    return dirce.select(
+        pl.col("Division").str.slice(0, 2).alias("nace_code"),
+        *[pl.col(c).alias(c.removeprefix("Size_").removesuffix("_pct").split(" ")[0].lower() + "_company_pct")
+          for c in size_columns],
+        ((pl.col(f"Total_{DIRCE_LAST_YEAR}") / pl.col(f"Total_{DIRCE_FIRST_YEAR}") - 1) * 100)
+        .alias(f"company_growth_{DIRCE_FIRST_YEAR}_{DIRCE_LAST_YEAR}_pct"),
+        (pl.col(f"Estimated_Employees_{DIRCE_LAST_YEAR}") / pl.col(f"Total_{DIRCE_LAST_YEAR}"))
+        .alias("employees_per_company"),
+    ).with_columns(pl.selectors.float().fill_nan(None))
+
+
+def industry_features(cube, divisions, prefix="industry_"):
+    """DIRCE division features averaged per ISCO sub-major group.
+
+    Each group's industries are weighted by the JRC job population of the
+    (ISCO, NACE) cell; divisions without DIRCE data carry no weight.
+
+    Returns:
+        pl.DataFrame: isco_level_2_code plus one column per division feature
+    """
+    features = [c for c in divisions.columns if c != "nace_code"]
+    # Division feature matrix aligned to the cube's NACE axis (NaN where DIRCE has no data)
+    aligned = pl.DataFrame({"nace_code": cube.nace_codes}).join(divisions, on="nace_code", how="left",
+                                                                 maintain_order="left")
+    values = aligned.select(features).to_numpy().astype(np.float64)
+    observed = ~np.isnan(values)
+    population = np.asarray(cube.population, dtype=np.float64)
+    totals = population @ np.where(observed, values, 0)
+    weights = population @ observed
+    with np.errstate(invalid="ignore", divide="ignore"):
+        averages = np.where(weights > 0, totals / weights, np.nan)
+    return pl.DataFrame(
+        {"isco_level_2_code": cube.isco_codes}
+        | {f"{prefix}{name}": averages[:, i] for i, name in enumerate(features)}
+    ).with_columns(pl.selectors.float().fill_nan(None))
+
+
+def build_features():
+    """Join every available source onto the ESCO occupations, sorted by key."""
+    esco = esco_features(ESCO_PROFILES_PATH)
+    esco_columns = pl.read_parquet_schema(ESCO_PROFILES_PATH).keys()
+    print(f"  ESCO profiles: {esco.height} occupations, {esco.width - len(ID_COLUMNS)} features")
+    blocks = []
+    if os.path.exists(JOB_OFFERS_PATH):
+        blocks.append(("job offers", job_offer_features(esco_columns, JOB_OFFERS_PATH), KEY_COLUMN))
+    if os.path.exists(LINKS_PATH) and os.path.exists(ONET_AGGREGATED_PATH):
+        blocks.append(("O*NET", onet_features(esco, ONET_AGGREGATED_PATH, LINKS_PATH), KEY_COLUMN))
+    else:
+        print(f"  O*NET features skipped: run src.etl.occupation_crosswalk first ({LINKS_PATH} missing)")
+    if os.path.isdir(CUBE_DIR) and os.path.exists(DIRCE_DIVISION_PATH):
+        industry = industry_features(TaskCube.load(CUBE_DIR), dirce_division_features())
+        blocks.append(("DIRCE industry", industry, "isco_level_2_code"))
+    else:
+        print("  Industry features skipped: run src.etl.jrc_tasks and scripts/aggregate_ine_dirce.py first")
+
+    features = esco
+    for name, block, on in blocks:
+        features = features.join(block, on=on, how="left", maintain_order="left")
+        print(f"  {name}: {block.width - 1} features")
+    return features.sort(KEY_COLUMN)
+
+
+def write_store(df, path=STORE_PATH):
+    """Write ``df`` as one uncompressed Arrow IPC file (one record batch)."""
+    table = df.to_arrow().combine_chunks()
+    table = table.replace_schema_metadata({
+        "key": KEY_COLUMN,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+    })
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=table.num_rows or None)
+    return path
+
+
+class FeatureStore:
+    """Read-only, memory-mapped view of the occupation feature store.
+
+    Attributes:
+        table (pa.Table): The store; column buffers point into the mapped file
+        keys (np.ndarray): Sorted key column
+        features (list[str]): Numeric feature columns
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.key = table.schema.metadata.get(b"key", KEY_COLUMN.encode()).decode()
+        self.keys = table.column(self.key).to_numpy(zero_copy_only=False)
+        self.features = [f.name for f in table.schema
+                         if pa.types.is_integer(f.type) or pa.types.is_floating(f.type) or pa.types.is_boolean(f.type)]
+
+    @classmethod
+    def open(cls, path=STORE_PATH):
+        """Memory-map the store; no column data is read until it is used."""
+        return cls(pa.ipc.open_file(pa.memory_map(path, "r")).read_all())
+
+    def positions(self, keys):
+        """Row positions of ``keys`` in the store (-1 for unknown keys)."""
+        keys = np.asarray(keys, dtype=object)
+        if not len(self.keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[positions] == keys, positions, -1)
+
+    def get(self, keys, columns=None):
+        """Rows for ``keys`` (unknown keys are dropped) as a Polars frame."""
+        positions = self.positions(keys)
+        table = self.table if columns is None else self.table.select([self.key, *columns])
+        return pl.from_arrow(table.take(positions[positions >= 0]))
+
+    def vectors(self, keys, columns=None, dtype=np.float32):
+        """Feature matrix for ``keys``, one row per key in the given order.
+
+        Returns:
+            tuple: (``len(keys) x len(columns)`` array with NaN for nulls and
+                unknown keys, boolean mask of the keys that were found)
+        """
+        columns = columns or self.features
+        positions = self.positions(keys)
+        found = positions >= 0
+        matrix = np.full((len(positions), len(columns)), np.nan, dtype=dtype)
+        rows = self.table.select(columns).take(positions[found])
+        for j, name in enumerate(columns):
+            column = rows.column(name)
+            if pa.types.is_boolean(column.type):
+                column = column.cast(pa.uint8())
+            matrix[found, j] = column.to_numpy(zero_copy_only=False).astype(dtype, copy=False)
+        return matrix, found
+
+    def batches(self, keys, batch_size=1024, columns=None, dtype=np.float32):
+        """Yield ``(keys, matrix)`` for consecutive batches of ``keys``."""
+        keys = list(keys)
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            yield batch, self.vectors(batch, columns=columns, dtype=dtype)[0]
+
+
+@instrumented_run("feature_store")
+def main():
+    print(f"Building occupation feature store from: {ESCO_PROFILES_PATH}")
+    features = build_features()
+    path = write_store(features)
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"  {features.height} occupations x {features.width - len(ID_COLUMNS)} features "
+          f"({size_mb:.1f} MB) written to {path}")
+
+    print("\nOccupation feature store built successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Load the JRC-Eurofound European Tasks database (EU15) into DuckDB and NumPy.
+
+The raw file is a wide, tab-separated table with one row per job
+(NACE Rev.2 division x ISCO-08 sub-major group) keyed by text labels such as
+"1. Crop and animal production..." and "11. Chief executives...". This script
+extracts the numeric codes, joins them to the NACE Rev.2 and ISCO hierarchies
+and writes:
+
+- a typed DuckDB database with the task table and both dimension tables
+- a dense float32 cube (ISCO-2d x NACE-2d x task) as .npy, with the job
+  population matrix and the axis labels alongside, so task profiles can be
+  sliced or aggregated by array index
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from src.utils.instrumentation import instrumented_run
+from src.utils.resources import connect
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+TASKS_CSV_PATH = os.path.join(PROJECT_ROOT, "data", "raw", "jrc_publication", "tasks eu isco2d nace2d EU15.csv")
+NACE_CSV_PATH = os.path.join(PROJECT_ROOT, "data", "raw", "ine_dirce", "nace_rev2.csv")
+ISCO_HIERARCHY_PATH = os.path.join(PROJECT_ROOT, "data", "derived", "isco_hierarchy.parquet")
+DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", "jrc_tasks_eu15.duckdb")
+CUBE_DIR = os.path.join(PROJECT_ROOT, "data", "derived", "jrc_tasks")
+
+CUBE_FILENAME = "task_cube.npy"
+POPULATION_FILENAME = "task_population.npy"
+AXES_FILENAME = "task_cube_axes.json"
+
+# Non-task columns of the raw file
+KEY_COLUMNS = ["nace", "isco"]
+POPULATION_COLUMN = "pop"
+
+
+def read_tasks(path=TASKS_CSV_PATH):
+    """Read the raw JRC table and split its text keys into codes and labels.
+
+    Args:
+        path (str): Path to the tab-separated JRC tasks file
+
+    Returns:
+        tuple[pl.DataFrame, list[str]]: Typed table with nace_code, nace_label,
+            isco_code, isco_label, one Float64 column per task and population;
+            and the task column names in file order
+    """
+    df = pl.read_csv(path, separator="\t", null_values=[""], infer_schema_length=0)
+    task_columns = [col for col in df.columns if col not in KEY_COLUMNS + [POPULATION_COLUMN]]
+
+    label_pattern = r"^(\d+)\.\s*(.*)$"
+    df = df.select(
+        pl.col("nace").str.extract(label_pattern, 1).str.zfill(2).alias("nace_code"),
+        pl.col("nace").str.extract(label_pattern, 2).alias("nace_label"),
+        pl.col("isco").str.extract(label_pattern, 1).str.zfill(2).alias("isco_code"),
+        pl.col("isco").str.extract(label_pattern, 2).alias("isco_label"),
+        *[pl.col(col).cast(pl.Float64) for col in task_columns],
+        pl.col(POPULATION_COLUMN).cast(pl.Float64).alias("population"),
+    )
+    unparsed = df.filter(pl.col("nace_code").is_null() | pl.col("isco_code").is_null()).height
+    if unparsed:
+        raise ValueError(f"{unparsed} rows in {path} have nace/isco labels without a numeric code")
+    return df.sort(["isco_code", "nace_code"]), task_columns
+
+
+def read_nace_divisions(path=NACE_CSV_PATH):
+    """NACE Rev.2 divisions (level 2) with their section letter."""
+    return (
+        pl.read_csv(path, infer_schema_length=0)
+        .filter(pl.col("Level") == "2")
+        .select(
+            pl.col("Code").alias("nace_code"),
+            pl.col("Description").alias("nace_division"),
+            pl.col("Parent").alias("nace_section"),
+        )
+        .sort("nace_code")
+    )
+
+
+def read_isco_submajor_groups(path=ISCO_HIERARCHY_PATH):
+    """ISCO-08 sub-major groups (level 2) with their major group code."""
+    return (
+        pl.read_parquet(path)
+        .filter(pl.col("level") == 2)
+        .select(
+            pl.col("code").alias("isco_code"),
+            pl.col("label").alias("isco_submajor_group"),
+            pl.col("parent_code").alias("isco_major_code"),
+        )
+        .sort("isco_code")
+    )
+
+
+@dataclass
+class TaskCube:
+    """Dense task-intensity cube indexed by ISCO-2d, NACE-2d and task.
+
+    Cells with no observation are NaN in ``values`` and 0 in ``population``.
+
+    Attributes:
+        isco_codes (list[str]): Axis 0 labels (every ISCO sub-major group)
+        nace_codes (list[str]): Axis 1 labels (every NACE division)
+        tasks (list[str]): Axis 2 labels
+        values (np.ndarray): float32 array (isco, nace, task)
+        population (np.ndarray): float64 array (isco, nace) of job population
+    """
+
+    isco_codes: list
+    nace_codes: list
+    tasks: list
+    values: np.ndarray
+    population: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df, tasks, isco_codes, nace_codes):
+        """Scatter the long task table into a dense cube over the given axes."""
+        isco_position = {code: i for i, code in enumerate(isco_codes)}
+        nace_position = {code: i for i, code in enumerate(nace_codes)}
+        df = df.filter(pl.col("isco_code").is_in(isco_codes) & pl.col("nace_code").is_in(nace_codes))
+        rows = np.array([isco_position[code] for code in df["isco_code"].to_list()], dtype=np.int64)
+        cols = np.array([nace_position[code] for code in df["nace_code"].to_list()], dtype=np.int64)
+
+        values = np.full((len(isco_codes), len(nace_codes), len(tasks)), np.nan, dtype=np.float32)
+        values[rows, cols, :] = df.select(tasks).to_numpy().astype(np.float32)
+        population = np.zeros((len(isco_codes), len(nace_codes)), dtype=np.float64)
+        population[rows, cols] = df["population"].to_numpy()
+        return cls(list(isco_codes), list(nace_codes), list(tasks), values, population)
+
+    @classmethod
+    def load(cls, cube_dir=CUBE_DIR, mmap_mode="r"):
+        """Load a cube saved with ``save``; arrays are memory-mapped by default."""
+        with open(os.path.join(cube_dir, AXES_FILENAME), "r", encoding="utf-8") as f:
+            axes = json.load(f)
+        return cls(
+            isco_codes=axes["isco_codes"],
+            nace_codes=axes["nace_codes"],
+            tasks=axes["tasks"],
+            values=np.load(os.path.join(cube_dir, CUBE_FILENAME), mmap_mode=mmap_mode),
+            population=np.load(os.path.join(cube_dir, POPULATION_FILENAME), mmap_mode=mmap_mode),
+        )
+
+    def save(self, cube_dir=CUBE_DIR):
+        """Write the cube, population matrix and axis labels to ``cube_dir``."""
+        os.makedirs(cube_dir, exist_ok=True)
+        np.save(os.path.join(cube_dir, CUBE_FILENAME), self.values)
+        np.save(os.path.join(cube_dir, POPULATION_FILENAME), self.population)
+        with open(os.path.join(cube_dir, AXES_FILENAME), "w", encoding="utf-8") as f:
+            json.dump({"isco_codes": self.isco_codes, "nace_codes": self.nace_codes, "tasks": self.tasks}, f, indent=2)
+
+    def occupation(self, isco_code):
+        """Task profiles of one ISCO group across all industries, shape (nace, task)."""
+        return self.values[self.isco_codes.index(isco_code)]
+
+    def industry(self, nace_code):
+        """Task profiles of one NACE division across all occupations, shape (isco, task)."""
+        return self.values[:, self.nace_codes.index(nace_code)]
+
+    def task(self, name):
+        """One task measure over all jobs, shape (isco, nace)."""
+        return self.values[:, :, self.tasks.index(name)]
+
+    def weighted_profile(self, axis):
+        """Population-weighted mean task profile along one axis.
+
+        Missing cells are ignored (they carry no weight for that task).
+
+        Args:
+            axis (int): 1 to collapse industries (one profile per ISCO group),
+                0 to collapse occupations (one profile per NACE division)
+
+        Returns:
+            np.ndarray: Shape (isco, task) or (nace, task); NaN where no data
+        """
+        observed = ~np.isnan(self.values)
+        weights = self.population[:, :, None] * observed
+        totals = np.where(observed, self.values, 0) * weights
+        weight_sum = weights.sum(axis=axis)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(weight_sum > 0, totals.sum(axis=axis) / weight_sum, np.nan)
+
+
+@instrumented_run("jrc_tasks")
+def main():
+    print(f"Reading JRC tasks file: {TASKS_CSV_PATH}")
+    tasks_df, task_columns = read_tasks()
+    print(f"  {tasks_df.height} jobs x {len(task_columns)} task measures")
+
+    nace_df = read_nace_divisions()
+    isco_df = read_isco_submajor_groups()
+
+    unmatched_nace = tasks_df.join(nace_df, on="nace_code", how="anti")["nace_code"].unique().to_list()
+    unmatched_isco = tasks_df.join(isco_df, on="isco_code", how="anti")["isco_code"].unique().to_list()
+    if unmatched_nace or unmatched_isco:
+        print(f"  Warning: codes not found in reference tables - NACE: {unmatched_nace}, ISCO: {unmatched_isco}")
+
+    print(f"Creating/connecting to DuckDB database at: {DB_PATH}")
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    con = connect(DB_PATH)
+    try:
+        for table_name, df in (("tasks_isco_nace", tasks_df), ("nace_divisions", nace_df),
+                               ("isco_submajor_groups", isco_df)):
+            con.register(f"temp_{table_name}", df.to_arrow())
+            con.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM temp_{table_name}")
+            con.unregister(f"temp_{table_name}")
+            row_count = con.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+            print(f"  Successfully imported {row_count} rows into table '{table_name}'")
+
+        con.execute("""
+            CREATE OR REPLACE VIEW tasks_isco_nace_labelled AS
+            SELECT
+                t.*,
+                n.nace_division,
+                n.nace_section,
+                i.isco_submajor_group,
+                i.isco_major_code
+            FROM tasks_isco_nace t
+            LEFT JOIN nace_divisions n ON t.nace_code = n.nace_code
+            LEFT JOIN isco_submajor_groups i ON t.isco_code = i.isco_code
+        """)
+    finally:
+        con.close()
+
+    cube = TaskCube.from_frame(
+        tasks_df, task_columns, isco_df["isco_code"].to_list(), nace_df["nace_code"].to_list()
+    )
+    cube.save()
+    observed = int((cube.population > 0).sum())
+    print(f"Task cube {cube.values.shape} (isco, nace, task) with {observed} observed jobs saved to: {CUBE_DIR}")
+
+    print("\nJRC tasks import completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
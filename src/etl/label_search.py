@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Full-text label search over the ESCO and O*NET vocabularies.
+
+Builds an inverted index at ETL time from:
+
+- ESCO occupations, skills, skill groups and ISCO groups
+  (``preferredLabel``, ``altLabels``, ``hiddenLabels``, ``description``)
+- O*NET occupations (title, alternate and short titles, description) and
+  content model elements (element name, description)
+
+Every concept is one document with three fields: label, alternative labels
+and description. Term frequencies are weighted per field (``FIELD_WEIGHTS``)
+and documents are ranked with BM25. A query token ending in ``*`` matches
+every term with that prefix (type-ahead).
+
+The index is written twice:
+
+- ``data/derived/label_search/``: the vocabulary and the term x document CSR
+  postings as .npy files, memory-mapped by ``LabelIndex.load`` for
+  sub-millisecond lookups from Python
+- ``data/duckdb/label_search.duckdb``: the same postings as tables plus a
+  ``search_labels(q, k := 10)`` table macro for SQL, e.g.
+  ``SELECT * FROM search_labels('softw* develop', k := 5)``
+"""
+
+import json
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from src.utils.instrumentation import instrumented_run
+from src.utils.resources import connect
+from src.utils.sparse import CSRMatrix
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+ESCO_DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", "esco_dataset_1.2.0.duckdb")
+ONET_DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", "onet_dataset_29.2.duckdb")
+INDEX_DIR = os.path.join(PROJECT_ROOT, "data", "derived", "label_search")
+SEARCH_DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", "label_search.duckdb")
+
+DOCS_FILENAME = "docs.parquet"
+TERMS_FILENAME = "terms.parquet"
+META_FILENAME = "index.json"
+
+FIELDS = ["label", "alt_labels", "description"]
+FIELD_WEIGHTS = {"label": 3.0, "alt_labels": 2.0, "description": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Tokens are lowercase ASCII alphanumeric runs, in Python and in SQL alike
+TOKEN_PATTERN = r"[a-z0-9]+"
+QUERY_TOKEN_PATTERN = r"[a-z0-9]+\*?"
+
+# ESCO concept tables -> document type
+ESCO_TABLES = {
+    "occupations_en": "occupation",
+    "skills_en": "skill",
+    "skillGroups_en": "skill_group",
+    "ISCOGroups_en": "isco_group",
+}
+
+
+def read_esco_documents(con):
+    """One document per ESCO concept in the tables of ``ESCO_TABLES`` that exist."""
+    existing = {row[0] for row in con.execute("SHOW TABLES").fetchall()}
+    frames = []
+    for table, doc_type in ESCO_TABLES.items():
+        if table not in existing:
+            continue
+        columns = {row[0] for row in con.execute(f"DESCRIBE {table}").fetchall()}
+        hidden = "hiddenLabels" if "hiddenLabels" in columns else "NULL"
+        frames.append(con.sql(f"""
+            SELECT 'esco' AS source, '{doc_type}' AS type, conceptUri AS uri, preferredLabel AS label,
+                   concat_ws(chr(10), altLabels, {hidden}) AS alt_labels, description
+            FROM {table}
+            WHERE conceptUri IS NOT NULL
+        """).pl())
+    return pl.concat(frames) if frames else None
+
+
+def read_onet_documents(con):
+    """O*NET occupations (with alternate titles) and content model elements."""
+    occupations = con.sql("""
+        SELECT 'onet' AS source, 'occupation' AS type, o.onetsoc_code AS uri, o.title AS label,
+               a.alt_labels, o.description
+        FROM occupation_data o
+        LEFT JOIN (
+            SELECT onetsoc_code,
+                   string_agg(concat_ws(chr(10), alternate_title, short_title), chr(10)) AS alt_labels
+            FROM alternate_titles
+            GROUP BY onetsoc_code
+        ) a USING (onetsoc_code)
+    """).pl()
+    elements = con.sql("""
+        SELECT 'onet' AS source, 'element' AS type, element_id AS uri, element_name AS label,
+               NULL::VARCHAR AS alt_labels, description
+        FROM content_model_reference
+    """).pl()
+    return pl.concat([occupations, elements])
+
+
+def tokenize(text):
+    """Index tokens of a string (same rule as the SQL macro)."""
+    return re.findall(TOKEN_PATTERN, text.lower())
+
+
+@dataclass
+class LabelIndex:
+    """BM25 inverted index over concept labels.
+
+    Attributes:
+        docs (pl.DataFrame): doc_id, source, type, uri, label (row ``i`` has doc_id ``i``)
+        terms (np.ndarray): Sorted vocabulary; term id ``t`` is ``terms[t]``
+        idf (np.ndarray): float32 BM25 idf per term
+        postings (CSRMatrix): term x document field-weighted term frequencies
+        length_norm (np.ndarray): float32 ``k1 * (1 - b + b * len / avg_len)`` per document
+    """
+
+    docs: pl.DataFrame
+    terms: np.ndarray
+    idf: np.ndarray
+    postings: CSRMatrix
+    length_norm: np.ndarray
+
+    @classmethod
+    def build(cls, documents, k1=BM25_K1, b=BM25_B):
+        """Index a frame with source, type, uri and the ``FIELDS`` columns."""
+        docs = documents.unique(subset=["source", "type", "uri"], keep="first", maintain_order=True)
+        docs = docs.with_row_index("doc_id")
+        tokens = pl.concat([
+            docs.select(
+                "doc_id",
+                pl.col(field).fill_null("").str.to_lowercase().str.extract_all(TOKEN_PATTERN).alias("term"),
+                pl.lit(FIELD_WEIGHTS[field], dtype=pl.Float32).alias("weight"),
+            ).explode("term").drop_nulls("term")
+            for field in FIELDS
+        ])
+        tf = tokens.group_by("doc_id", "term").agg(pl.col("weight").sum().alias("tf"))
+
+        terms = tf["term"].unique().sort()
+        term_ids = tf["term"].replace_strict(terms, pl.int_range(terms.len(), eager=True), return_dtype=pl.Int64)
+        n_docs = docs.height
+        postings = CSRMatrix.from_coo(term_ids.to_numpy(), tf["doc_id"].to_numpy(), tf["tf"].to_numpy(),
+                                      (terms.len(), n_docs))
+
+        df = postings.row_lengths()
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        doc_length = np.bincount(postings.indices, weights=postings.data, minlength=n_docs)
+        avg_length = doc_length.mean() if n_docs else 1.0
+        length_norm = (k1 * (1 - b + b * doc_length / avg_length)).astype(np.float32)
+        return cls(docs.select("doc_id", "source", "type", "uri", "label"), terms.to_numpy().astype(str),
+                   idf, postings, length_norm)
+
+    def save(self, index_dir=INDEX_DIR):
+        """Write the documents, vocabulary and postings to ``index_dir``."""
+        os.makedirs(index_dir, exist_ok=True)
+        self.docs.write_parquet(os.path.join(index_dir, DOCS_FILENAME))
+        pl.DataFrame({"term": self.terms, "idf": self.idf}).with_row_index("term_id").write_parquet(
+            os.path.join(index_dir, TERMS_FILENAME))
+        self.postings.save(index_dir, "postings")
+        np.save(os.path.join(index_dir, "length_norm.npy"), self.length_norm)
+        with open(os.path.join(index_dir, META_FILENAME), "w", encoding="utf-8") as f:
+            json.dump({"n_docs": self.docs.height, "n_terms": len(self.terms),
+                       "k1": BM25_K1, "b": BM25_B, "field_weights": FIELD_WEIGHTS}, f, indent=2)
+
+    @classmethod
+    def load(cls, index_dir=INDEX_DIR, mmap_mode="r"):
+        """Load an index written by ``save``; postings are memory-mapped by default."""
+        with open(os.path.join(index_dir, META_FILENAME), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        terms = pl.read_parquet(os.path.join(index_dir, TERMS_FILENAME)).sort("term_id")
+        return cls(
+            docs=pl.read_parquet(os.path.join(index_dir, DOCS_FILENAME)),
+            terms=terms["term"].to_numpy().astype(str),
+            idf=terms["idf"].to_numpy(),
+            postings=CSRMatrix.load(index_dir, "postings", meta["n_docs"], mmap_mode=mmap_mode),
+            length_norm=np.load(os.path.join(index_dir, "length_norm.npy"), mmap_mode=mmap_mode),
+        )
+
+    def term_ids(self, token, prefix=False):
+        """Ids of the term equal to ``token``, or of every term starting with it."""
+        lo = np.searchsorted(self.terms, token, side="left")
+        if prefix:
+            hi = np.searchsorted(self.terms, token + "￿", side="left")
+            return np.arange(lo, hi)
+        return np.array([lo]) if lo < len(self.terms) and self.terms[lo] == token else np.array([], dtype=np.int64)
+
+    def scores(self, query, prefix_last=False):
+        """BM25 score of every document for ``query`` (dense float32 array).
+
+        Tokens ending in ``*`` are prefix queries (``prefix_last`` treats the
+        last token as one, for type-ahead). A prefix token scores each
+        document by its best-matching term.
+        """
+        raw_tokens = re.findall(QUERY_TOKEN_PATTERN, query.lower())
+        # One entry per token, a prefix query if any occurrence is one (as in search_labels)
+        tokens = {}
+        for i, raw in enumerate(raw_tokens):
+            token = raw.rstrip("*")
+            prefix = raw.endswith("*") or (prefix_last and i == len(raw_tokens) - 1)
+            tokens[token] = tokens.get(token, False) or prefix
+        total = np.zeros(self.docs.height, dtype=np.float32)
+        for token, prefix in tokens.items():
+            ids = self.term_ids(token, prefix=prefix)
+            if not len(ids):
+                continue
+            owners, entries = self.postings.gather(ids)
+            docs = self.postings.indices[entries]
+            tf = self.postings.data[entries]
+            score = self.idf[ids][owners] * tf * (BM25_K1 + 1) / (tf + self.length_norm[docs])
+            best = np.zeros_like(total)
+            np.maximum.at(best, docs, score)
+            total += best
+        return total
+
+    def search(self, query, k=10, source=None, type=None, prefix_last=False):
+        """Top ``k`` documents for ``query`` as a DataFrame with a ``score`` column.
+
+        Args:
+            query (str): Free text; ``word*`` is a prefix query
+            k (int): Number of results
+            source (str, optional): 'esco' or 'onet'
+            type (str, optional): e.g. 'occupation', 'skill', 'element'
+            prefix_last (bool): Treat the last token as a prefix (type-ahead)
+        """
+        scores = self.scores(query, prefix_last=prefix_last)
+        if source is not None:
+            scores[(self.docs["source"] != source).to_numpy()] = 0
+        if type is not None:
+            scores[(self.docs["type"] != type).to_numpy()] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return self.docs[hits].with_columns(pl.Series("score", scores[hits]))
+
+
+def write_search_db(index, db_path=SEARCH_DB_PATH):
+    """Load the index into DuckDB tables and define the ``search_labels`` macro."""
+    postings = index.postings
+    search_terms = pl.DataFrame({"term": index.terms, "idf": index.idf}).with_row_index("term_id")
+    search_postings = pl.DataFrame({
+        "term_id": postings.row_ids().astype(np.uint32),
+        "doc_id": np.asarray(postings.indices).astype(np.uint32),
+        "tf": np.asarray(postings.data),
+    })
+    search_docs = index.docs.with_columns(pl.Series("length_norm", np.asarray(index.length_norm)))
+
+    con = connect(db_path)
+    try:
+        for name, frame in [("search_terms", search_terms), ("search_postings", search_postings),
+                            ("search_docs", search_docs)]:
+            con.register(f"{name}_df", frame)
+            con.execute(f"CREATE OR REPLACE TABLE {name} AS SELECT * FROM {name}_df")
+            con.unregister(f"{name}_df")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_search_terms_term ON search_terms (term)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_search_postings_term ON search_postings (term_id)")
+        con.execute(f"""
+            CREATE OR REPLACE MACRO search_labels(q, k := 10) AS TABLE
+            WITH query_tokens AS (
+                SELECT DISTINCT rtrim(raw, '*') AS token, ends_with(raw, '*') AS is_prefix
+                FROM (SELECT unnest(regexp_extract_all(lower(q), '{QUERY_TOKEN_PATTERN}')) AS raw)
+            ),
+            matched AS (
+                SELECT qt.token, t.term_id, t.idf
+                FROM query_tokens qt
+                JOIN search_terms t ON t.term = qt.token OR (qt.is_prefix AND starts_with(t.term, qt.token))
+            ),
+            per_token AS (
+                SELECT p.doc_id, m.token,
+                       max(m.idf * p.tf * {BM25_K1 + 1} / (p.tf + d.length_norm)) AS score
+                FROM matched m
+                JOIN search_postings p USING (term_id)
+                JOIN search_docs d USING (doc_id)
+                GROUP BY p.doc_id, m.token
+            )
+            SELECT d.doc_id, d.source, d.type, d.uri, d.label, sum(s.score) AS score
+            FROM per_token s JOIN search_docs d USING (doc_id)
+            GROUP BY ALL
+            ORDER BY score DESC, d.doc_id
+            LIMIT k
+        """)
+    finally:
+        con.close()
+
+
+@instrumented_run("label_search")
+def main():
+    frames = []
+    for name, db_path, reader in [("ESCO", ESCO_DB_PATH, read_esco_documents),
+                                  ("O*NET", ONET_DB_PATH, read_onet_documents)]:
+        if not os.path.exists(db_path):
+            print(f"  {name} database not found at {db_path}, skipping")
+            continue
+        print(f"Reading {name} vocabulary from: {db_path}")
+        con = connect(db_path, read_only=True)
+        try:
+            documents = reader(con)
+        finally:
+            con.close()
+        if documents is not None:
+            print(f"  {documents.height} documents")
+            frames.append(documents)
+
+    if not frames:
+        print("No vocabulary to index. Run src.etl.convert_esco_to_duckdb or src.etl.convert_onet_to_duckdb first.")
+        return
+
+    index = LabelIndex.build(pl.concat(frames))
+    index.save()
+    print(f"  Indexed {index.docs.height} documents, {len(index.terms)} terms, "
+          f"{index.postings.nnz} postings; saved to {INDEX_DIR}")
+    write_search_db(index)
+    print(f"  search_labels() macro written to {SEARCH_DB_PATH}")
+
+    print("\nLabel search index built successfully!")
+
+
+if __name__ == "__main__":
+    main()
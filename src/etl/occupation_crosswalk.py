@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+ESCO <-> O*NET occupation crosswalk via ISCO-08 <-> SOC 2018.
+
+ESCO occupations carry a 4-digit ISCO-08 code and O*NET occupations an
+O*NET-SOC code (``XX-XXXX.XX``, whose first 7 characters are the SOC 2018
+code). Given an ISCO-08 <-> SOC 2018 mapping file (e.g. the BLS crosswalk
+saved as ``data/raw/crosswalks/isco_soc_crosswalk.csv`` or ``.xlsx``), this
+script resolves the chain once into a many-to-many link table
+``esco_uri <-> onetsoc_code`` with two weights:
+
+- ``weight_esco``: share of the ESCO occupation attributed to the O*NET
+  occupation (sums to 1 per ``esco_uri``)
+- ``weight_onet``: share of the O*NET occupation attributed to the ESCO
+  occupation (sums to 1 per ``onetsoc_code``)
+
+Each ISCO code is split evenly over its SOC codes and each SOC code evenly
+over its O*NET-SOC detail codes (and the other way round for
+``weight_onet``). The links are written sorted by ``esco_uri`` to Parquet
+and to a DuckDB database with both keys indexed. ``esco_onet_wide`` uses
+them to attach weighted O*NET/OEWS columns to the ESCO profiles.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from src.etl.oews import soc_code_expr
+from src.utils.instrumentation import instrumented_run
+from src.utils.resources import connect
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+CROSSWALK_DIR = os.path.join(PROJECT_ROOT, "data", "raw", "crosswalks")
+ISCO_SOC_PATHS = [os.path.join(CROSSWALK_DIR, f"isco_soc_crosswalk.{ext}") for ext in ("csv", "xlsx")]
+ESCO_PROFILES_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "esco", "esco_occupation_profiles.parquet")
+ONET_AGGREGATED_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "onet", "onet_occupations_aggregated.parquet")
+LINKS_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "crosswalks", "esco_onet_links.parquet")
+DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", "occupation_crosswalk.duckdb")
+
+# Accepted header spellings (CSV exports and the BLS workbook)
+ISCO_COLUMNS = ["isco08_code", "isco_code", "ISCO-08 Code", "ISCO 08 Code", "ISCO-08"]
+SOC_COLUMNS = ["soc2018_code", "soc_code", "2018 SOC Code", "SOC 2018 Code", "2018 SOC"]
+PART_COLUMNS = ["part", "Part"]
+
+
+def _find(columns, candidates, path):
+    for name in candidates:
+        if name in columns:
+            return name
+    raise ValueError(f"None of the columns {candidates} found in {path} (columns: {columns})")
+
+
+def read_isco_soc(path):
+    """Normalised ISCO-08 <-> SOC 2018 pairs from a CSV or Excel mapping.
+
+    Returns:
+        pl.DataFrame: isco_code (4 digits), soc_code (XX-XXXX), partial (bool)
+    """
+    if path.endswith(".csv"):
+        raw = pl.read_csv(path, infer_schema_length=0)
+    else:
+        raw = pl.read_excel(path, sheet_id=1, infer_schema_length=0, has_header=False)
+        # Workbooks carry title rows above the header; use the first row naming an ISCO column
+        header_row = next(i for i, row in enumerate(raw.iter_rows())
+                          if any(" ".join(str(v).split()) in ISCO_COLUMNS for v in row if v is not None))
+        header = [" ".join(str(v).split()) if v is not None else f"column_{i}"
+                  for i, v in enumerate(raw.row(header_row))]
+        raw = raw.slice(header_row + 1).rename(dict(zip(raw.columns, header)))
+
+    isco = _find(raw.columns, ISCO_COLUMNS, path)
+    soc = _find(raw.columns, SOC_COLUMNS, path)
+    part = next((c for c in PART_COLUMNS if c in raw.columns), None)
+    return (
+        raw.select(
+            pl.col(isco).str.strip_chars().str.zfill(4).alias("isco_code"),
+            pl.col(soc).str.strip_chars().alias("soc_code"),
+            (pl.col(part).str.strip_chars().fill_null("") != "" if part else pl.lit(False)).alias("partial"),
+        )
+        .filter(pl.col("isco_code").str.contains(r"^\d{4}$") & pl.col("soc_code").str.contains(r"^\d{2}-\d{4}$"))
+        .unique(subset=["isco_code", "soc_code"], keep="first")
+        .sort(["isco_code", "soc_code"])
+    )
+
+
+def resolve_links(isco_soc, esco, onet):
+    """Resolve ESCO occupation -> ISCO -> SOC -> O*NET-SOC into weighted links.
+
+    Args:
+        isco_soc (pl.DataFrame): isco_code, soc_code, partial
+        esco (pl.DataFrame): occupation_uri, isco_code
+        onet (pl.DataFrame): onetsoc_code
+
+    Returns:
+        pl.DataFrame: esco_uri, onetsoc_code, isco_code, soc_code, partial,
+            weight_esco, weight_onet; sorted by esco_uri, onetsoc_code
+    """
+    onet_codes = onet.select("onetsoc_code").unique().with_columns(soc_code_expr("onetsoc_code"))
+    links = (
+        esco.select(pl.col("occupation_uri").alias("esco_uri"), "isco_code")
+        .join(isco_soc, on="isco_code")
+        .join(onet_codes, on="soc_code")
+    )
+    # Even splits down the chain, in both directions
+    links = links.with_columns(
+        (1.0 / pl.col("soc_code").n_unique().over("isco_code")
+         / pl.col("onetsoc_code").n_unique().over("soc_code")).alias("weight_esco"),
+        (1.0 / pl.col("isco_code").n_unique().over("soc_code")
+         / pl.col("esco_uri").n_unique().over("isco_code")).alias("weight_onet"),
+    )
+    # Renormalise over the codes that exist on both sides
+    return links.with_columns(
+        pl.col("weight_esco") / pl.col("weight_esco").sum().over("esco_uri"),
+        pl.col("weight_onet") / pl.col("weight_onet").sum().over("onetsoc_code"),
+    ).select(
+        "esco_uri", "onetsoc_code", "isco_code", "soc_code", "partial", "weight_esco", "weight_onet",
+    ).sort(["esco_uri", "onetsoc_code"])
+
+
+def esco_onet_wide(esco, onet, links, columns=None, prefix="onet_"):
+    """ESCO occupations with weighted O*NET/OEWS columns attached.
+
+    O*NET rows are gathered for every link by binary search on the sorted
+    ``onetsoc_code`` column, aggregated per ESCO occupation (weighted mean by
+    ``weight_esco`` over non-null values) and attached with a single hash
+    join on ``occupation_uri``.
+
+    Args:
+        esco (pl.DataFrame): ESCO profiles with ``occupation_uri``
+        onet (pl.DataFrame): O*NET aggregates with ``onetsoc_code``
+        links (pl.DataFrame): Output of ``resolve_links``
+        columns (list[str], optional): Numeric O*NET columns to carry over
+            (default: every numeric column)
+        prefix (str): Prefix for the attached columns
+
+    Returns:
+        pl.DataFrame: ``esco`` plus ``{prefix}primary_code`` (highest-weight
+            link), ``{prefix}n_links`` and one column per ``columns`` entry
+    """
+    onet = onet.sort("onetsoc_code")
+    if columns is None:
+        columns = [c for c, dtype in onet.schema.items() if dtype.is_numeric()]
+    codes = onet["onetsoc_code"].to_numpy()
+    positions = np.searchsorted(codes, links["onetsoc_code"].to_numpy())
+    found = positions < len(codes)
+    found[found] = codes[positions[found]] == links["onetsoc_code"].to_numpy()[found]
+
+    gathered = pl.concat([
+        links.filter(pl.Series(found)).select("esco_uri", "onetsoc_code", "weight_esco"),
+        onet.select(columns)[positions[found]],
+    ], how="horizontal")
+    weight = pl.col("weight_esco")
+    aggregated = gathered.group_by("esco_uri", maintain_order=True).agg(
+        pl.col("onetsoc_code").sort_by(weight, descending=True).first().alias(f"{prefix}primary_code"),
+        pl.len().alias(f"{prefix}n_links"),
+        *[
+            ((pl.col(c) * weight).sum() / weight.filter(pl.col(c).is_not_null()).sum()).alias(f"{prefix}{c}")
+            for c in columns
+        ],
+    )
+    return esco.join(aggregated, left_on="occupation_uri", right_on="esco_uri", how="left")
+
+
+@instrumented_run("occupation_crosswalk")
+def main():
+    crosswalk_path = next((path for path in ISCO_SOC_PATHS if os.path.exists(path)), None)
+    if crosswalk_path is None:
+        print(f"No ISCO-08 <-> SOC 2018 mapping found (looked for {', '.join(ISCO_SOC_PATHS)}).")
+        print("Save the BLS ISCO-08/SOC 2018 crosswalk there (columns like 'ISCO-08 Code' and '2018 SOC Code').")
+        return
+
+    print(f"Reading ISCO-08 <-> SOC 2018 mapping from: {crosswalk_path}")
+    isco_soc = read_isco_soc(crosswalk_path)
+    esco = pl.read_parquet(ESCO_PROFILES_PATH, columns=["occupation_uri", "isco_code"])
+    onet = pl.read_parquet(ONET_AGGREGATED_PATH, columns=["onetsoc_code"])
+    links = resolve_links(isco_soc, esco, onet)
+    print(f"  {isco_soc.height} ISCO<->SOC pairs -> {links.height} ESCO<->O*NET links covering "
+          f"{links['esco_uri'].n_unique()}/{esco.height} ESCO and "
+          f"{links['onetsoc_code'].n_unique()}/{onet.height} O*NET occupations")
+
+    os.makedirs(os.path.dirname(LINKS_PATH), exist_ok=True)
+    links.write_parquet(LINKS_PATH, row_group_size=16_384, statistics=True)
+    print(f"  Links saved to {LINKS_PATH}")
+
+    print(f"Creating/connecting to DuckDB database at: {DB_PATH}")
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    con = connect(DB_PATH)
+    try:
+        for table_name, df in (("isco_soc_crosswalk", isco_soc), ("esco_onet_links", links)):
+            con.register(f"temp_{table_name}", df.to_arrow())
+            con.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM temp_{table_name}")
+            con.unregister(f"temp_{table_name}")
+            print(f"  Successfully imported {df.height} rows into table '{table_name}'")
+
+        indexes = {
+            "isco_soc_crosswalk": ["isco_code", "soc_code"],
+            "esco_onet_links": ["esco_uri", "onetsoc_code"],
+        }
+        for table_name, columns in indexes.items():
+            for column in columns:
+                con.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_{column} ON {table_name} ({column})")
+    finally:
+        con.close()
+
+    print("\nESCO <-> O*NET crosswalk built successfully!")
+
+
+if __name__ == "__main__":
+    main()
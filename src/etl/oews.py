@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Load BLS Occupational Employment and Wage Statistics (OEWS) releases.
+
+Every national release workbook (``national_M<year>_dl.xlsx``) found in the
+raw OEWS folder is parsed once into a typed Parquet dataset partitioned by
+year (``data/processed/oews/year=<year>/``). OEWS null markers ('*', '**',
+'#', '~') are turned into nulls in the same pass that casts each column.
+STEM flags from a matching ``stem_<year>.xlsx`` are attached when present.
+A release is only re-parsed when its workbook is newer than its partition.
+
+Downstream code reads the cached partitions with ``load_oews`` and joins to
+O*NET through ``soc_code`` (the first 7 characters of an O*NET-SOC code).
+"""
+
+import logging
+import os
+import re
+from pathlib import Path
+
+import polars as pl
+
+from src.utils.instrumentation import instrumented_run
+from src.utils.resources import connect
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+OEWS_RAW_DIR = os.path.join(PROJECT_ROOT, "data", "raw", "OEWS")
+OEWS_OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data", "processed", "oews")
+ONET_DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", "onet_dataset_29.2.duckdb")
+SOC_KEY_PATH = os.path.join(OEWS_OUTPUT_DIR, "soc_onetsoc_key.parquet")
+
+RELEASE_PATTERN = re.compile(r"^national_M(\d{4})_dl\.xlsx$")
+STEM_PATTERN = re.compile(r"^stem_(\d{4})\.xlsx$")
+STEM_SHEET = "STEM occupations list"
+
+# Values OEWS uses in numeric columns for suppressed or top-coded estimates
+NULL_MARKERS = ["*", "**", "#", "~", ""]
+
+# Typed schema of the national release (older releases use lowercase names)
+OEWS_SCHEMA = {
+    "AREA": pl.Utf8,
+    "AREA_TITLE": pl.Utf8,
+    "AREA_TYPE": pl.Utf8,
+    "PRIM_STATE": pl.Utf8,
+    "NAICS": pl.Utf8,
+    "NAICS_TITLE": pl.Utf8,
+    "I_GROUP": pl.Utf8,
+    "OWN_CODE": pl.Utf8,
+    "OCC_CODE": pl.Utf8,
+    "OCC_TITLE": pl.Utf8,
+    "O_GROUP": pl.Utf8,
+    "TOT_EMP": pl.Int64,
+    "EMP_PRSE": pl.Float64,
+    "JOBS_1000": pl.Float64,
+    "LOC_QUOTIENT": pl.Float64,
+    "PCT_TOTAL": pl.Float64,
+    "PCT_RPT": pl.Float64,
+    "H_MEAN": pl.Float64,
+    "A_MEAN": pl.Float64,
+    "MEAN_PRSE": pl.Float64,
+    "H_PCT10": pl.Float64,
+    "H_PCT25": pl.Float64,
+    "H_MEDIAN": pl.Float64,
+    "H_PCT75": pl.Float64,
+    "H_PCT90": pl.Float64,
+    "A_PCT10": pl.Float64,
+    "A_PCT25": pl.Float64,
+    "A_MEDIAN": pl.Float64,
+    "A_PCT75": pl.Float64,
+    "A_PCT90": pl.Float64,
+    "ANNUAL": pl.Boolean,
+    "HOURLY": pl.Boolean,
+}
+
+# Header spellings used by earlier releases
+COLUMN_ALIASES = {
+    "OCC_GROUP": "O_GROUP",
+    "GROUP": "O_GROUP",
+    "AREA_NAME": "AREA_TITLE",
+}
+
+
+def discover_releases(raw_dir=OEWS_RAW_DIR):
+    """Map release year -> workbook path for every national release in ``raw_dir``."""
+    releases = {}
+    for name in sorted(os.listdir(raw_dir)):
+        match = RELEASE_PATTERN.match(name)
+        if match:
+            releases[int(match.group(1))] = os.path.join(raw_dir, name)
+    return releases
+
+
+def _typed(col, dtype):
+    """Expression casting a raw string column to ``dtype`` with null markers removed."""
+    value = pl.col(col).str.strip_chars()
+    if dtype == pl.Boolean:
+        return value.str.to_uppercase().eq("TRUE").fill_null(False).alias(col)
+    if dtype == pl.Utf8:
+        return value.alias(col)
+    cleaned = pl.when(value.is_in(NULL_MARKERS)).then(None).otherwise(value.str.replace_all(",", ""))
+    if dtype == pl.Int64:
+        # Counts can be stored as "1234.0" in some workbooks
+        return cleaned.cast(pl.Float64, strict=False).cast(pl.Int64).alias(col)
+    return cleaned.cast(dtype, strict=False).alias(col)
+
+
+def read_release(path, year):
+    """Parse one national release workbook into the typed OEWS schema.
+
+    Args:
+        path (str): Path to a ``national_M<year>_dl.xlsx`` workbook
+        year (int): Release year stored in the ``year`` column
+
+    Returns:
+        pl.DataFrame: One row per OEWS occupation row, columns per OEWS_SCHEMA
+            plus ``year`` and ``soc_code``
+    """
+    # Read every cell as text so null markers never break type inference
+    raw = pl.read_excel(path, sheet_id=1, infer_schema_length=0)
+    raw = raw.rename({col: COLUMN_ALIASES.get(col.strip().upper(), col.strip().upper()) for col in raw.columns})
+    missing = [col for col in OEWS_SCHEMA if col not in raw.columns]
+    raw = raw.with_columns(pl.lit(None, dtype=pl.Utf8).alias(col) for col in missing)
+
+    return raw.select(
+        pl.lit(year, dtype=pl.Int32).alias("year"),
+        *[_typed(col, dtype) for col, dtype in OEWS_SCHEMA.items()],
+        pl.col("OCC_CODE").str.strip_chars().alias("soc_code"),
+    )
+
+
+def read_stem_occupations(path):
+    """SOC codes listed in the 'STEM occupations list' sheet of a STEM workbook."""
+    sheet = pl.read_excel(path, sheet_name=STEM_SHEET, infer_schema_length=0, has_header=False)
+    codes = sheet.select(pl.col(sheet.columns[0]).str.strip_chars().alias("soc_code"))
+    return codes.filter(pl.col("soc_code").str.contains(r"^\d{2}-\d{4}$")).unique()
+
+
+def _partition_dir(year, output_dir):
+    return os.path.join(output_dir, f"year={year}")
+
+
+def build_oews(raw_dir=OEWS_RAW_DIR, output_dir=OEWS_OUTPUT_DIR, force=False):
+    """Parse every release in ``raw_dir`` whose cached partition is missing or stale.
+
+    Args:
+        raw_dir (str): Folder with OEWS workbooks
+        output_dir (str): Root of the year-partitioned Parquet dataset
+        force (bool): Re-parse every release regardless of timestamps
+
+    Returns:
+        list[int]: Years that were (re)built
+    """
+    stem_files = {
+        int(m.group(1)): os.path.join(raw_dir, name)
+        for name in os.listdir(raw_dir) if (m := STEM_PATTERN.match(name))
+    }
+    rebuilt = []
+    for year, path in discover_releases(raw_dir).items():
+        partition = _partition_dir(year, output_dir)
+        partition_file = os.path.join(partition, "data.parquet")
+        sources = [path] + ([stem_files[year]] if year in stem_files else [])
+        if (not force and os.path.exists(partition_file)
+                and os.path.getmtime(partition_file) >= max(os.path.getmtime(p) for p in sources)):
+            logging.info(f"OEWS {year}: cached partition is up to date")
+            continue
+
+        logging.info(f"OEWS {year}: parsing {path}")
+        df = read_release(path, year)
+        if year in stem_files:
+            stem_codes = read_stem_occupations(stem_files[year])
+            df = df.with_columns(pl.col("soc_code").is_in(stem_codes["soc_code"].implode()).alias("is_stem"))
+            logging.info(f"OEWS {year}: flagged {stem_codes.height} STEM occupations")
+        else:
+            df = df.with_columns(pl.lit(None, dtype=pl.Boolean).alias("is_stem"))
+
+        os.makedirs(partition, exist_ok=True)
+        # year is encoded in the partition path
+        df.drop("year").sort("soc_code").write_parquet(partition_file, compression="zstd", statistics=True)
+        logging.info(f"OEWS {year}: wrote {df.height} rows to {partition_file}")
+        rebuilt.append(year)
+    return rebuilt
+
+
+def scan_oews(output_dir=OEWS_OUTPUT_DIR):
+    """Lazy frame over all cached OEWS releases, with ``year`` from the partition path."""
+    return pl.scan_parquet(
+        os.path.join(output_dir, "year=*", "*.parquet"),
+        hive_partitioning=True,
+        hive_schema={"year": pl.Int32},
+    )
+
+
+def load_oews(year=None, columns=None, output_dir=OEWS_OUTPUT_DIR, build=True):
+    """Read cached OEWS rows, building missing partitions first.
+
+    Args:
+        year (int | list[int], optional): Release year(s); all years if None
+        columns (list[str], optional): Columns to read (``soc_code`` and
+            ``year`` are always included)
+        output_dir (str): Root of the year-partitioned Parquet dataset
+        build (bool): Run ``build_oews`` before reading
+
+    Returns:
+        pl.DataFrame: OEWS rows for the requested releases (empty if none exist)
+    """
+    if build and os.path.isdir(OEWS_RAW_DIR):
+        build_oews(output_dir=output_dir)
+    if not os.path.isdir(output_dir) or not any(name.startswith("year=") for name in os.listdir(output_dir)):
+        return empty_oews_frame(columns)
+
+    lf = scan_oews(output_dir)
+    if year is not None:
+        years = [year] if isinstance(year, int) else list(year)
+        lf = lf.filter(pl.col("year").is_in(years))
+    if columns is not None:
+        lf = lf.select(["year", "soc_code"] + [col for col in columns if col not in ("year", "soc_code")])
+    return lf.collect()
+
+
+def empty_oews_frame(columns=None):
+    """Empty frame with the cached OEWS schema (optionally restricted to ``columns``)."""
+    schema = {"year": pl.Int32, "soc_code": pl.Utf8, **OEWS_SCHEMA, "is_stem": pl.Boolean}
+    if columns is not None:
+        schema = {col: dtype for col, dtype in schema.items() if col in ["year", "soc_code"] + list(columns)}
+    return pl.DataFrame(schema=schema)
+
+
+def soc_code_expr(onetsoc_col="onetsoc_code"):
+    """Expression deriving the OEWS SOC code (XX-XXXX) from an O*NET-SOC code (XX-XXXX.XX)."""
+    return pl.col(onetsoc_col).str.slice(0, 7).alias("soc_code")
+
+
+def build_soc_key(onet_db_path=ONET_DB_PATH, output_path=SOC_KEY_PATH):
+    """Persist the onetsoc_code -> soc_code key for every O*NET occupation.
+
+    Returns:
+        pl.DataFrame | None: The key table, or None if the O*NET database is missing
+    """
+    if not os.path.exists(onet_db_path):
+        logging.warning(f"O*NET database not found at {onet_db_path}; skipping SOC key")
+        return None
+
+    con = connect(onet_db_path, read_only=True)
+    try:
+        key = con.sql("SELECT DISTINCT onetsoc_code FROM occupation_data").pl()
+    finally:
+        con.close()
+    key = key.with_columns(soc_code_expr()).sort("onetsoc_code")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    key.write_parquet(output_path)
+    logging.info(f"Wrote {key.height} O*NET-SOC -> SOC keys to {output_path}")
+    return key
+
+
+@instrumented_run("oews")
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    rebuilt = build_oews(force=True)
+    logging.info(f"Rebuilt OEWS releases: {rebuilt}")
+    build_soc_key()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Materialize the O*NET rating tables as dense, memory-mappable tensors.
+
+Each descriptor domain (skills, knowledge, abilities, work activities) is
+stored long-format in DuckDB, one row per occupation x element x scale. This
+script pivots every domain once into float32 arrays of shape
+(occupation, element, scale) - the ratings and their standard errors - and
+writes them as .npy files with Parquet index files for the axes:
+
+- ``occupations.parquet``: position, onetsoc_code, title (shared by all domains)
+- ``<domain>_elements.parquet``: position, element_id, element_name
+- ``<domain>_axes.json``: scale ids of the last axis
+
+Cells without a rating are NaN. ``DescriptorTensor.load`` memory-maps the
+arrays, so several processes read them from the page cache without copying.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from src.utils.instrumentation import instrumented_run
+from src.utils.resources import connect
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+ONET_DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", "onet_dataset_29.2.duckdb")
+TENSOR_DIR = os.path.join(PROJECT_ROOT, "data", "derived", "onet_tensor")
+
+DOMAINS = ["skills", "knowledge", "abilities", "work_activities"]
+OCCUPATIONS_FILENAME = "occupations.parquet"
+
+
+def read_occupations(con):
+    """Occupation axis: every O*NET-SOC code in ``occupation_data``, sorted."""
+    return (
+        con.sql("SELECT onetsoc_code, title FROM occupation_data").pl()
+        .unique(subset=["onetsoc_code"]).sort("onetsoc_code")
+        .with_row_index("position")
+    )
+
+
+def read_ratings(con, domain):
+    """Long rating rows of one domain table."""
+    return con.sql(f"""
+        SELECT onetsoc_code, element_id, element_name, scale_id, data_value, standard_error
+        FROM {domain}
+    """).pl()
+
+
+@dataclass
+class DescriptorTensor:
+    """Ratings of one O*NET domain indexed by occupation, element and scale.
+
+    Attributes:
+        domain (str): Source table name, e.g. 'skills'
+        occupations (list[str]): Axis 0 labels (O*NET-SOC codes)
+        elements (list[str]): Axis 1 labels (element ids)
+        scales (list[str]): Axis 2 labels (scale ids, e.g. 'IM', 'LV')
+        values (np.ndarray): float32 ratings (occupation, element, scale)
+        standard_error (np.ndarray): float32 standard errors, same shape
+    """
+
+    domain: str
+    occupations: list
+    elements: list
+    scales: list
+    values: np.ndarray
+    standard_error: np.ndarray
+
+    @classmethod
+    def from_frame(cls, domain, ratings, occupations):
+        """Scatter long rating rows into dense arrays over the given occupation axis."""
+        ratings = ratings.filter(pl.col("onetsoc_code").is_in(occupations))
+        elements = ratings["element_id"].unique().sort().to_list()
+        scales = ratings["scale_id"].unique().sort().to_list()
+
+        def positions(col, labels):
+            return ratings[col].replace_strict(labels, list(range(len(labels))), return_dtype=pl.Int64).to_numpy()
+
+        index = (positions("onetsoc_code", occupations), positions("element_id", elements),
+                 positions("scale_id", scales))
+        shape = (len(occupations), len(elements), len(scales))
+        values = np.full(shape, np.nan, dtype=np.float32)
+        standard_error = np.full(shape, np.nan, dtype=np.float32)
+        values[index] = ratings["data_value"].to_numpy()
+        standard_error[index] = ratings["standard_error"].cast(pl.Float32).fill_null(np.nan).to_numpy()
+        return cls(domain, list(occupations), elements, scales, values, standard_error)
+
+    @classmethod
+    def load(cls, domain, tensor_dir=TENSOR_DIR, mmap_mode="r"):
+        """Load a tensor written by ``save``; arrays are memory-mapped by default."""
+        occupations = pl.read_parquet(os.path.join(tensor_dir, OCCUPATIONS_FILENAME))
+        elements = pl.read_parquet(os.path.join(tensor_dir, f"{domain}_elements.parquet"))
+        with open(os.path.join(tensor_dir, f"{domain}_axes.json"), "r", encoding="utf-8") as f:
+            axes = json.load(f)
+        return cls(
+            domain=domain,
+            occupations=occupations.sort("position")["onetsoc_code"].to_list(),
+            elements=elements.sort("position")["element_id"].to_list(),
+            scales=axes["scales"],
+            values=np.load(os.path.join(tensor_dir, f"{domain}_values.npy"), mmap_mode=mmap_mode),
+            standard_error=np.load(os.path.join(tensor_dir, f"{domain}_standard_error.npy"), mmap_mode=mmap_mode),
+        )
+
+    def save(self, tensor_dir=TENSOR_DIR, element_names=None):
+        """Write both arrays, the element index and the scale axis to ``tensor_dir``."""
+        os.makedirs(tensor_dir, exist_ok=True)
+        np.save(os.path.join(tensor_dir, f"{self.domain}_values.npy"), self.values)
+        np.save(os.path.join(tensor_dir, f"{self.domain}_standard_error.npy"), self.standard_error)
+        elements = pl.DataFrame({"element_id": self.elements}).with_row_index("position")
+        if element_names is not None:
+            elements = elements.join(element_names, on="element_id", how="left", maintain_order="left")
+        elements.write_parquet(os.path.join(tensor_dir, f"{self.domain}_elements.parquet"))
+        with open(os.path.join(tensor_dir, f"{self.domain}_axes.json"), "w", encoding="utf-8") as f:
+            json.dump({"domain": self.domain, "scales": self.scales}, f, indent=2)
+
+    def occupation(self, onetsoc_code):
+        """Ratings of one occupation, shape (element, scale)."""
+        return self.values[self.occupations.index(onetsoc_code)]
+
+    def element(self, element_id):
+        """Ratings of one element across all occupations, shape (occupation, scale)."""
+        return self.values[:, self.elements.index(element_id)]
+
+    def scale(self, scale_id):
+        """Occupation x element matrix for one scale, e.g. 'IM'."""
+        return self.values[:, :, self.scales.index(scale_id)]
+
+
+@instrumented_run("onet_tensor")
+def main():
+    print(f"Reading O*NET ratings from: {ONET_DB_PATH}")
+    con = connect(ONET_DB_PATH, read_only=True)
+    try:
+        occupations = read_occupations(con)
+        os.makedirs(TENSOR_DIR, exist_ok=True)
+        occupations.write_parquet(os.path.join(TENSOR_DIR, OCCUPATIONS_FILENAME))
+        codes = occupations["onetsoc_code"].to_list()
+
+        existing = {row[0] for row in con.execute("SHOW TABLES").fetchall()}
+        for domain in DOMAINS:
+            if domain not in existing:
+                print(f"  Table '{domain}' not found, skipping")
+                continue
+            ratings = read_ratings(con, domain)
+            tensor = DescriptorTensor.from_frame(domain, ratings, codes)
+            names = ratings.select("element_id", "element_name").unique(subset=["element_id"])
+            tensor.save(element_names=names)
+            observed = int((~np.isnan(tensor.values)).sum())
+            print(f"  {domain}: tensor {tensor.values.shape} (occupation, element, scale) "
+                  f"with {observed} ratings saved to {TENSOR_DIR}")
+    finally:
+        con.close()
+
+    print("\nO*NET descriptor tensors built successfully!")
+
+
+if __name__ == "__main__":
+    main()
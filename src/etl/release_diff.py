@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Diff two releases of a DuckDB dataset (O*NET 29.2 -> 30.0, ESCO 1.2.0 -> 1.2.1).
+
+Every table present in either database is compared by key. A table's key is
+the columns from ``KEY_COLUMNS`` it contains (``onetsoc_code``/``element_id``/
+``scale_id``/... for O*NET, ``conceptUri``/... for ESCO); tables without any
+of them are keyed by the whole row. For each key, the rows of both releases
+are reduced to a digest - row count and the sum of per-row hashes over the
+columns the two releases share - so a key is:
+
+- ``inserted``: only in the new release
+- ``deleted``: only in the old release
+- ``modified``: in both, with a different digest
+
+Digests are computed and compared partition by partition (on the key hash), so
+only one partition of compact (key hash, digest) rows is held at a time and no
+join over the full rows is needed. The rows of the changed keys are then
+exported as Parquet change sets::
+
+    data/derived/release_diff/<old>__<new>/<table>/inserted.parquet
+    data/derived/release_diff/<old>__<new>/<table>/deleted.parquet
+    data/derived/release_diff/<old>__<new>/<table>/modified.parquet  (_version = 'old' | 'new')
+    data/derived/release_diff/<old>__<new>/summary.parquet
+
+Usage::
+
+    python -m src.etl.release_diff data/duckdb/onet_dataset_29.2.duckdb data/duckdb/onet_dataset_30.0.duckdb
+"""
+
+import argparse
+import os
+import shutil
+from pathlib import Path
+
+import polars as pl
+
+from src.utils.instrumentation import instrumented_run, span
+from src.utils.resources import connect
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data", "derived", "release_diff")
+PARTITIONS = 8
+CHANGES = ["inserted", "deleted", "modified"]
+
+# Key columns in priority order; a table is keyed by every one of them it has
+KEY_COLUMNS = [
+    # O*NET
+    "onetsoc_code", "element_id", "scale_id", "category", "task_id", "commodity_code",
+    # ESCO
+    "conceptUri", "conceptSchemeUri", "originalSkillUri", "relatedSkillUri", "language",
+]
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _hash_expr(columns, alias="t"):
+    """Type-stable hash of ``columns``: values are hashed as text."""
+    return "hash(" + ", ".join(f"{alias}.{_quote(c)}::VARCHAR" for c in columns) + ")"
+
+
+def table_columns(con, database):
+    """Column names per base table (views are skipped) of an attached database."""
+    rows = con.execute("""
+        SELECT c.table_name, list(c.column_name ORDER BY c.column_index)
+        FROM duckdb_columns() c
+        JOIN duckdb_tables() t USING (database_name, schema_name, table_name)
+        WHERE c.database_name = ? AND c.schema_name = 'main'
+        GROUP BY c.table_name
+    """, [database]).fetchall()
+    return dict(rows)
+
+
+def table_keys(columns):
+    """Key columns of a table with ``columns`` (all columns if none of KEY_COLUMNS)."""
+    return [c for c in KEY_COLUMNS if c in columns] or list(columns)
+
+
+def _digests(database, table, keys, columns, partition, partitions):
+    """Per-key (count, hash sum) of one hash partition of a table."""
+    key_hash = _hash_expr(keys)
+    return f"""
+        SELECT {key_hash} AS key_hash, count(*) AS n, sum({_hash_expr(columns)}::HUGEINT) AS digest
+        FROM {database}.main.{_quote(table)} t
+        WHERE {key_hash} % {partitions} = {partition}
+        GROUP BY ALL
+    """
+
+
+def diff_table(con, table, keys, columns, partitions=PARTITIONS):
+    """Fill the temp table ``changes(key_hash, change)`` for one table.
+
+    Returns:
+        dict: Number of changed keys per change type
+    """
+    con.execute("CREATE OR REPLACE TEMP TABLE changes (key_hash UBIGINT, change VARCHAR)")
+    for partition in range(partitions):
+        con.execute(f"""
+            INSERT INTO changes
+            SELECT key_hash,
+                   CASE WHEN o.n IS NULL THEN 'inserted' WHEN r.n IS NULL THEN 'deleted' ELSE 'modified' END
+            FROM ({_digests('old', table, keys, columns, partition, partitions)}) o
+            FULL OUTER JOIN ({_digests('new', table, keys, columns, partition, partitions)}) r USING (key_hash)
+            WHERE o.n IS DISTINCT FROM r.n OR o.digest IS DISTINCT FROM r.digest
+        """)
+    counts = dict(con.execute("SELECT change, count(*) FROM changes GROUP BY change").fetchall())
+    return {change: counts.get(change, 0) for change in CHANGES}
+
+
+def export_changes(con, table, keys, table_dir):
+    """Write the rows of the changed keys of one table as Parquet change sets."""
+    order = ", ".join(_quote(k) for k in keys)
+    key_hash = _hash_expr(keys)
+
+    def rows(database, change):
+        return f"""
+            SELECT t.* FROM {database}.main.{_quote(table)} t
+            SEMI JOIN (SELECT key_hash FROM changes WHERE change = '{change}') c ON {key_hash} = c.key_hash
+        """
+
+    queries = {
+        "inserted": f"{rows('new', 'inserted')} ORDER BY {order}",
+        "deleted": f"{rows('old', 'deleted')} ORDER BY {order}",
+        "modified": f"""
+            SELECT *, 'old' AS _version FROM ({rows('old', 'modified')})
+            UNION ALL BY NAME
+            SELECT *, 'new' AS _version FROM ({rows('new', 'modified')})
+            ORDER BY {order}, _version DESC
+        """,
+    }
+    os.makedirs(table_dir, exist_ok=True)
+    for change, sql in queries.items():
+        if con.execute(f"SELECT count(*) FROM changes WHERE change = '{change}'").fetchone()[0]:
+            path = os.path.join(table_dir, f"{change}.parquet")
+            con.execute(f"COPY ({sql}) TO '{path}' (FORMAT parquet, COMPRESSION zstd)")
+
+
+def _release_name(path):
+    return Path(path).stem
+
+
+def diff_releases(old_path, new_path, output_dir=OUTPUT_DIR, tables=None, partitions=PARTITIONS):
+    """Diff every (or the given) table of two release databases.
+
+    Returns:
+        pl.DataFrame: One summary row per table (key, changed keys per type,
+            added and removed columns)
+    """
+    diff_dir = os.path.join(output_dir, f"{_release_name(old_path)}__{_release_name(new_path)}")
+    if os.path.isdir(diff_dir):
+        shutil.rmtree(diff_dir)
+    os.makedirs(diff_dir)
+
+    con = connect()
+    try:
+        con.execute(f"ATTACH '{old_path}' AS old (READ_ONLY)")
+        con.execute(f"ATTACH '{new_path}' AS new (READ_ONLY)")
+        old_tables, new_tables = table_columns(con, "old"), table_columns(con, "new")
+        names = sorted(set(old_tables) | set(new_tables))
+        if tables:
+            names = [name for name in names if name in tables]
+
+        summary = []
+        for name in names:
+            old_columns, new_columns = old_tables.get(name), new_tables.get(name)
+            with span(name) as s:
+                if old_columns is None or new_columns is None:
+                    # Whole table added or dropped
+                    database, change, columns = ("new", "inserted", new_columns) if old_columns is None \
+                        else ("old", "deleted", old_columns)
+                    keys = table_keys(columns)
+                    path = os.path.join(diff_dir, name, f"{change}.parquet")
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    con.execute(f"COPY (SELECT * FROM {database}.main.{_quote(name)}) TO '{path}' "
+                                f"(FORMAT parquet, COMPRESSION zstd)")
+                    n_keys = con.execute(
+                        f"SELECT count(DISTINCT {_hash_expr(keys)}) FROM {database}.main.{_quote(name)} t"
+                    ).fetchone()[0]
+                    counts = {c: n_keys if c == change else 0 for c in CHANGES}
+                else:
+                    columns = [c for c in new_columns if c in old_columns]
+                    keys = table_keys(columns)
+                    counts = diff_table(con, name, keys, columns, partitions)
+                    if any(counts.values()):
+                        export_changes(con, name, keys, os.path.join(diff_dir, name))
+                s.set(keys=keys, **counts)
+            summary.append({
+                "table": name,
+                "key_columns": keys,
+                **counts,
+                "added_columns": [c for c in new_columns or [] if c not in (old_columns or [])],
+                "removed_columns": [c for c in old_columns or [] if c not in (new_columns or [])],
+            })
+    finally:
+        con.close()
+
+    summary = pl.DataFrame(summary, schema_overrides={c: pl.Int64 for c in CHANGES})
+    summary.write_parquet(os.path.join(diff_dir, "summary.parquet"))
+    return summary
+
+
+@instrumented_run("release_diff")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff two releases of a DuckDB dataset by per-key row hashes")
+    parser.add_argument("old", help="Old release database")
+    parser.add_argument("new", help="New release database")
+    parser.add_argument("--tables", nargs="+", help="Only diff these tables")
+    parser.add_argument("--partitions", type=int, default=PARTITIONS, help="Key-hash partitions per table")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    args = parser.parse_args(argv)
+
+    for path in (args.old, args.new):
+        if not os.path.exists(path):
+            print(f"Database not found: {path}")
+            return None
+
+    print(f"Diffing {args.old} -> {args.new}")
+    summary = diff_releases(args.old, args.new, args.output_dir, args.tables, args.partitions)
+    changed = summary.filter(
+        (pl.sum_horizontal(CHANGES) > 0) | (pl.col("added_columns").list.len() > 0)
+        | (pl.col("removed_columns").list.len() > 0)
+    )
+    for row in changed.iter_rows(named=True):
+        columns = "".join(f" {sign}{c}" for sign, key in (("+", "added_columns"), ("-", "removed_columns"))
+                          for c in row[key])
+        print(f"  {row['table']:<45} +{row['inserted']} -{row['deleted']} ~{row['modified']} keys"
+              f"  (key: {', '.join(row['key_columns'])}){'  columns:' + columns if columns else ''}")
+    print(f"{changed.height} of {summary.height} tables changed; change sets written to {args.output_dir}")
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Global skill dictionary and integer-encoded skill list columns.
+
+The processed outputs store skills as List(Utf8) columns in which the same
+labels are repeated thousands of times. This module builds one dictionary
+table (id, source, type, uri, label, collections) covering ESCO skills and
+O*NET descriptors, and writes compact copies of the processed outputs where
+every skill list column is a List(UInt32) of dictionary ids. Helpers decode
+the ids back to labels when needed.
+"""
+
+import os
+from pathlib import Path
+
+import polars as pl
+
+from src.utils.instrumentation import instrumented_run
+from src.utils.resources import connect
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+ESCO_DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", "esco_dataset_1.2.0.duckdb")
+ONET_DB_PATH = os.path.join(PROJECT_ROOT, "data", "duckdb", "onet_dataset_29.2.duckdb")
+ESCO_PROFILES_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "esco", "esco_occupation_profiles.parquet")
+ONET_AGGREGATED_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "onet", "onet_occupations_aggregated.parquet")
+DICTIONARY_PATH = os.path.join(PROJECT_ROOT, "data", "processed", "skills", "skill_dictionary.parquet")
+
+ID_DTYPE = pl.UInt32
+
+# List column -> (source, type) namespace its labels are looked up in.
+# A type of None means any type within the source.
+ESCO_SKILL_LIST_COLUMNS = {
+    col: ("esco", None)
+    for col in [
+        "essential_skills", "optional_skills", "essential_technical_skills",
+        "essential_knowledge", "essential_competences", "digital_skills",
+        "green_skills", "transversal_skills", "language_skills",
+    ]
+}
+ONET_SKILL_LIST_COLUMNS = {
+    "skills_list": ("onet", "skill"),
+    "knowledge_list": ("onet", "knowledge"),
+    "abilities_list": ("onet", "ability"),
+    "work_activities_list": ("onet", "work_activity"),
+    "tech_skills_list": ("onet", "technology"),
+}
+SKILL_LIST_COLUMNS = {**ESCO_SKILL_LIST_COLUMNS, **ONET_SKILL_LIST_COLUMNS}
+
+# ESCO collection tables -> collection name stored in the dictionary
+ESCO_COLLECTIONS = {
+    "greenSkillsCollection_en": "green",
+    "digitalSkillsCollection_en": "digital",
+    "transversalSkillsCollection_en": "transversal",
+    "languageSkillsCollection_en": "language",
+    "digCompSkillsCollection_en": "digcomp",
+    "researchSkillsCollection_en": "research",
+}
+
+# O*NET descriptor tables -> dictionary type
+ONET_DESCRIPTOR_TABLES = {
+    "skills": "skill",
+    "knowledge": "knowledge",
+    "abilities": "ability",
+    "work_activities": "work_activity",
+}
+
+DICTIONARY_SCHEMA = {
+    "source": pl.Utf8,
+    "type": pl.Utf8,
+    "uri": pl.Utf8,
+    "label": pl.Utf8,
+    "collections": pl.List(pl.Utf8),
+}
+
+
+def _esco_entries(con):
+    """Dictionary entries for every ESCO skill, with its collection memberships."""
+    existing = {row[0] for row in con.execute("SHOW TABLES").fetchall()}
+    collection_selects = [
+        f"SELECT conceptUri, '{name}' AS collection FROM {table}"
+        for table, name in ESCO_COLLECTIONS.items() if table in existing
+    ]
+    collections_sql = " UNION ALL ".join(collection_selects) or "SELECT NULL AS conceptUri, NULL AS collection WHERE false"
+    return con.sql(f"""
+        WITH collections AS ({collections_sql})
+        SELECT
+            'esco' AS source,
+            s.skillType AS type,
+            s.conceptUri AS uri,
+            s.preferredLabel AS label,
+            list(DISTINCT c.collection ORDER BY c.collection) FILTER (WHERE c.collection IS NOT NULL) AS collections
+        FROM skills_en s
+        LEFT JOIN collections c ON s.conceptUri = c.conceptUri
+        WHERE s.preferredLabel IS NOT NULL
+        GROUP BY ALL
+    """).pl()
+
+
+def _onet_entries(con):
+    """Dictionary entries for O*NET descriptors (keyed by element_id) and technologies."""
+    frames = []
+    for table, type_name in ONET_DESCRIPTOR_TABLES.items():
+        frames.append(con.sql(f"""
+            SELECT DISTINCT 'onet' AS source, '{type_name}' AS type,
+                   element_id AS uri, element_name AS label, NULL::VARCHAR[] AS collections
+            FROM {table}
+        """).pl())
+    frames.append(con.sql("""
+        SELECT 'onet' AS source, 'technology' AS type,
+               CAST(commodity_code AS VARCHAR) AS uri, commodity_title AS label,
+               list_filter([
+                   CASE WHEN bool_or(hot_technology = 'Y') THEN 'hot_technology' END,
+                   CASE WHEN bool_or(in_demand = 'Y') THEN 'in_demand' END
+               ], x -> x IS NOT NULL) AS collections
+        FROM technology_skills
+        GROUP BY commodity_code, commodity_title
+    """).pl())
+    return pl.concat([frame.cast(DICTIONARY_SCHEMA) for frame in frames])
+
+
+def _labels_in_outputs(frames):
+    """(source, type, label) triples present in the list columns of processed outputs."""
+    seen = []
+    for df in frames:
+        for col, (source, type_name) in SKILL_LIST_COLUMNS.items():
+            if col not in df.columns:
+                continue
+            seen.append(
+                df.select(pl.col(col).explode().drop_nulls().unique().alias("label"))
+                .with_columns(pl.lit(source).alias("source"), pl.lit(type_name, dtype=pl.Utf8).alias("type"))
+            )
+    if not seen:
+        return pl.DataFrame(schema={"source": pl.Utf8, "type": pl.Utf8, "label": pl.Utf8})
+    return pl.concat(seen, how="diagonal").select("source", "type", "label").unique()
+
+
+def build_skill_dictionary(esco_db_path=ESCO_DB_PATH, onet_db_path=ONET_DB_PATH, output_frames=()):
+    """Build the global skill dictionary.
+
+    Entries come from the ESCO and O*NET databases when they exist. Labels in
+    ``output_frames`` that are not covered by a database entry are appended
+    with a null uri, so encoding those frames is always lossless.
+
+    Args:
+        esco_db_path (str): Path to the ESCO DuckDB database
+        onet_db_path (str): Path to the O*NET DuckDB database
+        output_frames (iterable[pl.DataFrame]): Processed outputs to be encoded
+
+    Returns:
+        pl.DataFrame: Columns id (UInt32), source, type, uri, label, collections;
+            ids are dense and stable for the same inputs
+    """
+    entries = []
+    for db_path, loader in ((esco_db_path, _esco_entries), (onet_db_path, _onet_entries)):
+        if not os.path.exists(db_path):
+            print(f"Database not found, skipping: {db_path}")
+            continue
+        con = connect(db_path, read_only=True)
+        try:
+            entries.append(loader(con).cast(DICTIONARY_SCHEMA))
+        finally:
+            con.close()
+    dictionary = pl.concat(entries) if entries else pl.DataFrame(schema=DICTIONARY_SCHEMA)
+
+    # Labels used in the outputs but unknown to the databases
+    seen = _labels_in_outputs(output_frames)
+    known = dictionary.select("source", "type", "label")
+    missing = pl.concat([
+        seen.filter(pl.col("type").is_null()).join(known, on=["source", "label"], how="anti"),
+        seen.filter(pl.col("type").is_not_null()).join(known, on=["source", "type", "label"], how="anti"),
+    ])
+    if missing.height:
+        print(f"Adding {missing.height} labels without a database entry")
+        dictionary = pl.concat([
+            dictionary,
+            missing.with_columns(pl.lit(None, dtype=pl.Utf8).alias("uri"),
+                                 pl.lit(None, dtype=pl.List(pl.Utf8)).alias("collections"))
+                   .select(list(DICTIONARY_SCHEMA)),
+        ])
+
+    return (
+        dictionary.sort(["source", "type", "label", "uri"], nulls_last=True)
+        .with_row_index("id")
+        .with_columns(pl.col("id").cast(ID_DTYPE))
+    )
+
+
+def _lookup(dictionary, source, type_name):
+    """label -> id mapping for one namespace (lowest id wins on duplicate labels)."""
+    namespace = dictionary.filter(pl.col("source") == source)
+    if type_name is not None:
+        namespace = namespace.filter(pl.col("type") == type_name)
+    return namespace.sort("id").unique(subset=["label"], keep="first", maintain_order=True)
+
+
+def encode_skill_lists(df, dictionary, columns=None):
+    """Replace List(Utf8) skill label columns with List(UInt32) dictionary ids.
+
+    Args:
+        df (pl.DataFrame): Frame with skill list columns
+        dictionary (pl.DataFrame): Output of build_skill_dictionary
+        columns (dict, optional): column -> (source, type). Defaults to every
+            known skill list column present in ``df``.
+
+    Returns:
+        pl.DataFrame: Same frame with encoded list columns. Labels not in the
+            dictionary become null elements.
+    """
+    columns = columns or {col: ns for col, ns in SKILL_LIST_COLUMNS.items() if col in df.columns}
+    expressions = []
+    for col, (source, type_name) in columns.items():
+        lookup = _lookup(dictionary, source, type_name)
+        expressions.append(
+            pl.col(col).list.eval(
+                pl.element().replace_strict(lookup["label"], lookup["id"], default=None, return_dtype=ID_DTYPE)
+            )
+        )
+    return df.with_columns(expressions)
+
+
+def decode_skill_lists(df, dictionary, columns=None, field="label"):
+    """Map List(UInt32) id columns back to a dictionary field (label by default).
+
+    Args:
+        df (pl.DataFrame): Frame with encoded skill list columns
+        dictionary (pl.DataFrame): Output of build_skill_dictionary
+        columns (iterable[str], optional): Columns to decode. Defaults to every
+            known skill list column present in ``df``.
+        field (str): Dictionary column to decode to, e.g. 'label' or 'uri'
+
+    Returns:
+        pl.DataFrame: Same frame with List(Utf8) columns
+    """
+    columns = columns or [col for col in SKILL_LIST_COLUMNS if col in df.columns]
+    return df.with_columns(
+        pl.col(col).list.eval(
+            pl.element().replace_strict(dictionary["id"], dictionary[field], default=None, return_dtype=pl.Utf8)
+        )
+        for col in columns
+    )
+
+
+def compact_path(path):
+    """Path of the compact (id-encoded) copy of a processed output."""
+    root, ext = os.path.splitext(path)
+    return f"{root}_compact{ext}"
+
+
+def load_skill_dictionary(path=DICTIONARY_PATH):
+    """Read the persisted skill dictionary."""
+    return pl.read_parquet(path)
+
+
+@instrumented_run("skill_dictionary")
+def main():
+    outputs = [path for path in (ESCO_PROFILES_PATH, ONET_AGGREGATED_PATH) if os.path.exists(path)]
+    frames = {path: pl.read_parquet(path) for path in outputs}
+
+    print("Building skill dictionary...")
+    dictionary = build_skill_dictionary(output_frames=frames.values())
+    os.makedirs(os.path.dirname(DICTIONARY_PATH), exist_ok=True)
+    dictionary.write_parquet(DICTIONARY_PATH, compression="zstd")
+    print(f"  {dictionary.height} entries written to {DICTIONARY_PATH}")
+
+    for path, df in frames.items():
+        encoded = encode_skill_lists(df, dictionary)
+        output_path = compact_path(path)
+        encoded.write_parquet(output_path, compression="zstd")
+        print(f"  {os.path.basename(path)}: {os.path.getsize(path):,} -> "
+              f"{os.path.getsize(output_path):,} bytes ({output_path})")
+
+    print("\nSkill dictionary build completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
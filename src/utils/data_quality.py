@@ -0,0 +1,393 @@
+"""
+Declarative data-quality rules evaluated in one streaming pass per file.
+
+A ``Dataset`` names a CSV, Parquet or DuckDB source and the rules that must
+hold for it. Every dataset is read once, in record batches and only for the
+columns its rules need; each rule folds the batches into a small state:
+
+- ``UniqueKey``: 64-bit row hashes of the key columns are kept in a sorted
+  hash set, so duplicates are found exactly. Past ``exact_limit`` distinct
+  keys the set is dropped and uniqueness is judged from a HyperLogLog
+  estimate instead (the result is then flagged as not exact).
+- ``NotNull``: null counts per column.
+- ``References``: every value must occur in a column of another file
+  (referential integrity); the target keys are hashed once and shared.
+- ``RowCondition``: a Polars boolean expression that must hold on every row.
+
+Independent datasets are checked concurrently. ``run_checks`` returns a
+structured report (rule, status, rows checked, violations, examples) that
+``write_report`` stores under ``data/derived/quality_reports``.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from src.utils.resources import connect
+from src.utils.sketches import HyperLogLog
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+REPORT_DIR = os.path.join(PROJECT_ROOT, "data", "derived", "quality_reports")
+BATCH_ROWS = 100_000
+EXACT_KEY_LIMIT = 20_000_000
+MAX_EXAMPLES = 10
+ROW_COLUMN = "__row"
+
+
+class _HashSet:
+    """Set of uint64 hashes stored as a few sorted arrays of decreasing size.
+
+    New batches are appended as a level and levels of similar size are merged,
+    so inserting n hashes costs O(n log n) overall and lookups are binary
+    searches.
+    """
+
+    def __init__(self):
+        self.levels = []
+
+    def __len__(self):
+        return sum(len(level) for level in self.levels)
+
+    def contains(self, hashes):
+        found = np.zeros(len(hashes), dtype=bool)
+        for level in self.levels:
+            pos = np.minimum(np.searchsorted(level, hashes), len(level) - 1)
+            found |= level[pos] == hashes
+        return found
+
+    def add(self, sorted_unique):
+        if not len(sorted_unique):
+            return
+        self.levels.append(sorted_unique)
+        while len(self.levels) > 1 and len(self.levels[-2]) <= 2 * len(self.levels[-1]):
+            top = self.levels.pop()
+            self.levels[-1] = np.union1d(self.levels[-1], top)
+
+
+def _key_hashes(frame):
+    """Deterministic 64-bit hash of every row of ``frame``."""
+    return frame.hash_rows(seed=0).to_numpy()
+
+
+def _examples(frame, limit=MAX_EXAMPLES):
+    return frame.head(limit).to_dicts()
+
+
+@dataclass
+class Rule(ABC):
+    """Base class: ``where`` restricts the rule to rows matching an expression."""
+
+    where: pl.Expr = field(default=None, kw_only=True)
+    name: str = field(default=None, kw_only=True)
+
+    def needed_columns(self):
+        return set(self.where.meta.root_names()) if self.where is not None else set()
+
+    def describe(self):
+        return self.name or type(self).__name__
+
+    def new_state(self):
+        return {"rows": 0, "violations": 0, "examples": []}
+
+    def _rows(self, batch):
+        return batch.filter(self.where) if self.where is not None else batch
+
+    @abstractmethod
+    def update(self, state, batch):
+        """Fold one record batch into ``state``."""
+
+    def finish(self, state):
+        return {"passed": state["violations"] == 0, "exact": True, **state}
+
+
+@dataclass
+class UniqueKey(Rule):
+    """The key columns identify a row; ``strip`` trims string keys first."""
+
+    columns: tuple
+    strip: bool = False
+    exact_limit: int = EXACT_KEY_LIMIT
+
+    def needed_columns(self):
+        return super().needed_columns() | set(self.columns)
+
+    def describe(self):
+        return self.name or f"unique({', '.join(self.columns)})"
+
+    def new_state(self):
+        return {**super().new_state(), "seen": _HashSet(), "hll": HyperLogLog(), "exact": True}
+
+    def update(self, state, batch):
+        rows = self._rows(batch)
+        keys = rows.select(
+            pl.col(c).str.strip_chars() if self.strip and rows.schema[c] == pl.Utf8 else pl.col(c)
+            for c in self.columns
+        )
+        hashes = _key_hashes(keys)
+        state["rows"] += len(hashes)
+        state["hll"].add_hashes(hashes)
+        if not state["exact"]:
+            return
+        unique, first = np.unique(hashes, return_index=True)
+        duplicate = np.ones(len(hashes), dtype=bool)
+        duplicate[first] = False
+        duplicate |= state["seen"].contains(hashes)
+        if duplicate.any():
+            state["violations"] += int(duplicate.sum())
+            if len(state["examples"]) < MAX_EXAMPLES:
+                found = rows.select(ROW_COLUMN).hstack(keys).filter(pl.Series(duplicate))
+                state["examples"] += _examples(found, MAX_EXAMPLES - len(state["examples"]))
+        state["seen"].add(unique)
+        if len(state["seen"]) > self.exact_limit:
+            logging.info(f"{self.describe()}: more than {self.exact_limit} keys, switching to HyperLogLog")
+            state["seen"], state["exact"] = None, False
+
+    def finish(self, state):
+        hll = state.pop("hll")
+        state.pop("seen")
+        distinct = hll.estimate()
+        state["distinct_estimate"] = round(distinct)
+        if state["exact"]:
+            return {"passed": state["violations"] == 0, **state}
+        # Duplicates found before the switch are certain; afterwards only an
+        # estimate beyond three standard errors counts as a failure
+        certain = state["violations"]
+        estimated_duplicates = max(0.0, state["rows"] - distinct)
+        tolerance = 3 * hll.relative_error * state["rows"]
+        state["violations"] = max(certain, round(estimated_duplicates))
+        return {"passed": bool(certain == 0 and estimated_duplicates <= tolerance), **state}
+
+
+@dataclass
+class NotNull(Rule):
+    """None of the columns contains nulls."""
+
+    columns: tuple
+
+    def needed_columns(self):
+        return super().needed_columns() | set(self.columns)
+
+    def describe(self):
+        return self.name or f"not_null({', '.join(self.columns)})"
+
+    def update(self, state, batch):
+        rows = self._rows(batch)
+        state["rows"] += rows.height
+        missing = rows.filter(pl.any_horizontal(pl.col(c).is_null() for c in self.columns))
+        state["violations"] += missing.height
+        if missing.height and len(state["examples"]) < MAX_EXAMPLES:
+            state["examples"] += _examples(missing.select(ROW_COLUMN, *self.columns),
+                                           MAX_EXAMPLES - len(state["examples"]))
+
+
+_reference_cache = {}
+# One lock per target, so different targets load concurrently and each is loaded once
+_reference_locks = {}
+_reference_locks_guard = threading.Lock()
+
+
+def _reference_keys(path, column, strip):
+    """Sorted unique hashes of a column of another file (cached per run)."""
+    cache_key = (os.path.abspath(path), column, strip)
+    with _reference_locks_guard:
+        lock = _reference_locks.setdefault(cache_key, threading.Lock())
+    with lock:
+        if cache_key not in _reference_cache:
+            seen = _HashSet()
+            # Keys are compared as text, so CSV targets are read without inference
+            source = Dataset(name=os.path.basename(path), path=path, rules=[], schema_overrides={column: pl.Utf8})
+            for batch in source.batches([column]):
+                values = batch.select(pl.col(column).cast(pl.Utf8)).drop_nulls()
+                if strip:
+                    values = values.select(pl.col(column).str.strip_chars())
+                seen.add(np.unique(_key_hashes(values)))
+            _reference_cache[cache_key] = seen
+        return _reference_cache[cache_key]
+
+
+@dataclass
+class References(Rule):
+    """Every non-null value of ``column`` occurs in ``target_column`` of ``target_path``."""
+
+    column: str
+    target_path: str
+    target_column: str
+    strip: bool = False
+
+    def needed_columns(self):
+        return super().needed_columns() | {self.column}
+
+    def describe(self):
+        return self.name or f"{self.column} -> {os.path.basename(self.target_path)}.{self.target_column}"
+
+    def new_state(self):
+        return {**super().new_state(), "targets": _reference_keys(self.target_path, self.target_column, self.strip)}
+
+    def update(self, state, batch):
+        rows = self._rows(batch).filter(pl.col(self.column).is_not_null())
+        values = rows.select(pl.col(self.column).cast(pl.Utf8))
+        if self.strip:
+            values = values.select(pl.col(self.column).str.strip_chars())
+        state["rows"] += rows.height
+        orphan = ~state["targets"].contains(_key_hashes(values))
+        if orphan.any():
+            state["violations"] += int(orphan.sum())
+            if len(state["examples"]) < MAX_EXAMPLES:
+                found = rows.select(ROW_COLUMN, self.column).filter(pl.Series(orphan))
+                state["examples"] += _examples(found, MAX_EXAMPLES - len(state["examples"]))
+
+    def finish(self, state):
+        state.pop("targets")
+        return super().finish(state)
+
+
+@dataclass
+class RowCondition(Rule):
+    """A boolean expression that must hold on every row (nulls count as failures)."""
+
+    expression: pl.Expr
+
+    def needed_columns(self):
+        return super().needed_columns() | set(self.expression.meta.root_names())
+
+    def describe(self):
+        return self.name or str(self.expression)
+
+    def update(self, state, batch):
+        rows = self._rows(batch)
+        state["rows"] += rows.height
+        failing = rows.filter(~self.expression.fill_null(False))
+        state["violations"] += failing.height
+        if failing.height and len(state["examples"]) < MAX_EXAMPLES:
+            state["examples"] += _examples(
+                failing.select(ROW_COLUMN, *sorted(set(self.expression.meta.root_names()))),
+                MAX_EXAMPLES - len(state["examples"]),
+            )
+
+
+@dataclass
+class Dataset:
+    """A file and the rules it must satisfy.
+
+    Attributes:
+        name (str): Label used in the report
+        path (str): .csv, .parquet or .duckdb file
+        rules (list[Rule]): Rules evaluated in the same pass
+        query (str, optional): SELECT to stream, required for .duckdb sources
+        setup (list[str], optional): Statements run first on the read-only
+            DuckDB connection (e.g. creating a TEMP view)
+        schema_overrides (dict, optional): CSV column dtypes that must not be
+            inferred (e.g. ISCO codes with leading zeros)
+    """
+
+    name: str
+    path: str
+    rules: list
+    query: str = None
+    setup: list = field(default_factory=list)
+    schema_overrides: dict = field(default_factory=dict)
+
+    def batches(self, columns):
+        """Record batches of the needed columns, with a global row number column."""
+        columns = sorted(columns)
+        offset = 0
+        for batch in self._read(columns):
+            yield batch.with_row_index(ROW_COLUMN, offset=offset)
+            offset += batch.height
+
+    def _read(self, columns):
+        if self.path.endswith(".duckdb"):
+            con = connect(self.path, read_only=True)
+            try:
+                for statement in self.setup:
+                    con.execute(statement)
+                projection = ", ".join(f'"{c}"' for c in columns) or "*"
+                reader = con.execute(f"SELECT {projection} FROM ({self.query})").fetch_record_batch(BATCH_ROWS)
+                for record_batch in reader:
+                    yield pl.from_arrow(record_batch)
+            finally:
+                con.close()
+            return
+        if self.path.endswith(".parquet"):
+            frame = pl.scan_parquet(self.path)
+        else:
+            frame = pl.scan_csv(self.path, infer_schema_length=10000, schema_overrides=self.schema_overrides)
+        yield from frame.select(columns).collect_batches(chunk_size=BATCH_ROWS)
+
+
+def check_dataset(dataset):
+    """Evaluate every rule of one dataset in a single pass over its batches."""
+    started = time.perf_counter()
+    result = {"dataset": dataset.name, "path": os.path.relpath(dataset.path, PROJECT_ROOT), "rows": 0}
+    try:
+        if not os.path.exists(dataset.path):
+            raise FileNotFoundError(f"{dataset.path} not found")
+        states = [rule.new_state() for rule in dataset.rules]
+        for batch in dataset.batches(set().union(*(rule.needed_columns() for rule in dataset.rules))):
+            result["rows"] += batch.height
+            for rule, state in zip(dataset.rules, states):
+                rule.update(state, batch)
+        result["rules"] = [
+            {"rule": rule.describe(), **rule.finish(state)} for rule, state in zip(dataset.rules, states)
+        ]
+        result["status"] = "pass" if all(r["passed"] for r in result["rules"]) else "fail"
+    except Exception as e:
+        logging.error(f"Data-quality check of {dataset.name} failed: {e}")
+        result.update(status="error", error=str(e), rules=[])
+    result["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def run_checks(datasets, max_workers=None):
+    """Check independent datasets concurrently and collect a pass/fail report."""
+    _reference_cache.clear()
+    _reference_locks.clear()
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(datasets), os.cpu_count() or 1) or 1) as pool:
+        results = list(pool.map(check_dataset, datasets))
+    return {
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "passed": all(r["status"] == "pass" for r in results),
+        "datasets": results,
+    }
+
+
+def format_report(report):
+    """Human-readable summary, one line per rule."""
+    lines = []
+    for result in report["datasets"]:
+        lines.append(f"{result['dataset']} ({result['path']}): {result['status'].upper()}, "
+                     f"{result['rows']:,} rows in {result['elapsed_s']:.2f}s")
+        if result["status"] == "error":
+            lines.append(f"  [ERROR] {result['error']}")
+        for rule in result["rules"]:
+            flag = "PASS" if rule["passed"] else "FAIL"
+            exact = "" if rule["exact"] else " (estimated)"
+            lines.append(f"  [{flag}] {rule['rule']}: {rule['violations']:,} violations "
+                         f"in {rule['rows']:,} rows{exact}")
+            for example in rule["examples"][:3] if not rule["passed"] else []:
+                lines.append(f"         e.g. {example}")
+    lines.append(f"Overall: {'PASS' if report['passed'] else 'FAIL'}")
+    return "\n".join(lines)
+
+
+def write_report(report, report_dir=REPORT_DIR):
+    """Store the report as JSON and return its path."""
+    os.makedirs(report_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(report_dir, f"data_quality_{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    return path
@@ -4,7 +4,8 @@ Database utility functions for connecting to and querying DuckDB databases.
 
 import os
 from pathlib import Path
-import duckdb
+
+from src.utils.resources import connect
 
 # Get the project root directory
 PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
@@ -20,7 +21,7 @@ def get_esco_connection():
     Returns:
         duckdb.DuckDBPyConnection: Connection to the ESCO database
     """
-    return duckdb.connect(ESCO_DB_PATH)
+    return connect(ESCO_DB_PATH)
 
 def get_onet_connection():
     """
@@ -29,7 +30,7 @@ def get_onet_connection():
     Returns:
         duckdb.DuckDBPyConnection: Connection to the O*NET database
     """
-    return duckdb.connect(ONET_DB_PATH)
+    return connect(ONET_DB_PATH)
 
 def execute_sql_file(connection, sql_file_path):
     """
@@ -0,0 +1,340 @@
+"""
+Run instrumentation shared by the ETL and aggregation entry points.
+
+A run is a tree of named spans. Each span records wall and CPU time, optional
+input/output row counts and the process peak RSS when it closes. DuckDB
+queries executed through ``query_pl`` / ``execute`` inside a span are run
+with JSON profiling enabled and their operator timings are attached to the
+span. When the outermost span (the run) closes, a JSON report is written to
+``data/derived/run_reports/<run>_<timestamp>.json``.
+
+Usage in a script::
+
+    from src.utils.instrumentation import instrumented_run, span, query_pl
+
+    @instrumented_run("aggregate_onet")
+    def main():
+        with span("skills") as s:
+            df = query_pl(con, sql)
+            s.rows(output=df.height)
+
+Compare two reports (spans side by side, slowest DuckDB operators)::
+
+    python -m src.utils.instrumentation compare old.json new.json
+
+Set ``FOW_RUN_REPORTS=0`` to keep timing spans but skip writing reports.
+
+Each thread keeps its own stack of open spans. Work running in a thread pool
+passes ``parent=`` to ``span`` to attach its spans to the run; CPU time and
+peak RSS are process-wide, so they overlap between concurrent spans.
+"""
+
+import argparse
+import functools
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src.utils import resources
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+REPORT_DIR = os.path.join(PROJECT_ROOT, "data", "derived", "run_reports")
+REPORTS_ENV_VAR = "FOW_RUN_REPORTS"
+
+# ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+_RSS_TO_MB = 1 / (1024 * 1024) if sys.platform == "darwin" else 1 / 1024
+
+_local = threading.local()
+
+
+def _stack():
+    """Open spans of the calling thread, innermost last."""
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None on Windows)."""
+    if sys.platform == "win32":
+        return None
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_TO_MB
+
+
+class Span:
+    """One timed stage of a run."""
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.children = []
+        self.queries = []
+        self.rows_in = None
+        self.rows_out = None
+        self.attributes = {}
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._rss_start = peak_rss_mb()
+        self.wall_s = None
+        self.cpu_s = None
+        self.peak_rss_mb = None
+        self.peak_rss_growth_mb = None
+        if parent is not None:
+            parent.children.append(self)
+
+    @property
+    def path(self):
+        """Slash-separated names from the run root down to this span."""
+        return self.name if self.parent is None else f"{self.parent.path}/{self.name}"
+
+    def rows(self, input=None, output=None):
+        """Record input and/or output row counts."""
+        if input is not None:
+            self.rows_in = int(input)
+        if output is not None:
+            self.rows_out = int(output)
+
+    def set(self, **attributes):
+        """Attach free-form attributes (paths, parameters) to the span."""
+        self.attributes.update(attributes)
+
+    def close(self):
+        self.wall_s = time.perf_counter() - self._wall_start
+        self.cpu_s = time.process_time() - self._cpu_start
+        self.peak_rss_mb = peak_rss_mb()
+        if self.peak_rss_mb is not None:
+            self.peak_rss_growth_mb = self.peak_rss_mb - self._rss_start
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "path": self.path,
+            "wall_s": self.wall_s,
+            "cpu_s": self.cpu_s,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "peak_rss_mb": self.peak_rss_mb,
+            "peak_rss_growth_mb": self.peak_rss_growth_mb,
+            "attributes": self.attributes,
+            "queries": self.queries,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+def current_span():
+    """Innermost open span of the calling thread, or None outside any run."""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def _write_report(root):
+    if os.environ.get(REPORTS_ENV_VAR, "1") == "0":
+        return None
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(REPORT_DIR, f"{root.name}_{stamp}.json")
+    report = {
+        "run": root.name,
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "argv": sys.argv,
+        "python": sys.version.split()[0],
+        "root": root.to_dict(),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    logging.info(f"Run report written to {path}")
+    return path
+
+
+@contextmanager
+def span(name, rows_in=None, parent=None):
+    """Time a stage; opens a new run (and writes its report) if none is active.
+
+    ``parent`` attaches the span to a span opened in another thread.
+    """
+    current = Span(name, parent=parent or current_span())
+    current.rows(input=rows_in)
+    _stack().append(current)
+    try:
+        yield current
+    finally:
+        _stack().pop()
+        current.close()
+        rss = f", peak RSS {current.peak_rss_mb:.0f} MB" if current.peak_rss_mb is not None else ""
+        logging.info(f"[{current.path}] {current.wall_s:.2f}s wall, {current.cpu_s:.2f}s cpu{rss}")
+        if current.parent is None:
+            _write_report(current)
+
+
+def instrumented_run(name):
+    """Decorator running a function inside a span named ``name``.
+
+    A new run also applies the execution profile's Polars settings and records
+    the effective resource limits in the report.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name) as run:
+                if run.parent is None:
+                    run.set(resources={**resources.describe(), "polars_threads": resources.configure_polars()})
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _flatten_operators(node, depth=0, out=None):
+    """Operator list (type, name, timing, cardinality) from a DuckDB JSON profile tree."""
+    out = [] if out is None else out
+    for child in node.get("children", []):
+        out.append({
+            "depth": depth,
+            "operator": child.get("operator_type") or child.get("name"),
+            "timing_s": child.get("operator_timing", child.get("timing")),
+            "cardinality": child.get("operator_cardinality", child.get("cardinality")),
+        })
+        _flatten_operators(child, depth + 1, out)
+    return out
+
+
+@contextmanager
+def profiled(con, sql):
+    """Run the enclosed DuckDB work with JSON profiling and attach it to the current span."""
+    target = current_span()
+    if target is None:
+        yield
+        return
+    fd, profile_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    con.execute("SET enable_profiling = 'json'")
+    con.execute(f"SET profiling_output = '{profile_path}'")
+    try:
+        yield
+    finally:
+        con.execute("SET enable_profiling = 'no_output'")
+        try:
+            with open(profile_path, "r", encoding="utf-8") as f:
+                profile = json.load(f)
+            target.queries.append({
+                "sql": " ".join(sql.split())[:500],
+                "latency_s": profile.get("latency", profile.get("timing")),
+                "rows_returned": profile.get("rows_returned"),
+                "operators": _flatten_operators(profile),
+            })
+        except (OSError, ValueError) as e:
+            logging.debug(f"No DuckDB profile captured: {e}")
+        finally:
+            os.remove(profile_path)
+
+
+def query_pl(con, sql):
+    """Execute SQL and return a Polars DataFrame, profiling it inside a span."""
+    with profiled(con, sql):
+        return con.sql(sql).pl()
+
+
+def query_arrow(con, sql):
+    """Execute SQL and return a PyArrow Table, profiling it inside a span."""
+    with profiled(con, sql):
+        return con.execute(sql).to_arrow_table()
+
+
+def execute(con, sql, parameters=None):
+    """Execute a statement (e.g. CREATE TABLE ... AS), profiling it inside a span."""
+    with profiled(con, sql):
+        return con.execute(sql, parameters) if parameters is not None else con.execute(sql)
+
+
+# --- Report comparison ---
+
+def load_report(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _spans(node):
+    yield node
+    for child in node.get("children", []):
+        yield from _spans(child)
+
+
+def _operators(report):
+    """Yield (path, sql, key, operator) for every profiled DuckDB operator.
+
+    ``key`` identifies the operator within its span: the occurrence of the
+    statement in the span and the operator's pre-order position in the plan,
+    so repeated operators (several HASH_JOINs at one depth) stay distinct.
+    """
+    for node in _spans(report["root"]):
+        seen = {}
+        for query in node.get("queries", []):
+            occurrence = seen[query["sql"]] = seen.get(query["sql"], -1) + 1
+            for index, operator in enumerate(query["operators"]):
+                yield node["path"], query["sql"], (occurrence, index, operator["operator"]), operator
+
+
+def compare_reports(old, new, top=10, threshold=0.2):
+    """Printable comparison of two run reports.
+
+    Spans are matched by path. A span is flagged when it got slower by more
+    than ``threshold`` (relative). The ``top`` slowest DuckDB operators of the
+    new run are listed with their timing in the old run, when matched.
+    """
+    old_spans = {node["path"]: node for node in _spans(old["root"])}
+    lines = [f"{'span':<60} {'old s':>9} {'new s':>9} {'change':>8}  {'rows out':>10} {'peak MB':>8}"]
+    for node in _spans(new["root"]):
+        previous = old_spans.get(node["path"])
+        old_wall = previous["wall_s"] if previous else None
+        change = (node["wall_s"] - old_wall) / old_wall if old_wall else None
+        flag = " <-- slower" if change is not None and change > threshold else ""
+        lines.append(
+            f"{node['path']:<60} {old_wall if old_wall is not None else float('nan'):>9.3f} "
+            f"{node['wall_s']:>9.3f} {(f'{change:+.0%}' if change is not None else 'new'):>8}  "
+            f"{node['rows_out'] if node['rows_out'] is not None else '':>10} {node['peak_rss_mb'] if node['peak_rss_mb'] is not None else float('nan'):>8.0f}{flag}"
+        )
+
+    old_ops = {(path, sql, key): op["timing_s"] for path, sql, key, op in _operators(old)}
+    slowest = sorted(_operators(new), key=lambda item: item[3]["timing_s"] or 0, reverse=True)[:top]
+    if slowest:
+        lines.append("")
+        lines.append(f"Slowest DuckDB operators in {new['run']}:")
+        for path, sql, key, op in slowest:
+            before = old_ops.get((path, sql, key))
+            before_text = f"{before:.4f}s" if before is not None else "n/a"
+            lines.append(f"  {op['timing_s'] or 0:.4f}s (was {before_text})  {op['operator']:<22} "
+                         f"rows={op['cardinality']}  in {path}: {sql[:60]}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and compare pipeline run reports")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compare = subparsers.add_parser("compare", help="Compare two run reports")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("--top", type=int, default=10, help="Slowest operators to list")
+    compare.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown to flag")
+    subparsers.add_parser("list", help="List stored run reports")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name in sorted(os.listdir(REPORT_DIR)) if os.path.isdir(REPORT_DIR) else []:
+            print(os.path.join(REPORT_DIR, name))
+    else:
+        print(compare_reports(load_report(args.old), load_report(args.new), top=args.top, threshold=args.threshold))
+
+
+if __name__ == "__main__":
+    main()
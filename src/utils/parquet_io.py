@@ -0,0 +1,123 @@
+"""
+Lookup-optimised Parquet outputs.
+
+``write_keyed_parquet`` writes a processed dataset sorted by its primary key,
+in row groups small enough that one key falls into one row group, with zstd
+compression, column statistics, page indexes, Bloom filters on the key
+columns and the sort order recorded in the footer.
+
+``read_keyed_parquet`` uses that layout for point lookups: the row groups are
+sorted by key, so the groups whose min/max statistics can hold the requested
+keys are found by binary search and only those are read. DuckDB's
+``read_parquet`` additionally uses the Bloom filters for ``key = ...``
+predicates.
+
+Usage::
+
+    from src.utils.parquet_io import read_keyed_parquet, write_keyed_parquet
+
+    write_keyed_parquet(df, OUTPUT_PATH, key="onetsoc_code")
+    row = read_keyed_parquet(OUTPUT_PATH, "onetsoc_code", ["15-1252.00"])
+"""
+
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+
+# Configuration
+TARGET_ROW_GROUP_BYTES = 1 << 20  # ~1 MB of in-memory data per row group
+MIN_ROW_GROUP_ROWS = 128
+MAX_ROW_GROUP_ROWS = 1 << 20
+BLOOM_FILTER_FPP = 0.01
+
+
+def row_group_rows(df, target_bytes=TARGET_ROW_GROUP_BYTES):
+    """Rows per row group so that each group holds about ``target_bytes``."""
+    if df.height == 0:
+        return MIN_ROW_GROUP_ROWS
+    bytes_per_row = max(1, df.estimated_size() // df.height)
+    return int(np.clip(target_bytes // bytes_per_row, MIN_ROW_GROUP_ROWS, MAX_ROW_GROUP_ROWS))
+
+
+def write_keyed_parquet(df, path, key, bloom_columns=None, target_bytes=TARGET_ROW_GROUP_BYTES):
+    """Write ``df`` sorted by ``key`` in a layout for selective reads.
+
+    Args:
+        df (pl.DataFrame): Dataset to write
+        path (str): Output Parquet file
+        key (str | list[str]): Primary key column(s); rows are sorted by them
+        bloom_columns (list[str], optional): Columns to get Bloom filters
+            (default: the key columns)
+        target_bytes (int): In-memory size to aim for per row group
+
+    Returns:
+        pl.DataFrame: The sorted frame that was written
+    """
+    keys = [key] if isinstance(key, str) else list(key)
+    df = df.sort(keys, nulls_last=True)
+    rows = row_group_rows(df, target_bytes)
+    table = df.to_arrow()
+    bloom_filter_options = {
+        column: {"ndv": max(1, min(rows, df[column].n_unique())), "fpp": BLOOM_FILTER_FPP}
+        for column in (bloom_columns or keys)
+    }
+    pq.write_table(
+        table,
+        path,
+        row_group_size=rows,
+        compression="zstd",
+        write_statistics=True,
+        write_page_index=True,
+        bloom_filter_options=bloom_filter_options,
+        sorting_columns=pq.SortingColumn.from_ordering(table.schema, [(k, "ascending") for k in keys],
+                                                        null_placement="at_end"),
+    )
+    return df
+
+
+def key_row_groups(parquet_file, key_column, values):
+    """Row groups of a key-sorted file whose statistics can contain ``values``."""
+    metadata = parquet_file.metadata
+    column = parquet_file.schema_arrow.get_field_index(key_column)
+    mins, maxs = [], []
+    for i in range(metadata.num_row_groups):
+        stats = metadata.row_group(i).column(column).statistics
+        if stats is None or not stats.has_min_max:
+            # No usable statistics: every group has to be read
+            return list(range(metadata.num_row_groups))
+        mins.append(stats.min)
+        maxs.append(stats.max)
+    if not mins:
+        return []
+    maxs = np.array(maxs, dtype=object)
+    groups = set()
+    for value in values:
+        # First group whose max reaches the value; keys spanning groups continue into the next ones
+        i = int(np.searchsorted(maxs, value, side="left"))
+        while i < len(mins) and mins[i] <= value:
+            groups.add(i)
+            if maxs[i] > value:
+                break
+            i += 1
+    return sorted(groups)
+
+
+def read_keyed_parquet(path, key_column, values, columns=None):
+    """Rows of a file written by ``write_keyed_parquet`` whose key is in ``values``.
+
+    Args:
+        path (str): Parquet file
+        key_column (str): Leading sort key of the file
+        values (iterable): Key values to look up
+        columns (list[str], optional): Columns to return (default: all)
+
+    Returns:
+        pl.DataFrame: Matching rows, in file (key) order
+    """
+    values = sorted(set(values))
+    parquet_file = pq.ParquetFile(path)
+    groups = key_row_groups(parquet_file, key_column, values)
+    read_columns = None if columns is None else list(dict.fromkeys([key_column, *columns]))
+    table = parquet_file.read_row_groups(groups, columns=read_columns)
+    df = pl.from_arrow(table).filter(pl.col(key_column).is_in(values))
+    return df if columns is None else df.select(columns)
@@ -0,0 +1,137 @@
+"""
+Pipeline runner: start ETL and aggregation stages within one resource budget.
+
+Each stage runs in its own process. Stages run side by side only when their
+dependencies have finished, the execution profile allows another parallel
+stage, and their memory demands fit together in the profile's budget. Every
+stage gets its grant through ``FOW_MEMORY_LIMIT_GB``, ``FOW_THREADS`` and
+``POLARS_MAX_THREADS``, so its DuckDB connections and Polars pool stay within
+its share (see ``src.utils.resources``).
+
+A stage's memory demand is its peak RSS in the latest run report plus
+``HEADROOM``; stages that have no report yet use their default demand.
+
+Usage::
+
+    python -m src.utils.pipeline --profile ci aggregate_onet esco_occupations
+    python -m src.utils.pipeline --profile server --all
+    python -m src.utils.pipeline --list
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from src.utils import resources
+from src.utils.instrumentation import REPORT_DIR
+from src.utils.stages import STAGES
+
+# Get the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+# Configuration
+HEADROOM = 1.5
+MIN_DEMAND_GB = 0.5
+POLL_INTERVAL_S = 0.2
+
+
+def memory_demand_gb(name, profile):
+    """Memory to reserve for a stage, capped at the profile budget."""
+    demand = STAGES[name].memory_gb
+    reports = sorted(glob.glob(os.path.join(REPORT_DIR, f"{name}_*.json")))
+    if reports:
+        with open(reports[-1], "r", encoding="utf-8") as f:
+            peak_rss_mb = json.load(f)["root"].get("peak_rss_mb")
+        if peak_rss_mb:
+            demand = max(MIN_DEMAND_GB, peak_rss_mb / 1024 * HEADROOM)
+    return min(demand, profile.memory_gb)
+
+
+def run_stages(names, profile):
+    """Run ``names`` within the profile's budget; returns the exit code per stage.
+
+    Stages whose dependencies failed are skipped (exit code None).
+    """
+    pending = [name for name in STAGES if name in names]
+    demands = {name: memory_demand_gb(name, profile) for name in pending}
+    _, total_threads = resources.process_limits(profile)
+    threads = max(1, total_threads // max(1, min(profile.max_parallel_stages, len(pending))))
+    running = {}
+    results = {}
+
+    while pending or running:
+        for name, (process, started) in list(running.items()):
+            if process.poll() is not None:
+                del running[name]
+                results[name] = process.returncode
+                status = "ok" if process.returncode == 0 else f"failed (exit {process.returncode})"
+                logging.info(f"[{name}] {status} after {time.perf_counter() - started:.1f}s")
+
+        reserved = sum(demands[name] for name in running)
+        for name in list(pending):
+            requires = [dep for dep in STAGES[name].requires if dep in demands]
+            if any(results[dep] != 0 for dep in requires if dep in results):
+                pending.remove(name)
+                results[name] = None
+                logging.warning(f"[{name}] skipped: a dependency failed")
+                continue
+            if any(dep not in results for dep in requires):
+                continue
+            if len(running) >= profile.max_parallel_stages or reserved + demands[name] > profile.memory_gb:
+                continue
+            env = {
+                **os.environ,
+                resources.PROFILE_ENV_VAR: profile.name,
+                resources.MEMORY_ENV_VAR: f"{demands[name]:.2f}",
+                resources.THREADS_ENV_VAR: str(threads),
+                "POLARS_MAX_THREADS": str(threads),
+            }
+            logging.info(f"[{name}] starting with {demands[name]:.1f} GB and {threads} thread(s) "
+                         f"({reserved + demands[name]:.1f}/{profile.memory_gb} GB reserved)")
+            process = subprocess.Popen([sys.executable, *STAGES[name].command], cwd=PROJECT_ROOT, env=env)
+            running[name] = (process, time.perf_counter())
+            reserved += demands[name]
+            pending.remove(name)
+
+        time.sleep(POLL_INTERVAL_S)
+
+    return results
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Run pipeline stages within an execution profile's budget")
+    parser.add_argument("stages", nargs="*", help="Stages to run (see --list)")
+    parser.add_argument("--all", action="store_true", help="Run every stage")
+    parser.add_argument("--profile", choices=sorted(resources.PROFILES),
+                        help=f"Execution profile (default: ${resources.PROFILE_ENV_VAR} or "
+                             f"'{resources.DEFAULT_PROFILE}')")
+    parser.add_argument("--list", action="store_true", help="List the stages and their memory demand")
+    args = parser.parse_args(argv)
+
+    profile = resources.get_profile(args.profile)
+    if args.list:
+        for name, stage in STAGES.items():
+            requires = f"  (after {', '.join(stage.requires)})" if stage.requires else ""
+            print(f"{name:<24} {memory_demand_gb(name, profile):5.1f} GB{requires}")
+        return 0
+
+    names = list(STAGES) if args.all else args.stages
+    unknown = [name for name in names if name not in STAGES]
+    if unknown or not names:
+        parser.error(f"Unknown stages: {', '.join(unknown)}" if unknown else "Name stages to run, or pass --all")
+
+    logging.info(f"Profile '{profile.name}': {profile.memory_gb} GB, {profile.threads} threads, "
+                 f"up to {profile.max_parallel_stages} stage(s) at a time")
+    results = run_stages(names, profile)
+    return 0 if all(code == 0 for code in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
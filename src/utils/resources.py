@@ -0,0 +1,164 @@
+"""
+Execution profiles: one place for memory, thread and spill settings.
+
+A profile (``laptop``, ``ci``, ``server``) sets the total memory budget and
+thread count of a pipeline run, how many stages may run side by side, where
+DuckDB spills and the Polars streaming chunk size. The profile is selected with
+``FOW_PROFILE`` (default ``laptop``). The pipeline runner
+(``python -m src.utils.pipeline``) hands each stage its share of the budget
+through ``FOW_MEMORY_LIMIT_GB`` and ``FOW_THREADS``; a script started on its own
+gets the whole profile.
+
+Entry points open DuckDB through ``connect`` so that ``memory_limit``,
+``threads`` and ``temp_directory`` come from the profile::
+
+    from src.utils.resources import connect
+
+    con = connect(DB_PATH, read_only=True)
+
+DuckDB's ``memory_limit`` only bounds its buffer pool, so a process gives
+DuckDB ``DUCKDB_MEMORY_SHARE`` of its budget and leaves the rest to the
+Polars/Arrow frames it builds from query results.
+
+The Polars thread pool is sized when Polars is first imported:
+``apply_environment`` (run when the ``src`` package is imported) sets
+``POLARS_MAX_THREADS`` if Polars is not loaded yet, and the pipeline runner
+sets it for every stage it starts.
+
+This module only imports DuckDB and Polars inside functions, so importing it
+does not start either thread pool. It runs on every ``src`` import (including
+the ``fow`` CLI), so it sticks to cheap standard-library modules.
+"""
+
+import os
+import sys
+from collections import namedtuple
+
+# Get the project root directory
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Configuration
+PROFILE_ENV_VAR = "FOW_PROFILE"
+MEMORY_ENV_VAR = "FOW_MEMORY_LIMIT_GB"
+THREADS_ENV_VAR = "FOW_THREADS"
+DEFAULT_PROFILE = "laptop"
+SPILL_DIR = os.path.join(PROJECT_ROOT, "data", "tmp", "duckdb_spill")
+DUCKDB_MEMORY_SHARE = 0.6
+
+
+class Profile(namedtuple("Profile", "name memory_gb threads max_parallel_stages streaming_chunk_size spill_dir",
+                         defaults=(None, SPILL_DIR))):
+    """Resource budget of a pipeline run.
+
+    Attributes:
+        name: Profile name
+        memory_gb: Total memory budget shared by all concurrently running stages
+        threads: Total worker threads (capped at the machine's CPU count)
+        max_parallel_stages: Stages the pipeline runner may run side by side
+        streaming_chunk_size: Polars streaming chunk size (None: Polars default)
+        spill_dir: Root of the DuckDB temp directories
+    """
+    __slots__ = ()
+
+
+PROFILES = {
+    # Developer machine: one stage at a time, modest footprint
+    "laptop": Profile("laptop", memory_gb=4, threads=4, max_parallel_stages=1, streaming_chunk_size=50_000),
+    # Shared 16 GB runners: leave headroom for the OS, the runner and Python itself
+    "ci": Profile("ci", memory_gb=10, threads=4, max_parallel_stages=2, streaming_chunk_size=50_000),
+    "server": Profile("server", memory_gb=48, threads=16, max_parallel_stages=4),
+}
+
+
+def get_profile(name=None):
+    """Profile ``name``, or the one selected by ``FOW_PROFILE``."""
+    name = name or os.environ.get(PROFILE_ENV_VAR, DEFAULT_PROFILE)
+    if name not in PROFILES:
+        raise ValueError(f"Unknown execution profile '{name}' (choose from {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def process_limits(profile=None):
+    """Memory (GB) and threads this process may use.
+
+    The pipeline runner's per-stage grant (``FOW_MEMORY_LIMIT_GB`` /
+    ``FOW_THREADS``) takes precedence over the profile totals.
+    """
+    profile = profile or get_profile()
+    memory_gb = float(os.environ.get(MEMORY_ENV_VAR, profile.memory_gb))
+    threads = int(os.environ.get(THREADS_ENV_VAR, profile.threads))
+    return memory_gb, max(1, min(threads, os.cpu_count() or 1))
+
+
+def apply_environment(profile=None):
+    """Size the Polars thread pool before Polars is imported.
+
+    Has no effect on the pool once Polars is loaded, and never overrides an
+    explicit ``POLARS_MAX_THREADS``.
+    """
+    if "polars" not in sys.modules:
+        _, threads = process_limits(profile)
+        os.environ.setdefault("POLARS_MAX_THREADS", str(threads))
+
+
+def configure_polars(profile=None):
+    """Apply the profile's Polars settings that can change at runtime."""
+    import polars as pl
+
+    profile = profile or get_profile()
+    if profile.streaming_chunk_size:
+        pl.Config.set_streaming_chunk_size(profile.streaming_chunk_size)
+    return pl.thread_pool_size()
+
+
+def duckdb_config(profile=None, memory_gb=None, threads=None):
+    """DuckDB connection settings for this process.
+
+    Args:
+        profile (Profile, optional): Defaults to the active profile
+        memory_gb (float, optional): Process budget to take the DuckDB share of
+        threads (int, optional): DuckDB threads (default: the process limit)
+
+    Returns:
+        dict: ``memory_limit``, ``threads`` and ``temp_directory``
+    """
+    profile = profile or get_profile()
+    process_memory_gb, process_threads = process_limits(profile)
+    memory_gb = memory_gb if memory_gb is not None else process_memory_gb
+    return {
+        "memory_limit": f"{max(1, int(memory_gb * DUCKDB_MEMORY_SHARE * 1024))}MB",
+        "threads": threads or process_threads,
+        # Per process, so concurrent stages never share spill files; DuckDB creates it on
+        # first spill and removes it again when the database closes
+        "temp_directory": os.path.join(profile.spill_dir, str(os.getpid())),
+    }
+
+
+def connect(database=":memory:", read_only=False, threads=None, config=None):
+    """``duckdb.connect`` with the profile's memory, thread and spill settings.
+
+    Args:
+        database (str): Database path (default: in-memory)
+        read_only (bool): Open the database read-only
+        threads (int, optional): Override the DuckDB thread count
+        config (dict, optional): Extra DuckDB settings, applied last
+    """
+    import duckdb
+
+    settings = duckdb_config(threads=threads)
+    settings.update(config or {})
+    os.makedirs(os.path.dirname(settings["temp_directory"]), exist_ok=True)
+    return duckdb.connect(database, read_only=read_only, config=settings)
+
+
+def describe(profile=None):
+    """Effective settings of this process, for run reports and logs."""
+    profile = profile or get_profile()
+    memory_gb, threads = process_limits(profile)
+    return {
+        "profile": profile.name,
+        "memory_gb": memory_gb,
+        "threads": threads,
+        "duckdb_memory_limit": duckdb_config(profile)["memory_limit"],
+        "streaming_chunk_size": profile.streaming_chunk_size,
+    }
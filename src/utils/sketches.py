@@ -0,0 +1,262 @@
+"""
+Mergeable streaming sketches on plain NumPy arrays.
+
+Sketches consume 64-bit hashes (or values) batch by batch, use a fixed amount
+of memory regardless of the input size and can be merged, so partial results
+computed per file, per batch or per worker combine into one.
+
+- ``HyperLogLog``: distinct counts
+- ``KLLSketch``: quantiles; serialised sketches can be stored in Parquet
+  ``BINARY`` columns and rolled up with ``merge_kll``/``kll_quantile`` from
+  Polars, or with the DuckDB functions from ``register_duckdb_functions``
+"""
+
+import struct
+
+import numpy as np
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def mix64(hashes):
+    """splitmix64 finalizer; spreads entropy over all 64 bits of each hash."""
+    h = np.asarray(hashes, dtype=np.uint64).copy()
+    with np.errstate(over="ignore"):
+        h ^= h >> np.uint64(30)
+        h *= np.uint64(0xBF58476D1CE4E5B9)
+        h ^= h >> np.uint64(27)
+        h *= np.uint64(0x94D049BB133111EB)
+        h ^= h >> np.uint64(31)
+    return h
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count estimator over 64-bit hashes.
+
+    Uses ``2**precision`` one-byte registers; the relative standard error of
+    the estimate is about ``1.04 / sqrt(2**precision)`` (0.8% at the default
+    precision of 14, with 16 KB of registers).
+    """
+
+    def __init__(self, precision=14, registers=None):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"precision must be between 4 and 18, got {precision}")
+        self.precision = precision
+        self.registers = (np.zeros(1 << precision, dtype=np.uint8) if registers is None
+                          else np.asarray(registers, dtype=np.uint8))
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def add_hashes(self, hashes):
+        """Add a batch of 64-bit hashes (they are re-mixed first)."""
+        h = mix64(hashes)
+        if not len(h):
+            return self
+        p = np.uint64(self.precision)
+        index = (h >> (np.uint64(64) - p)).astype(np.int64)
+        rest = (h << p) & _MASK64
+        # Rank = position of the leftmost 1-bit in the remaining 64 - p bits
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = np.where(rest == 0, 64 - self.precision + 1, 64 - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        """Fold another sketch of the same precision into this one."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """Estimated number of distinct hashes added."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            return float(m * np.log(m / zeros))
+        return float(raw)
+
+    def to_bytes(self):
+        return bytes([self.precision]) + self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        return cls(precision=payload[0], registers=np.frombuffer(payload[1:], dtype=np.uint8).copy())
+
+
+class KLLSketch:
+    """KLL quantile sketch (Karnin, Lang & Liberty) over float values.
+
+    Values are kept in levels of compactors; an item at level ``h`` stands for
+    ``2**h`` input values. A level that outgrows its capacity is sorted and
+    every other item (random offset) is promoted to the next level. The level
+    capacities shrink geometrically (factor 2/3) from the top, so the sketch
+    retains at most about ``3 * k`` items whatever the input size; at the
+    default ``k`` of 200 the normalised rank error is typically under 1%, for
+    streamed and merged sketches alike. Until the first compaction the sketch
+    holds every value and its quantiles are exact.
+    """
+
+    MIN_CAPACITY = 8
+    CAPACITY_DECAY = 2 / 3
+
+    def __init__(self, k=200, seed=None):
+        if not 8 <= k <= 65535:
+            raise ValueError(f"k must be between 8 and 65535, got {k}")
+        self.k = k
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self._seed = seed
+        self._rng = None
+
+    def capacity(self, level):
+        depth = len(self.levels)
+        return max(self.MIN_CAPACITY, int(np.ceil(self.k * self.CAPACITY_DECAY ** (depth - 1 - level))))
+
+    def update(self, values):
+        """Add a batch of values (NaN is ignored)."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold another sketch with the same ``k`` into this one."""
+        if other.k != self.k:
+            raise ValueError("Cannot merge KLL sketches with different k")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                items = np.sort(self.levels[level])
+                # An odd item out stays behind, so the total weight remains n
+                kept, items = (items[-1:], items[:-1]) if len(items) % 2 else (items[:0], items)
+                if self._rng is None:
+                    self._rng = np.random.default_rng(self._seed)
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                self.levels[level] = kept
+            level += 1
+
+    def _weighted_items(self):
+        if len(self.levels) == 1:
+            return np.sort(self.levels[0]), np.arange(1, len(self.levels[0]) + 1)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 1 << level, dtype=np.int64)
+                                  for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        """Estimated quantiles; linear interpolation between ranks, as ``np.quantile``.
+
+        Returns:
+            np.ndarray: One value per ``q`` (NaN if the sketch is empty)
+        """
+        qs = np.clip(np.asarray(qs, dtype=np.float64), 0.0, 1.0)
+        if self.n == 0:
+            return np.full(qs.shape, np.nan)
+        items, cumulative = self._weighted_items()
+        # Item i covers the ranks cumulative[i - 1] .. cumulative[i] - 1 of the (weighted) sorted input
+        ranks = qs * (cumulative[-1] - 1)
+        lower = items[np.searchsorted(cumulative, np.floor(ranks), side="right")]
+        upper = items[np.searchsorted(cumulative, np.ceil(ranks), side="right")]
+        values = lower + (ranks - np.floor(ranks)) * (upper - lower)
+        return np.where(qs == 0, self.min, np.where(qs == 1, self.max, values))
+
+    def quantile(self, q):
+        """Estimated ``q``-quantile, or None if the sketch is empty."""
+        return float(self.quantiles([q])[0]) if self.n else None
+
+    def to_bytes(self):
+        header = struct.pack(f"<QQQdd{len(self.levels)}Q", self.k, self.n, len(self.levels), self.min, self.max,
+                             *(len(items) for items in self.levels))
+        return header + np.concatenate(self.levels).tobytes()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        k, n, minimum, maximum, levels = _unpack_kll(payload)
+        sketch = cls(k=k)
+        sketch.n, sketch.min, sketch.max = n, minimum, maximum
+        sketch.levels = [items.copy() for items in levels]
+        return sketch
+
+
+def _unpack_kll(payload):
+    """(k, n, min, max, levels) of a serialised sketch; levels are read-only views."""
+    k, n, depth, minimum, maximum = struct.unpack_from("<QQQdd", payload)
+    sizes = struct.unpack_from(f"<{depth}Q", payload, 40)
+    items = np.frombuffer(payload, dtype=np.float64, offset=40 + 8 * depth)
+    levels, start = [], 0
+    for size in sizes:
+        levels.append(items[start:start + size])
+        start += size
+    return k, n, minimum, maximum, levels
+
+
+def merge_kll(payloads, k=200):
+    """Merge serialised KLL sketches (None entries are skipped) into one sketch.
+
+    The levels of all sketches are concatenated and compacted once, without
+    deserialising each sketch.
+    """
+    unpacked = [_unpack_kll(payload) for payload in (() if payloads is None else payloads) if payload is not None]
+    if not unpacked:
+        return KLLSketch(k=k)
+    ks = {u[0] for u in unpacked}
+    if len(ks) > 1:
+        raise ValueError("Cannot merge KLL sketches with different k")
+    merged = KLLSketch(k=ks.pop())
+    depth = max(len(u[4]) for u in unpacked)
+    merged.levels = [np.concatenate([u[4][level] for u in unpacked if level < len(u[4])]) for level in range(depth)]
+    merged.n = sum(u[1] for u in unpacked)
+    merged.min = min(u[2] for u in unpacked)
+    merged.max = max(u[3] for u in unpacked)
+    merged._compress()
+    return merged
+
+
+def kll_quantile(payloads, q):
+    """``q``-quantile over the union of serialised KLL sketches (None if empty)."""
+    return merge_kll(payloads).quantile(q)
+
+
+def register_duckdb_functions(con):
+    """Register KLL rollups on a DuckDB connection.
+
+    - ``kll_merge(BLOB[]) -> BLOB``
+    - ``kll_quantile(BLOB[], DOUBLE) -> DOUBLE``
+    - ``kll_count(BLOB) -> BIGINT``
+
+    e.g. ``SELECT isco_level_2_code, kll_quantile(list(sketch), 0.5) FROM ... GROUP BY ALL``
+    """
+    con.create_function("kll_merge", lambda payloads: merge_kll(payloads).to_bytes(), ["BLOB[]"], "BLOB",
+                        null_handling="special")
+    con.create_function("kll_quantile", kll_quantile, ["BLOB[]", "DOUBLE"], "DOUBLE", null_handling="special")
+    con.create_function("kll_count", lambda payload: KLLSketch.from_bytes(payload).n, ["BLOB"], "BIGINT")
+    return con
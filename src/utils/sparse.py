@@ -0,0 +1,130 @@
+"""
+Minimal compressed sparse row (CSR) matrix on plain NumPy arrays.
+
+Rows and columns are addressed by integer position; callers keep the label
+arrays alongside. The arrays (``indptr``, ``indices``, ``data``) can be saved
+as .npy files and memory-mapped back, so large matrices and graphs are shared
+between processes without re-parsing.
+"""
+
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class CSRMatrix:
+    """Sparse matrix of shape ``(n_rows, n_cols)`` in CSR layout.
+
+    Attributes:
+        indptr (np.ndarray): int64 array of length n_rows + 1; row ``i`` holds
+            entries ``indptr[i]:indptr[i + 1]``
+        indices (np.ndarray): int32 column index of every stored entry
+        data (np.ndarray): float32 value of every stored entry
+        n_cols (int): Number of columns
+    """
+
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+    n_cols: int
+
+    @classmethod
+    def from_coo(cls, rows, cols, values, shape):
+        """Build from coordinate triples; duplicate (row, col) entries are summed."""
+        n_rows, n_cols = shape
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float32)
+
+        order = np.lexsort((cols, rows))
+        rows, cols, values = rows[order], cols[order], values[order]
+        if len(rows):
+            # Collapse duplicates
+            keep = np.ones(len(rows), dtype=bool)
+            keep[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+            groups = np.cumsum(keep) - 1
+            summed = np.zeros(int(keep.sum()), dtype=np.float32)
+            np.add.at(summed, groups, values)
+            rows, cols, values = rows[keep], cols[keep], summed
+
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+        return cls(indptr, cols.astype(np.int32), values, int(n_cols))
+
+    @property
+    def shape(self):
+        return (len(self.indptr) - 1, self.n_cols)
+
+    @property
+    def nnz(self):
+        return int(self.indptr[-1])
+
+    def row_lengths(self):
+        """Number of stored entries per row."""
+        return np.diff(self.indptr)
+
+    def row(self, i):
+        """(indices, data) of row ``i``."""
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def row_ids(self):
+        """Row index of every stored entry (the COO row array)."""
+        return np.repeat(np.arange(self.shape[0], dtype=np.int64), self.row_lengths())
+
+    def transpose(self):
+        """The transposed matrix, also in CSR layout."""
+        return CSRMatrix.from_coo(self.indices, self.row_ids(), self.data, (self.n_cols, self.shape[0]))
+
+    def binarized(self):
+        """Same sparsity pattern with every stored value set to 1."""
+        return CSRMatrix(self.indptr, self.indices, np.ones_like(self.data), self.n_cols)
+
+    def row_norms(self):
+        """L2 norm of every row."""
+        return np.sqrt(np.add.reduceat(np.append(self.data.astype(np.float64) ** 2, 0.0),
+                                       self.indptr[:-1])) * (self.row_lengths() > 0)
+
+    def row_normalized(self):
+        """Copy with every non-empty row scaled to unit L2 norm."""
+        norms = self.row_norms()
+        scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+        return CSRMatrix(self.indptr, self.indices, (self.data * scale[self.row_ids()]).astype(np.float32), self.n_cols)
+
+    def gather(self, rows):
+        """Entries of the row positions in ``rows``.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: for every selected entry, its
+                position within ``rows`` and its position in indices/data
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        starts, lengths = self.indptr[rows], self.indptr[rows + 1] - self.indptr[rows]
+        owners = np.repeat(np.arange(len(rows)), lengths)
+        entries = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(int(lengths.sum()))
+        return owners, entries
+
+    def to_dense(self, rows=None):
+        """Dense float32 array of all rows, or of the row positions in ``rows``."""
+        rows = np.arange(self.shape[0]) if rows is None else np.asarray(rows, dtype=np.int64)
+        owners, entries = self.gather(rows)
+        out = np.zeros((len(rows), self.n_cols), dtype=np.float32)
+        out[owners, self.indices[entries]] = self.data[entries]
+        return out
+
+    def save(self, directory, prefix):
+        """Write the CSR arrays to ``<directory>/<prefix>_{indptr,indices,data}.npy``."""
+        os.makedirs(directory, exist_ok=True)
+        for name in ("indptr", "indices", "data"):
+            np.save(os.path.join(directory, f"{prefix}_{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, prefix, n_cols, mmap_mode="r"):
+        """Load arrays written by ``save``; memory-mapped by default."""
+        arrays = {
+            name: np.load(os.path.join(directory, f"{prefix}_{name}.npy"), mmap_mode=mmap_mode)
+            for name in ("indptr", "indices", "data")
+        }
+        return cls(n_cols=int(n_cols), **arrays)
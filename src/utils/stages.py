@@ -0,0 +1,56 @@
+"""
+Pipeline stages: entry point, default memory demand and dependencies.
+
+Kept free of project and third-party imports so the ``fow`` CLI can list and
+dispatch stages without loading the pipeline runner
+(``src.utils.pipeline``), which schedules them.
+"""
+
+from collections import namedtuple
+
+
+class Stage(namedtuple("Stage", "command memory_gb requires", defaults=(2.0, ()))):
+    """One entry point of the pipeline.
+
+    Attributes:
+        command: Arguments after the Python interpreter (a script path or ``-m module``)
+        memory_gb: Memory demand when no run report is available
+        requires: Stages that must finish first when they are part of the same run
+    """
+    __slots__ = ()
+
+
+STAGES = {
+    "convert_esco_to_duckdb": Stage(("-m", "src.etl.convert_esco_to_duckdb")),
+    "convert_onet_to_duckdb": Stage(("-m", "src.etl.convert_onet_to_duckdb")),
+    "create_isco_hierarchy": Stage(("scripts/create_isco_hierarchy.py",), memory_gb=1.0),
+    "esco_occupations": Stage(("scripts/esco_occupations.py",),
+                              requires=("convert_esco_to_duckdb", "create_isco_hierarchy")),
+    "oews": Stage(("-m", "src.etl.oews"), requires=("convert_onet_to_duckdb",)),
+    "aggregate_onet": Stage(("scripts/aggregate_onet.py",), memory_gb=3.0,
+                            requires=("convert_onet_to_duckdb", "oews")),
+    "aggregate_job_offers": Stage(("scripts/aggregate_job_offers.py",), memory_gb=1.0,
+                                  requires=("esco_occupations",)),
+    "offer_cube": Stage(("-m", "src.analysis.offer_cube"), memory_gb=1.0, requires=("aggregate_job_offers",)),
+    "transform_ine_dirce": Stage(("scripts/transform_ine_dirce.py",), memory_gb=1.0),
+    "aggregate_ine_dirce": Stage(("scripts/aggregate_ine_dirce.py",), memory_gb=1.0,
+                                 requires=("transform_ine_dirce",)),
+    "jrc_tasks": Stage(("-m", "src.etl.jrc_tasks"), memory_gb=1.0, requires=("create_isco_hierarchy",)),
+    "census_susb": Stage(("-m", "src.etl.census_susb"), memory_gb=1.0),
+    "onet_tensor": Stage(("-m", "src.etl.onet_tensor"), requires=("convert_onet_to_duckdb",)),
+    "label_search": Stage(("-m", "src.etl.label_search"),
+                          requires=("convert_esco_to_duckdb", "convert_onet_to_duckdb")),
+    "skill_graph": Stage(("-m", "src.analysis.skill_graph"), requires=("convert_esco_to_duckdb",)),
+    "occupation_similarity": Stage(("-m", "src.analysis.occupation_similarity"),
+                                   requires=("convert_esco_to_duckdb", "convert_onet_to_duckdb")),
+    "skill_dictionary": Stage(("-m", "src.etl.skill_dictionary"),
+                              requires=("esco_occupations", "aggregate_onet")),
+    "occupation_crosswalk": Stage(("-m", "src.etl.occupation_crosswalk"), memory_gb=1.0,
+                                  requires=("esco_occupations", "aggregate_onet")),
+    "feature_store": Stage(("-m", "src.etl.feature_store"), memory_gb=1.0,
+                           requires=("aggregate_job_offers", "occupation_crosswalk", "aggregate_ine_dirce", "jrc_tasks")),
+    "task_exposure": Stage(("-m", "src.analysis.task_exposure"), memory_gb=1.0,
+                           requires=("jrc_tasks", "esco_occupations", "transform_ine_dirce")),
+    "check_data_quality": Stage(("scripts/check_data_quality.py",),
+                                requires=("esco_occupations", "create_isco_hierarchy")),
+}